@@ -1,17 +1,16 @@
 import sys
 import os
+import html
+from urllib.parse import quote
 print("Original PYTHONPATH:", sys.path)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import streamlit as st
 from dotenv import load_dotenv
-from src.utils.file_utils import read_themes_from_excel
-from src.story_generator.story_generator import generate_stories_from_themes
-from src.image_generator.image_generator import generate_images_for_stories
-from src.pdf_generator.pdf_generator import create_pdfs_for_all_stories
-from config.config import load_config
+from src.utils.llm_cache import configure_llm_cache
+from src.utils.image_cache import configure_image_cache
+from src.utils.image_derivatives import configure_image_derivatives
+from config.config import load_config, image_options
 from streamlit_option_menu import option_menu
-from PyPDF2 import PdfReader
-import base64
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +18,9 @@ load_dotenv()
 # Load configuration
 # config = load_config('config/config.yaml')
 config = load_config('config/config.yml')
+configure_llm_cache(**config.get('llm_cache', {}))
+configure_image_cache(**config.get('image_cache', {}))
+configure_image_derivatives(**config.get('image_derivatives', {}))
 
 # Streamlit UI Configuration
 st.set_page_config(
@@ -28,6 +30,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Served by Streamlit at app/static/ (server.enableStaticServing in .streamlit/config.toml)
+STATIC_PDF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'pdfs')
+
 # Custom CSS for styling
 def local_css(file_name):
     with open(file_name) as f:
@@ -57,28 +62,90 @@ if selected == "Home":
 # Generate Stories page
 elif selected == "Generate Stories":
     st.title("🖋️ Generate Stories")
-    uploaded_file = st.file_uploader("Upload an Excel file with story themes", type=["xlsx"])
+    uploaded_file = st.file_uploader("Upload an Excel, CSV or Parquet file with story themes",
+                                     type=["xlsx", "csv", "parquet"])
 
     if uploaded_file is not None:
         # Save the uploaded file
-        file_path = os.path.join("data/input", "themes.xlsx")
+        file_path = os.path.join("data/input", "themes" + os.path.splitext(uploaded_file.name)[1].lower())
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
 
         # Trigger the workflow
         if st.button("Generate Stories"):
+            # The pipeline modules pull in the LLM, image and PDF libraries, so they are
+            # only imported once a run is requested.
+            from src.story_generator.story_generator import generate_stories_from_themes
+            from src.image_generator.image_generator import generate_images_for_stories
+            from src.pdf_generator.pdf_generator import create_pdfs_for_all_stories, create_anthology_pdf
+
             with st.spinner("Generating stories, images, and PDFs... This may take a few minutes."):
-                # Step 1: Generate stories
                 stories_dir = config['output_dirs']['stories']
-                generate_stories_from_themes(file_path, stories_dir)
-
-                # Step 2: Generate images
                 images_dir = config['output_dirs']['images']
-                generate_images_for_stories(stories_dir, images_dir)
-
-                # Step 3: Create PDFs
                 pdfs_dir = config['output_dirs']['pdfs']
-                create_pdfs_for_all_stories(stories_dir, images_dir, pdfs_dir)
+                if config.get('pipeline_mode', 'staged') == 'streaming':
+                    # Each theme goes through story, images and PDF on its own, so PDFs are
+                    # listed here as they are finished instead of after the whole batch.
+                    from src.pipeline.theme_pipeline import run_theme_pipeline
+                    status_text = st.empty()
+                    finished_pdfs = st.container()
+                    finished = 0
+                    for event in run_theme_pipeline(
+                        file_path, stories_dir, images_dir, pdfs_dir=pdfs_dir,
+                        workers={'story': config.get('story_max_workers', 1),
+                                 'prompt': config.get('prompt_workers', 1),
+                                 'image': config.get('image_workers', 1),
+                                 'pdf': config.get('pdf_workers', 1)},
+                        image_options=image_options(config),
+                        page_size=config.get('page_size', 'letter'),
+                        story_timeout=config.get('story_timeout'),
+                        dedup_threshold=config.get('theme_dedup_threshold'),
+                    ):
+                        if event.stage != 'theme':
+                            status_text.text(f"{event.stage.capitalize()} finished for theme {event.item[0]}: "
+                                             f"{event.item[1]}")
+                            continue
+                        finished += 1
+                        if event.result['pdf']:
+                            finished_pdfs.write(f"📄 {os.path.basename(event.result['pdf'])} "
+                                                f"({event.elapsed:.0f} s)")
+                        else:
+                            finished_pdfs.warning(f"No PDF for theme {event.item[0]}: {event.error}")
+                    status_text.text(f"{finished} theme(s) finished.")
+                else:
+                    # Step 1: Generate stories
+                    on_token = None
+                    if config.get('stream_stories'):
+                        story_preview = st.empty()
+                        streamed = {}
+
+                        def on_token(idx, theme, text):
+                            streamed[idx] = streamed.get(idx, "") + text
+                            story_preview.markdown(f"**{theme}**\n\n{streamed[idx]}")
+
+                    generate_stories_from_themes(
+                        file_path, stories_dir,
+                        max_workers=config.get('story_max_workers', 1),
+                        timeout=config.get('story_timeout'),
+                        on_token=on_token,
+                        mode=config.get('story_generation_mode', 'single'),
+                        batch_size=config.get('story_batch_size', 5),
+                        dedup_threshold=config.get('theme_dedup_threshold'),
+                    )
+
+                    # Step 2: Generate images
+                    generate_images_for_stories(stories_dir, images_dir, **image_options(config))
+
+                    # Step 3: Create PDFs
+                    create_pdfs_for_all_stories(stories_dir, images_dir, pdfs_dir,
+                                                max_workers=config.get('pdf_workers', 1),
+                                                page_size=config.get('page_size', 'letter'))
+
+                # Step 4 (optional): Collect every story into one anthology PDF
+                if config.get('anthology_pdf'):
+                    create_anthology_pdf(stories_dir, images_dir, config['anthology_pdf'],
+                                         page_size=config.get('page_size', 'letter'),
+                                         title=config.get('anthology_title', "Story Anthology"))
 
             st.success("Stories, images, and PDFs generated successfully!")
 
@@ -90,20 +157,43 @@ elif selected == "View PDFs":
     pdf_dir = os.path.abspath(config['output_dirs']['pdfs'])
     os.makedirs(pdf_dir, exist_ok=True)
     pdf_files = sorted([f for f in os.listdir(pdf_dir) if f.endswith('.pdf')])
+    viewer = config.get('pdf_viewer', {})
 
     if not pdf_files:
         st.info("No PDFs found. Please generate stories first.")
     else:
-        selected_pdf = st.selectbox("Select a PDF to view", pdf_files)
+        from src.utils.pdf_preview import pdf_cover, publish_pdf
+
+        # Only the current page of the list is shown, so large output folders stay responsive
+        # and covers are only created for PDFs that are actually displayed.
+        per_page = viewer.get('pdfs_per_page', 12)
+        page_count = (len(pdf_files) + per_page - 1) // per_page
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+        page_files = pdf_files[(page - 1) * per_page:page * per_page]
+
+        columns = st.columns(viewer.get('cover_columns', 4))
+        for i, pdf_file in enumerate(page_files):
+            with columns[i % len(columns)]:
+                st.image(pdf_cover(os.path.join(pdf_dir, pdf_file),
+                                   viewer.get('cover_cache_dir', 'data/cache/covers'),
+                                   viewer.get('cover_width', 240),
+                                   viewer.get('cover_cache_max_entries', 500)),
+                         caption=pdf_file)
+
+        selected_pdf = st.selectbox("Select a PDF to view", page_files)
         if selected_pdf:
             pdf_path = os.path.join(pdf_dir, selected_pdf)
-            with open(pdf_path, "rb") as f:
-                base64_pdf = base64.b64encode(f.read()).decode("utf-8")
-            pdf_display = f"""
-                <iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="600" type="application/pdf"></iframe>
-            """
-            st.markdown(pdf_display, unsafe_allow_html=True)
-            st.download_button("Download PDF", data=open(pdf_path, "rb").read(), file_name=selected_pdf)
+            # The browser fetches the PDF from the static file route in byte ranges as the
+            # viewer needs them, so reruns send no PDF data through the page.
+            pdf_url = "app/static/pdfs/" + quote(publish_pdf(pdf_path, STATIC_PDF_DIR))
+            size_mb = os.path.getsize(pdf_path) / 1024 / 1024
+            st.markdown(f"""
+                <iframe src="{pdf_url}" title="{html.escape(selected_pdf)}"
+                        width="100%" height="600" type="application/pdf"></iframe>
+                <p><a href="{pdf_url}" download="{html.escape(selected_pdf)}">Download PDF ({size_mb:.1f} MB)</a></p>
+            """, unsafe_allow_html=True)
 
 # Footer
 st.markdown("""
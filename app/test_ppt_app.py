@@ -7,11 +7,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
 from dotenv import load_dotenv
-from src.utils.file_utils import read_themes_from_excel
-from src.story_generator.story_generator import generate_stories_from_themes
-from src.image_generator.image_generator import generate_images_for_stories
-from src.ppt_generator.ppt_generator import create_ppt_for_story, combine_ppts
-from config.config import load_config
+from src.utils.llm_cache import configure_llm_cache
+from src.utils.image_cache import configure_image_cache
+from src.utils.image_derivatives import configure_image_derivatives
+from config.config import load_config, image_options
 from streamlit_option_menu import option_menu
 
 # Load environment variables
@@ -19,6 +18,9 @@ load_dotenv()
 
 # Load configuration
 config = load_config('config/config.yml')
+configure_llm_cache(**config.get('llm_cache', {}))
+configure_image_cache(**config.get('image_cache', {}))
+configure_image_derivatives(**config.get('image_derivatives', {}))
 
 # Streamlit UI Configuration
 st.set_page_config(
@@ -95,7 +97,8 @@ if selected == "Home":
 # Generate Stories page
 elif selected == "Generate Stories":
     st.title("🖋️ Generate Stories")
-    uploaded_file = st.file_uploader("Upload an Excel file with story themes", type=["xlsx"])
+    uploaded_file = st.file_uploader("Upload an Excel, CSV or Parquet file with story themes",
+                                     type=["xlsx", "csv", "parquet"])
 
     if uploaded_file is not None:
         # Ensure input directory exists
@@ -103,7 +106,7 @@ elif selected == "Generate Stories":
         os.makedirs(input_dir, exist_ok=True)
         
         # Save the uploaded file
-        file_path = os.path.join(input_dir, "themes.xlsx")
+        file_path = os.path.join(input_dir, "themes" + os.path.splitext(uploaded_file.name)[1].lower())
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
 
@@ -114,44 +117,98 @@ elif selected == "Generate Stories":
 
         # Trigger the workflow
         if st.button("Generate Stories"):
+            # The pipeline modules pull in the LLM, image and PPT libraries, so they are
+            # only imported once a run is requested.
+            from src.story_generator.story_generator import generate_stories_from_themes
+            from src.image_generator.image_generator import generate_images_for_stories
+            from src.ppt_generator.ppt_generator import create_ppts_for_all_stories, create_combined_ppt
+
             try:
                 with st.spinner("Generating stories, images, and PPTs... This may take a few minutes."):
                     # Progress tracking
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    # Step 1: Generate stories
-                    status_text.text("Step 1/5: Generating stories...")
-                    progress_bar.progress(20)
-                    generate_stories_from_themes(file_path, stories_dir)
-                    st.success("✅ Stories generated successfully!")
-
-                    # Step 2: Generate images
-                    status_text.text("Step 2/5: Generating images...")
-                    progress_bar.progress(40)
-                    generate_images_for_stories(stories_dir, images_dir)
-                    st.success("✅ Images generated successfully!")
-
-                    # Step 3: Create individual PPTs
-                    status_text.text("Step 3/5: Creating individual PPTs...")
-                    progress_bar.progress(60)
-                    
-                    story_files = [f for f in os.listdir(stories_dir) if f.endswith(".txt")]
-                    if not story_files:
-                        st.error("No story files found!")
-                        st.stop()
-                    
-                    for story_file in story_files:
-                        story_path = os.path.join(stories_dir, story_file)
-                        create_ppt_for_story(story_path, images_dir, ppts_dir)
-                    
-                    st.success("✅ Individual PPTs created successfully!")
+                    if config.get('pipeline_mode', 'staged') == 'streaming':
+                        # Steps 1-3 as one pipeline: each theme goes through its story, images
+                        # and (optionally) its own PPT as soon as the previous step is done.
+                        from src.pipeline.theme_pipeline import run_theme_pipeline
+                        steps = "stories, images and PPTs" if config.get('story_ppts') else "stories and images"
+                        status_text.text(f"Steps 1-3/5: Generating {steps}...")
+                        finished = 0
+                        for event in run_theme_pipeline(
+                            file_path, stories_dir, images_dir,
+                            ppts_dir=ppts_dir if config.get('story_ppts') else None,
+                            workers={'story': config.get('story_max_workers', 1),
+                                     'prompt': config.get('prompt_workers', 1),
+                                     'image': config.get('image_workers', 1),
+                                     'ppt': config.get('ppt_workers', 1)},
+                            image_options=image_options(config),
+                            template_path=config.get('ppt_template'),
+                            story_timeout=config.get('story_timeout'),
+                            dedup_threshold=config.get('theme_dedup_threshold'),
+                        ):
+                            if event.stage == 'theme':
+                                finished += 1
+                                status_text.text(f"Steps 1-3/5: {finished} theme(s) finished, "
+                                                 f"latest: {event.item[1]}")
+                                if event.error:
+                                    st.warning(f"Theme {event.item[0]} ({event.item[1]}): {event.error}")
+                        progress_bar.progress(60)
+                        if not any(f.endswith(".txt") for f in os.listdir(stories_dir)):
+                            st.error("No story files found!")
+                            st.stop()
+                        st.success(f"✅ {steps.capitalize()} generated successfully!")
+                    else:
+                        # Step 1: Generate stories
+                        status_text.text("Step 1/5: Generating stories...")
+                        progress_bar.progress(20)
+                        on_token = None
+                        if config.get('stream_stories'):
+                            story_preview = st.empty()
+                            streamed = {}
+
+                            def on_token(idx, theme, text):
+                                streamed[idx] = streamed.get(idx, "") + text
+                                story_preview.markdown(f"**{theme}**\n\n{streamed[idx]}")
+
+                        generate_stories_from_themes(
+                            file_path, stories_dir,
+                            max_workers=config.get('story_max_workers', 1),
+                            timeout=config.get('story_timeout'),
+                            on_token=on_token,
+                            mode=config.get('story_generation_mode', 'single'),
+                            batch_size=config.get('story_batch_size', 5),
+                            dedup_threshold=config.get('theme_dedup_threshold'),
+                        )
+                        st.success("✅ Stories generated successfully!")
+
+                        # Step 2: Generate images
+                        status_text.text("Step 2/5: Generating images...")
+                        progress_bar.progress(40)
+                        generate_images_for_stories(stories_dir, images_dir, **image_options(config))
+                        st.success("✅ Images generated successfully!")
+
+                        story_files = [f for f in os.listdir(stories_dir) if f.endswith(".txt")]
+                        if not story_files:
+                            st.error("No story files found!")
+                            st.stop()
+
+                        # Step 3: Create individual PPTs (only if enabled in the config)
+                        if config.get('story_ppts'):
+                            status_text.text("Step 3/5: Creating individual PPTs...")
+                            progress_bar.progress(60)
+                            create_ppts_for_all_stories(stories_dir, images_dir, ppts_dir,
+                                                        template_path=config.get('ppt_template'))
+                            st.success("✅ Individual PPTs created successfully!")
 
-                    # Step 4: Combine PPTs
-                    status_text.text("Step 4/5: Combining PPTs...")
+                    # Step 4: Build the combined PPT directly from the stories and images
+                    status_text.text("Step 4/5: Creating the combined PPT...")
                     progress_bar.progress(80)
                     combined_ppt_path = os.path.join(ppts_dir, "combined_stories.pptx")
-                    combine_ppts(ppts_dir, combined_ppt_path)
+                    create_combined_ppt(stories_dir, images_dir, combined_ppt_path,
+                                        template_path=config.get('ppt_template'),
+                                        append=config.get('combined_ppt_append', False))
                     st.success("✅ Combined PPT created successfully!")
 
                     # Step 5: Completion
@@ -0,0 +1,124 @@
+"""
+Compares the time and peak memory of combining per-story decks with combine_ppts against the previous implementation.
+
+Synthetic stories with one image each are turned into per-story decks with
+create_ppt_for_story, then combined by each implementation in a fresh process, so
+the peak resident memory of one run does not hide the other. The images repeat every
+--distinct-images stories, as duplicate themes do.
+
+Usage:
+    python benchmarks/combine_ppts.py [--decks 1000] [--distinct-images 50] [--workers 2]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from src.ppt_generator.ppt_generator import combine_ppts, create_ppt_for_story, set_font_size_12pt
+from src.utils.image_derivatives import configure_image_derivatives
+
+STORY = ("Hanuman leapt across the wide ocean, past clouds and seabirds, to find Sita in the "
+         "gardens of Lanka. He gave her Rama's ring and promised that help was on its way. ") * 4
+
+
+def legacy_combine_ppts(input_dir, output_file):
+    """
+    The previous combine_ppts: one temporary file per picture and one text string per slide.
+    """
+    import tempfile
+    from pptx import Presentation
+
+    prs = Presentation()
+    for ppt_file in os.listdir(input_dir):
+        if ppt_file.endswith(".pptx"):
+            src_prs = Presentation(os.path.join(input_dir, ppt_file))
+            for slide in src_prs.slides:
+                new_slide = prs.slides.add_slide(prs.slide_layouts[0])
+                slide_text = ""
+                for shape in slide.shapes:
+                    if shape.has_text_frame:
+                        for paragraph in shape.text_frame.paragraphs:
+                            slide_text += paragraph.text + "\n"
+                    elif shape.shape_type == 13:  # Picture
+                        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_img:
+                            tmp_img.write(shape.image.blob)
+                            tmp_img_path = tmp_img.name
+                        new_slide.shapes.add_picture(tmp_img_path, shape.left, shape.top, shape.width, shape.height)
+                        os.remove(tmp_img_path)
+                if slide_text.strip():
+                    new_slide.shapes[0].text = slide_text
+                    set_font_size_12pt(new_slide.shapes[0].text_frame)
+    prs.save(output_file)
+
+
+def make_decks(directory, count, distinct_images):
+    """
+    Writes `count` stories, images and per-story decks and returns the decks directory.
+    """
+    from PIL import Image
+    stories_dir = os.path.join(directory, 'stories')
+    images_dir = os.path.join(directory, 'images')
+    decks_dir = os.path.join(directory, 'pptx')
+    for path in (stories_dir, images_dir, decks_dir):
+        os.makedirs(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count):
+            story_path = os.path.join(stories_dir, f"story_{i:05}.txt")
+            with open(story_path, 'w', encoding='utf-8') as file:
+                file.write(STORY)
+            shade = i % distinct_images
+            Image.new('RGB', (512, 384), (shade * 5 % 256, 120, 60)).save(
+                os.path.join(images_dir, f"story_{i:05}_image_1.png"))
+            create_ppt_for_story(story_path, images_dir, decks_dir)
+    return decks_dir
+
+
+def _measure(combine, decks_dir, output_file, results):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        combine(decks_dir, output_file)
+    results.put((time.perf_counter() - start,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                 os.path.getsize(output_file) / 1024 / 1024))
+
+
+def run(label, combine, decks_dir, output_file):
+    """
+    Runs one implementation in a child process and prints its time, peak memory and output size.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(combine, decks_dir, output_file, results))
+    process.start()
+    elapsed, peak_mb, size_mb = results.get()
+    process.join()
+    print(f"{label}: {elapsed:.1f} s, peak RSS {peak_mb:.0f} MB, output {size_mb:.1f} MB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--decks', type=int, default=1000, help='Number of per-story decks to combine.')
+    parser.add_argument('--distinct-images', type=int, default=50, help='Number of different images.')
+    parser.add_argument('--workers', type=int, default=2, help='Decks loaded concurrently by combine_ppts.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_image_derivatives(enabled=False)
+        decks_dir = make_decks(directory, args.decks, args.distinct_images)
+        legacy = run("previous combine_ppts", legacy_combine_ppts, decks_dir,
+                     os.path.join(directory, 'legacy.pptx'))
+        current = run("combine_ppts", lambda d, o: combine_ppts(d, o, max_workers=args.workers), decks_dir,
+                      os.path.join(directory, 'combined.pptx'))
+        print(f"{legacy / current:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
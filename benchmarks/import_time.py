@@ -0,0 +1,95 @@
+"""
+Measures the import-time cost of each entry point, in the style of `python -X importtime`.
+
+Every entry point is imported in a fresh interpreter with -X importtime, so nothing is
+shared between measurements. For the Streamlit apps only their module-level imports are
+measured (running the app itself needs a Streamlit server).
+
+Usage:
+    python benchmarks/import_time.py [--top 10]
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MODULE_ENTRY_POINTS = [
+    'src.story_generator.story_generator',
+    'src.story_generator.story_generator_google_api',
+    'src.image_generator.image_generator',
+    'src.image_generator.image_generator_google_api',
+    'src.pdf_generator.pdf_generator',
+    'src.ppt_generator.ppt_generator',
+]
+
+APP_ENTRY_POINTS = [
+    'app/main.py',
+    'app/test_ppt_app.py',
+]
+
+
+def module_level_imports(script_path):
+    """
+    Returns the import statements found at the top level of a script.
+    """
+    with open(os.path.join(ROOT, script_path), 'r', encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure(code):
+    """
+    Runs `code` under -X importtime in a fresh interpreter.
+
+    Returns:
+        tuple: (list of (cumulative_us, self_us, module) rows, error message or None).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    error = None
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+    return rows, error
+
+
+def report(label, code, top):
+    rows, error = measure(code)
+    total_us = sum(row[1] for row in rows)
+    print(f"{label}: {total_us / 1000:.1f} ms across {len(rows)} modules")
+    if error:
+        print(f"  (import failed: {error})")
+    for cumulative_us, _, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to list per entry point.')
+    args = parser.parse_args()
+
+    baseline_rows, _ = measure('pass')
+    baseline_us = sum(row[1] for row in baseline_rows)
+    print(f"Interpreter startup imports: {baseline_us / 1000:.1f} ms\n")
+
+    for module in MODULE_ENTRY_POINTS:
+        report(module, f"import {module}", args.top)
+        print()
+    for script in APP_ENTRY_POINTS:
+        code = "import sys; sys.path.insert(0, '.')\n" + "\n".join(module_level_imports(script))
+        report(f"{script} (module-level imports)", code, args.top)
+        print()
+
+
+if __name__ == '__main__':
+    main()
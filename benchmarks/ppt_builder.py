@@ -0,0 +1,116 @@
+"""
+Measures decks per second for per-story PPTX files built with the cached DeckBuilder against the previous create_ppt_for_story.
+
+Synthetic stories with one image each are written to a temporary directory. The
+previous implementation opens a fresh Presentation per story, looks layouts up by
+index and restyles every run after setting the text; the current one builds every
+deck from one DeckBuilder.
+
+Usage:
+    python benchmarks/ppt_builder.py [--stories 1000] [--template corporate.pptx]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from pptx import Presentation
+from pptx.enum.text import PP_ALIGN
+from pptx.util import Inches
+from src.ppt_generator.ppt_generator import create_ppt_for_story, set_font_size_12pt
+from src.utils.image_derivatives import configure_image_derivatives, get_image_derivatives
+from src.utils.image_utils import story_images
+
+STORY = ("Hanuman leapt across the wide ocean, past clouds and seabirds, to find Sita in the "
+         "gardens of Lanka. He gave her Rama's ring and promised that help was on its way. ") * 4
+
+
+def legacy_create_ppt_for_story(story_path, images_dir, output_dir, max_words_per_slide=450, template_path=None):
+    """
+    The previous create_ppt_for_story: a new Presentation per story and a second pass over the runs.
+    """
+    story_name = os.path.splitext(os.path.basename(story_path))[0]
+    ppt_path = os.path.join(output_dir, f"{story_name}.pptx")
+    prs = Presentation(template_path)
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    title = slide.shapes.title
+    subtitle = slide.placeholders[1]
+    title.text = story_name.replace("_", " ").title()
+    with open(story_path, 'r', encoding='utf-8') as file:
+        story = file.read()
+    subtitle.text = story[:100]
+    set_font_size_12pt(title.text_frame)
+    set_font_size_12pt(subtitle.text_frame)
+    words = story.split()
+    for i in range(0, len(words), max_words_per_slide):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        content = slide.shapes.placeholders[1]
+        content.text = " ".join(words[i:i + max_words_per_slide])
+        content.text_frame.paragraphs[0].alignment = PP_ALIGN.LEFT
+        set_font_size_12pt(content.text_frame)
+    width, height = Inches(6), Inches(4.5)
+    for image_path in story_images(story_path, images_dir):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        display_path = get_image_derivatives().derive(image_path, width.pt, height.pt)
+        slide.shapes.add_picture(display_path, Inches(1), Inches(1), width=width, height=height)
+    prs.save(ppt_path)
+    return ppt_path
+
+
+def make_stories(directory, count):
+    """
+    Writes `count` stories with one image each and returns the story paths and images directory.
+    """
+    from PIL import Image
+    stories_dir = os.path.join(directory, 'stories')
+    images_dir = os.path.join(directory, 'images')
+    os.makedirs(stories_dir)
+    os.makedirs(images_dir)
+    paths = []
+    for i in range(count):
+        path = os.path.join(stories_dir, f"story_{i:05}.txt")
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(STORY)
+        Image.new('RGB', (512, 384), (i % 256, 120, 60)).save(os.path.join(images_dir, f"story_{i:05}_image_1.png"))
+        paths.append(path)
+    return paths, images_dir
+
+
+def run(label, create, story_paths, images_dir, output_dir, template_path):
+    """
+    Builds one deck per story and prints the decks per second.
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for story_path in story_paths:
+            create(story_path, images_dir, output_dir, 450, template_path)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {len(story_paths) / elapsed:.1f} decks/s ({elapsed:.1f} s for {len(story_paths)} decks)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stories', type=int, default=1000, help='Number of stories.')
+    parser.add_argument('--template', default=None, help='.pptx template (default: the python-pptx default).')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_image_derivatives(enabled=False)
+        story_paths, images_dir = make_stories(directory, args.stories)
+        output_dir = os.path.join(directory, 'pptx')
+        os.makedirs(output_dir)
+        before = run("previous create_ppt_for_story", legacy_create_ppt_for_story, story_paths, images_dir,
+                     output_dir, args.template)
+        after = run("DeckBuilder", create_ppt_for_story, story_paths, images_dir, output_dir, args.template)
+        print(f"{before / after:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
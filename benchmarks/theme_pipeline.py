@@ -0,0 +1,114 @@
+"""
+Compares the time to the first finished PDF of the staged steps and the streaming theme pipeline.
+
+The story and image model calls are replaced with sleeps of a similar spread
+(--story-seconds, and --image-seconds for the fastest and slowest image), so only the
+scheduling differs: the staged run makes every story, then every image, then every PDF;
+the streaming run sends each theme on to its images and PDF as soon as it can. Image
+prompts are built locally, as with prompt_mode "local".
+
+Usage:
+    python benchmarks/theme_pipeline.py [--themes 40] [--story-seconds 0.2] [--image-seconds 0.2 1.5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import src.image_generator.image_generator as image_generator
+import src.story_generator.story_generator as story_generator
+from src.image_generator.image_generator import generate_images_for_stories
+from src.pdf_generator.pdf_generator import create_pdfs_for_all_stories
+from src.pipeline.theme_pipeline import run_theme_pipeline
+from src.story_generator.story_generator import generate_stories_from_themes
+from src.utils.image_derivatives import configure_image_derivatives
+from src.utils.image_utils import save_image_atomic
+
+STORY = ("Hanuman leapt across the wide ocean, past clouds and seabirds, to find Sita in the "
+         "gardens of Lanka. He gave her Rama's ring and promised that help was on its way. ") * 3
+WORKERS = {'story': 4, 'prompt': 4, 'image': 4, 'pdf': 1}
+
+
+def simulate_models(story_seconds, image_seconds):
+    """
+    Replaces the story and image model calls with sleeps.
+    """
+    from PIL import Image
+
+    def generate_story(theme, *args, **kwargs):
+        time.sleep(story_seconds)
+        return f"{theme}. {STORY}"
+
+    def generate_image_from_text(prompt, output_path, filename, width=None, height=None, image_format='png',
+                                 image_quality=90, png_compress_level=6, seed=None, variant=0, use_cache=True,
+                                 usage=None):
+        seconds = random.uniform(*image_seconds)
+        time.sleep(seconds)
+        if usage is not None:
+            usage.record_request(seconds=seconds)
+        os.makedirs(output_path, exist_ok=True)
+        path = os.path.join(output_path, filename)
+        save_image_atomic(Image.new('RGB', (512, 512), (seed % 256, 120, 60)), path, image_format)
+        return path
+
+    story_generator.generate_story = generate_story
+    image_generator.generate_image_from_text = generate_image_from_text
+
+
+def write_themes(directory, count):
+    path = os.path.join(directory, 'themes.csv')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("Theme\n" + "".join(f"Theme number {i}\n" for i in range(count)))
+    return path
+
+
+def run_staged(directory, themes_file):
+    stories_dir, images_dir, pdfs_dir = (os.path.join(directory, name) for name in ('stories', 'images', 'pdfs'))
+    start = time.time()
+    generate_stories_from_themes(themes_file, stories_dir, max_workers=WORKERS['story'])
+    generate_images_for_stories(stories_dir, images_dir, prompt_workers=WORKERS['prompt'],
+                                image_workers=WORKERS['image'], prompt_mode="local")
+    create_pdfs_for_all_stories(stories_dir, images_dir, pdfs_dir, max_workers=WORKERS['pdf'])
+    first = min(os.path.getmtime(os.path.join(pdfs_dir, name)) for name in os.listdir(pdfs_dir))
+    return first - start, time.time() - start
+
+
+def run_streaming(directory, themes_file):
+    stories_dir, images_dir, pdfs_dir = (os.path.join(directory, name) for name in ('stories', 'images', 'pdfs'))
+    start = time.time()
+    first = None
+    for event in run_theme_pipeline(themes_file, stories_dir, images_dir, pdfs_dir=pdfs_dir, workers=WORKERS,
+                                    image_options={'prompt_mode': "local"}):
+        if event.stage == 'pdf' and first is None:
+            first = event.elapsed
+    return first, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--themes', type=int, default=40, help='Number of themes.')
+    parser.add_argument('--story-seconds', type=float, default=0.2, help='Simulated seconds per story.')
+    parser.add_argument('--image-seconds', type=float, nargs=2, default=(0.2, 1.5),
+                        help='Fastest and slowest simulated seconds per image.')
+    args = parser.parse_args()
+
+    simulate_models(args.story_seconds, args.image_seconds)
+    configure_image_derivatives(enabled=False)
+    for label, run in (("staged", run_staged), ("streaming", run_streaming)):
+        random.seed(0)
+        with tempfile.TemporaryDirectory() as directory:
+            themes_file = write_themes(directory, args.themes)
+            with contextlib.redirect_stdout(io.StringIO()):
+                first, total = run(os.path.join(directory, 'output'), themes_file)
+        print(f"{label}: first PDF after {first:.2f} s, all {args.themes} after {total:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,4 +3,32 @@ import yaml
 def load_config(config_path):
     with open(config_path, 'r') as file:
         config = yaml.safe_load(file)
-    return config
\ No newline at end of file
+    return config
+
+def image_options(config):
+    """
+    Maps the image settings of the config to the keyword arguments of
+    generate_images_for_stories, which run_theme_pipeline also takes as `image_options`.
+
+    Args:
+        config (dict): The loaded config.yml.
+
+    Returns:
+        dict: Keyword arguments for generate_images_for_stories.
+    """
+    return {
+        'image_per_story': config.get('image_per_story', 1),
+        'prompt_workers': config.get('prompt_workers', 1),
+        'image_workers': config.get('image_workers', 1),
+        'queue_size': config.get('pipeline_queue_size'),
+        'width': config.get('image_width'),
+        'height': config.get('image_height'),
+        'image_format': config.get('image_format', 'png'),
+        'image_quality': config.get('image_quality', 90),
+        'png_compress_level': config.get('png_compress_level', 6),
+        'seed': config.get('image_seed'),
+        'prompt_mode': config.get('prompt_mode', 'llm'),
+        'prompt_batch_size': config.get('prompt_batch_size', 1),
+        'variant_styles': config.get('variant_styles'),
+        'max_variants': config.get('max_variants_per_story'),
+    }
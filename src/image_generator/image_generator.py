@@ -1,49 +1,92 @@
 import os
 import sys
+import threading
+import time
+from collections import namedtuple
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from src.utils.file_utils import ensure_output_dir
-from src.utils.file_utils import ensure_output_dir
-from PIL import Image
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage
-from huggingface_hub import InferenceClient
+from src.utils.llm_cache import cached_completion, get_llm_cache
+from src.utils.manifest import manifest_for, hash_text
+from src.utils.concurrency import run_two_stage_pipeline
+from src.utils.image_utils import remove_other_formats, story_image_filename, variant_seed, variant_prompt
+from src.utils.image_cache import cached_image, get_image_cache, link_or_copy
+from src.image_generator.scene_prompt import build_scene_prompt
+from src.image_generator.prompt_batching import build_batch_prompt, parse_batch_response, pack_batches
+from src.utils.usage_stats import UsageStats
+from src.utils.providers import register_provider, get_provider, require_env
 from dotenv import load_dotenv
 
 # Load environment variables at the start.
 load_dotenv()
 
-# Load HF_TOKEN from environment variable
-HF_TOKEN = os.getenv('HF_TOKEN')
-if not HF_TOKEN:
-    raise ValueError("HF_TOKEN environment variable is not set.")
+# HuggingFace model used for image generation
+IMAGE_MODEL = "stabilityai/stable-diffusion-3.5-large"
+
+# Groq model settings for prompt enhancement (also part of the LLM cache key)
+PROMPT_MODEL = "deepseek-r1-distill-llama-70b"
+PROMPT_TEMPERATURE = 0.7
+PROMPT_MAX_TOKENS = 500
+
+# Characters of story text sent in one batched enhancement request
+PROMPT_BATCH_CHAR_BUDGET = 24000
 
-# Load GROQ_API_KEY from environment variable
-GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is not set.")
+# The prompt enhancement functions of an LLM (Groq here, Gemini in image_generator_google_api.py)
+# that the image pipeline below calls:
+#   enhance(story_text, use_cache=..., usage=...) -> str
+#   enhance_batch(story_texts, use_cache=..., usage=...) -> list
+#   model: name recorded in the prompt hash of the run manifest
+#   story_chars: characters of each story sent to the LLM (None for the whole story)
+PromptEnhancer = namedtuple('PromptEnhancer', 'enhance enhance_batch model story_chars')
+
+def _create_image_client():
+    """
+    Configures the HuggingFace Inference Client. huggingface_hub is only imported once an image is generated.
+    """
+    from huggingface_hub import InferenceClient
+    return InferenceClient(
+        provider="replicate",
+        api_key=require_env('HF_TOKEN'),
+    )
 
-# Configure the HuggingFace Inference Client
-client = InferenceClient(
-    provider="replicate",
-    api_key=HF_TOKEN,
-)
+def _create_llm():
+    """
+    Configures the Groq LLM for text enhancement. langchain is only imported once a prompt is enhanced.
+    """
+    from langchain_groq import ChatGroq
+    return ChatGroq(
+        model=PROMPT_MODEL,
+        groq_api_key=require_env('GROQ_API_KEY'),
+        temperature=PROMPT_TEMPERATURE,
+        max_tokens=PROMPT_MAX_TOKENS
+    )
 
-# Configure Groq LLM for text enhancement
-llm = ChatGroq(
-    model="deepseek-r1-distill-llama-70b",
-    groq_api_key=GROQ_API_KEY,
-    temperature=0.7,
-    max_tokens=500
-)
+register_provider('huggingface_image', _create_image_client)
+register_provider('groq_prompt', _create_llm)
 
-def generate_image_from_text(prompt, output_path, filename):
+def generate_image_from_text(prompt, output_path, filename, width=None, height=None,
+                             image_format='png', image_quality=90, png_compress_level=6,
+                             seed=None, variant=0, use_cache=True, usage=None):
     """
-    Generates an image based on the given text prompt using Gemini's image generation model.
+    Generates an image based on the given text prompt using the HuggingFace image generation model.
+
+    The image is validated in memory, encoded in the requested format and written to a
+    temporary file that is renamed into place, so a crash never leaves a partial image.
+    Images already generated for the same prompt, size and seed are taken from the image
+    cache instead of calling the model again, in whatever format is requested.
 
     Args:
         prompt (str): Text prompt for image generation.
         output_path (str): Directory to save the generated image.
         filename (str): Name of the output image file (e.g., 'image.png').
+        width (int): Requested image width in pixels (default: None, model default).
+        height (int): Requested image height in pixels (default: None, model default).
+        image_format (str): 'png', 'webp' or 'jpeg' (default: 'png').
+        image_quality (int): Quality for WebP and JPEG, 1-100 (default: 90).
+        png_compress_level (int): zlib level for PNG, 0-9 (default: 6).
+        seed (int): Sampling seed (default: None, random).
+        variant (int): Index of this image among several for the same prompt (default: 0).
+        use_cache (bool): Reuse a cached image for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request when the model is called.
 
     Returns:
         str: Path to the saved image file or None on failure.
@@ -52,29 +95,72 @@ def generate_image_from_text(prompt, output_path, filename):
     file_path = os.path.join(output_path, filename)
 
     # Use HuggingFace InferenceClient to generate image
-    model_name = "stabilityai/stable-diffusion-3.5-large"
+    model_name = IMAGE_MODEL
     print(f"Using model: {model_name}")
 
-    try:
-        image = client.text_to_image(
+    def generate():
+        start = time.perf_counter()
+        image = get_provider('huggingface_image').text_to_image(
             prompt,
             model=model_name,
+            width=width,
+            height=height,
+            seed=seed,
         )
-        image.save(file_path)
-        # Verify that the saved file is a valid image.
-        Image.open(file_path).verify()
-        print(f"Image successfully saved to {file_path}")
-        return file_path
+        if usage is not None:
+            usage.record_request(seconds=time.perf_counter() - start)
+        return image
+
+    try:
+        encode_options = {'image_format': image_format, 'quality': image_quality,
+                          'compress_level': png_compress_level}
+        result, cached = cached_image("huggingface", model_name, prompt, width, height, seed, variant,
+                                      file_path, generate, use_cache=use_cache, encode_options=encode_options)
+        if cached:
+            print(f"Image reused from the image cache: {file_path}")
+        if result:
+            remove_other_formats(result)
+        return result
     except Exception as e:
         print(f"An error occurred during image generation with {model_name}: {e}")
         return None
 
-def generate_enhanced_prompt(story_text):
+def _invoke_llm(prompt, usage=None, max_tokens=None):
+    """
+    Sends the prompt to the Groq LLM and returns the response without the DeepSeek R1 reasoning.
+    """
+    from langchain.schema import HumanMessage
+    llm = get_provider('groq_prompt')
+    message = HumanMessage(content=prompt)
+    start = time.perf_counter()
+    if max_tokens:
+        response = llm.invoke([message], max_tokens=max_tokens)
+    else:
+        response = llm.invoke([message])
+    if usage is not None:
+        token_usage = getattr(response, 'usage_metadata', None) or {}
+        usage.record_request(token_usage.get('input_tokens', 0), token_usage.get('output_tokens', 0),
+                             time.perf_counter() - start)
+    content = response.content
+    if '<think>' in content and '</think>' in content:
+        # Extract only the content after </think>
+        content = content.split('</think>')[-1].strip()
+    return content
+
+def _fallback_prompt(story_text):
+    """
+    Generic image prompt used when prompt enhancement fails.
+    """
+    return f"A colorful and child-friendly illustration of a scene from the story: {story_text[:200]}..."
+
+def generate_enhanced_prompt(story_text, use_cache=True, usage=None):
     """
     Creates an enhanced prompt for better image generation using Groq text model.
     
     Args:
         story_text (str): The story text to create a prompt from.
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens.
     
     Returns:
         str: An enhanced prompt for image generation.
@@ -86,29 +172,207 @@ def generate_enhanced_prompt(story_text):
     """
     
     try:
-        message = HumanMessage(content=enhancement_prompt)
-        response = llm.invoke([message])
-        content = response.content
-        if '<think>' in content and '</think>' in content:
-            # Extract only the content after </think>
-            content = content.split('</think>')[-1].strip()
-        return content
+        return cached_completion("groq", PROMPT_MODEL, PROMPT_TEMPERATURE, PROMPT_MAX_TOKENS, enhancement_prompt,
+                                 lambda: _invoke_llm(enhancement_prompt, usage), use_cache=use_cache)
     except Exception as e:
         print(f"Error enhancing prompt: {e}")
-        return f"A colorful and child-friendly illustration of a scene from the story: {story_text[:200]}..."
+        return _fallback_prompt(story_text)
+
+def generate_enhanced_prompt_batch(story_texts, use_cache=True, usage=None):
+    """
+    Creates enhanced prompts for several stories with a single Groq request.
+
+    Stories whose prompt is missing or malformed in the batched response are retried
+    one at a time with generate_enhanced_prompt.
+
+    Args:
+        story_texts (list): Story texts for this batch.
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the requests and their tokens.
+
+    Returns:
+        list: An enhanced prompt for each story, in order.
+    """
+    prompt = build_batch_prompt(
+        story_texts,
+        "Based on the following children's stories, create a two line summary description of each for an image generation model.",
+    )
+    max_tokens = PROMPT_MAX_TOKENS * len(story_texts)
+    try:
+        content = cached_completion("groq", PROMPT_MODEL, PROMPT_TEMPERATURE, max_tokens, prompt,
+                                    lambda: _invoke_llm(prompt, usage, max_tokens), use_cache=use_cache)
+    except Exception as e:
+        print(f"Error enhancing batch of {len(story_texts)} prompts: {e}")
+        content = ""
+
+    prompts = parse_batch_response(content, len(story_texts))
+    for i, story_text in enumerate(story_texts):
+        if not prompts[i]:
+            print(f"Retrying prompt enhancement on its own for story {i + 1} of the batch")
+            prompts[i] = generate_enhanced_prompt(story_text, use_cache=use_cache, usage=usage)
+    return prompts
+
+def _prompt_enhancer():
+    # Looked up on every call, so the module's functions can be replaced (e.g. by benchmarks).
+    return PromptEnhancer(generate_enhanced_prompt, generate_enhanced_prompt_batch, PROMPT_MODEL, None)
+
+def prompt_input_hash(story_hash, prompt_mode="llm", enhancer=None):
+    """
+    Returns the hash an enhanced prompt is recorded under in the run manifest.
+    """
+    model = (enhancer or _prompt_enhancer()).model
+    return hash_text(story_hash, model if prompt_mode == "llm" else prompt_mode)
+
+def images_input_hash(story_hash, image_per_story=1, width=None, height=None, image_format='png', image_quality=90,
+                      png_compress_level=6, seed=None, variant_styles=None):
+    """
+    Returns the hash a story's images are recorded under in the run manifest.
+    """
+    return hash_text(story_hash, IMAGE_MODEL, image_per_story, width, height,
+                     image_format, image_quality, png_compress_level, seed, list(variant_styles or []))
+
+def _record_prompt(manifest, key, prompt_hash, story, enhanced_prompt):
+    # A fallback prompt is still used, but enhancement is retried on the next run.
+    status = 'failed' if enhanced_prompt == _fallback_prompt(story) else 'done'
+    manifest.record('prompt', key, prompt_hash, status=status, prompt=enhanced_prompt)
 
-def generate_images_for_stories(stories_dir, output_dir, image_per_story=1):
+def prompt_for_story(story, key, manifest, prompt_mode="llm", use_cache=True, usage=None, enhancer=None):
+    """
+    Returns the image prompt for a single story, reusing the one recorded in the run manifest.
+
+    Args:
+        story (str): Story text.
+        key (str): The story's theme key in the manifest.
+        manifest (RunManifest): Manifest of the stories directory.
+        prompt_mode (str): "llm" or "local", as for generate_images_for_stories (default: "llm").
+        use_cache (bool): Reuse a cached prompt enhancement (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens.
+        enhancer (PromptEnhancer): LLM used in "llm" mode (default: None, Groq).
+
+    Returns:
+        str: The image prompt.
+    """
+    enhancer = enhancer or _prompt_enhancer()
+    prompt_hash = prompt_input_hash(hash_text(story), prompt_mode, enhancer)
+    if manifest.is_fresh('prompt', key, prompt_hash):
+        return manifest.get('prompt', key)['prompt']
+    if prompt_mode == "local":
+        enhanced_prompt = build_scene_prompt(story)
+    else:
+        enhanced_prompt = enhancer.enhance(story, use_cache=use_cache, usage=usage)
+    _record_prompt(manifest, key, prompt_hash, story, enhanced_prompt)
+    return enhanced_prompt
+
+def generate_story_image(story_filename, story_hash, variant, image_prompt, output_dir, width=None, height=None,
+                         image_format='png', image_quality=90, png_compress_level=6, seed=None, use_cache=True,
+                         usage=None):
+    """
+    Generates one image variant for a story.
+
+    Args:
+        story_filename (str): File name of the story.
+        story_hash (str): hash_text of the story text, which the variant's seed is derived from.
+        variant (int): Index of the variant, from 0.
+        image_prompt (str): Prompt for this variant.
+        output_dir (str): Directory to save the image in.
+        usage (UsageStats): Optional counters that record the request when the image model is called.
+        Other arguments as for generate_images_for_stories.
+
+    Returns:
+        tuple: (image path or None on failure, dict with the variant's 'seed' and 'prompt').
+    """
+    image_filename = story_image_filename(os.path.splitext(story_filename)[0], variant + 1, image_format)
+    image_seed = variant_seed(seed, story_hash, variant)
+    result = generate_image_from_text(image_prompt, output_dir, image_filename, width, height,
+                                      image_format, image_quality, png_compress_level,
+                                      seed=image_seed, variant=variant, use_cache=use_cache, usage=usage)
+    if result:
+        print(f"✓ Successfully generated image: {image_filename}")
+    else:
+        print(f"✗ Failed to generate image for {story_filename}")
+    return result, {'seed': image_seed, 'prompt': image_prompt}
+
+def record_story_images(manifest, key, images_hash, paths, variants):
+    """
+    Records a story's image variants in the run manifest once all of them have finished.
+
+    Args:
+        manifest (RunManifest): Manifest of the stories directory.
+        key (str): The story's theme key.
+        images_hash (str): Result of images_input_hash.
+        paths (list): Image path of every variant, None for failed ones.
+        variants (list): Seed and prompt of every variant, from generate_story_image.
+    """
+    image_paths = [path for path in paths if path]
+    variants = [dict(variant, path=path) for variant, path in zip(variants, paths) if path]
+    status = 'done' if len(image_paths) == len(paths) else 'failed'
+    manifest.record('images', key, images_hash, image_paths, status=status, variants=variants)
+
+def generate_images_for_stories(stories_dir, output_dir, image_per_story=1, use_cache=True,
+                                prompt_workers=1, image_workers=1, queue_size=None,
+                                width=None, height=None, image_format='png', image_quality=90,
+                                png_compress_level=6, seed=None, prompt_mode="llm", prompt_batch_size=1,
+                                variant_styles=None, max_variants=None, enhancer=None):
     """
     Generates images for stories saved in the stories directory.
 
+    Prompt enhancement and image synthesis run as a two-stage pipeline with separate worker
+    pools, so the prompt LLM and the image endpoint are busy at the same time.
+
+    With prompt_mode "local" the image prompt is built from the story's own sentences
+    (see scene_prompt.py) instead of asking the LLM, which needs no network and takes
+    milliseconds per story. With prompt_batch_size > 1, the LLM enhances several stories
+    per request.
+
+    The images of a story are variants that run concurrently on the image workers, each
+    with its own seed (and, with `variant_styles`, its own prompt wording). The seed,
+    prompt and path of every variant are recorded in the manifest, where the PDF and PPT
+    builders find them.
+
+    Stories whose images are recorded in the run manifest for the same story text and
+    settings are skipped, and enhanced prompts are reused from the manifest.
+
     Args:
         stories_dir (str): Directory containing story text files.
         output_dir (str): Directory to save the generated images.
-        image_per_story (int): Number of images to generate per story.
+        image_per_story (int): Number of image variants to generate per story.
+        use_cache (bool): Reuse cached prompt enhancements and images for unchanged stories (default: True).
+        prompt_workers (int): Concurrent prompt enhancement requests (default: 1).
+        image_workers (int): Concurrent image generation requests (default: 1).
+        queue_size (int): Maximum enhanced prompts waiting for an image worker (default: 2 * image_workers).
+        width (int): Requested image width in pixels (default: None, model default).
+        height (int): Requested image height in pixels (default: None, model default).
+        image_format (str): 'png', 'webp' or 'jpeg' (default: 'png').
+        image_quality (int): Quality for WebP and JPEG, 1-100 (default: 90).
+        png_compress_level (int): zlib level for PNG, 0-9 (default: 6).
+        seed (int): Seed for the first image of each story; later images use seed + 1, seed + 2, ...
+            (default: None, derived from the story text).
+        prompt_mode (str): "llm" to enhance prompts with the LLM, or "local" for the
+            extractive scene-prompt builder (default: "llm").
+        prompt_batch_size (int): Stories per prompt enhancement request in "llm" mode (default: 1).
+        variant_styles (list): Phrases appended in turn to the prompt of the second and later
+            variants (default: None, all variants share the prompt).
+        max_variants (int): Upper limit for image_per_story (default: None, no limit).
+        enhancer (PromptEnhancer): LLM used in "llm" mode (default: None, Groq).
+
+    Returns:
+        UsageStats: Prompt enhancement requests, tokens and request time.
     """
+    enhancer = enhancer or _prompt_enhancer()
+    if prompt_mode not in ("llm", "local"):
+        raise ValueError(f"Unknown prompt_mode {prompt_mode!r}; expected 'llm' or 'local'.")
+    if max_variants and image_per_story > max_variants:
+        print(f"Limiting image_per_story from {image_per_story} to {max_variants} variants per story.")
+        image_per_story = max_variants
+    variant_styles = list(variant_styles or [])
     ensure_output_dir(output_dir)
+    manifest = manifest_for(stories_dir)
 
-    for filename in os.listdir(stories_dir):
+    # Identical stories (e.g. duplicate themes) share one set of image calls: only the
+    # first is sent through the pipeline and the others get copies of its images.
+    tasks = {}
+    duplicates = {}
+    for filename in sorted(os.listdir(stories_dir)):
         if filename.endswith('.txt'):
             story_path = os.path.join(stories_dir, filename)
             
@@ -119,18 +383,123 @@ def generate_images_for_stories(stories_dir, output_dir, image_per_story=1):
                 print(f"Error reading story file {filename}: {e}")
                 continue
 
-            print(f"Processing story: {filename}")
-            enhanced_prompt = generate_enhanced_prompt(story)
-            print(f"Generated prompt: {enhanced_prompt[:150]}...")
+            key = manifest.key_for_story(filename)
+            story_hash = hash_text(story)
+            images_hash = images_input_hash(story_hash, image_per_story, width, height, image_format,
+                                            image_quality, png_compress_level, seed, variant_styles)
+            if manifest.is_fresh('images', key, images_hash, output_dir):
+                print(f"Images for {filename} are up to date.")
+                continue
+
+            task = {'filename': filename, 'story': story, 'key': key, 'story_hash': story_hash,
+                    'images_hash': images_hash, 'paths': [None] * image_per_story, 'remaining': image_per_story,
+                    'variants': [None] * image_per_story}
+            if story_hash in tasks:
+                duplicates.setdefault(story_hash, []).append(task)
+            else:
+                tasks[story_hash] = task
+
+    usage = UsageStats(label=f"prompt enhancement, {prompt_batch_size} per request")
+
+    def enhance(batch):
+        jobs = []
+        pending = []
+        for task in batch:
+            print(f"Processing story: {task['filename']}")
+            task['prompt_hash'] = prompt_input_hash(task['story_hash'], prompt_mode, enhancer)
+            if manifest.is_fresh('prompt', task['key'], task['prompt_hash']):
+                task['prompt'] = manifest.get('prompt', task['key'])['prompt']
+            elif prompt_mode == "local":
+                task['prompt'] = build_scene_prompt(task['story'])
+                manifest.record('prompt', task['key'], task['prompt_hash'], prompt=task['prompt'])
+            else:
+                pending.append(task)
+
+        if pending:
+            stories = [task['story'] for task in pending]
+            # Stories answered from the LLM cache cost no request, so they are not counted.
+            batch_usage = UsageStats()
+            if len(pending) == 1:
+                prompts = [enhancer.enhance(stories[0], use_cache=use_cache, usage=batch_usage)]
+            else:
+                prompts = enhancer.enhance_batch(stories, use_cache=use_cache, usage=batch_usage)
+            if batch_usage.requests:
+                batch_usage.record_stories(len(pending))
+            usage.merge(batch_usage)
+            for task, enhanced_prompt in zip(pending, prompts):
+                task['prompt'] = enhanced_prompt
+                _record_prompt(manifest, task['key'], task['prompt_hash'], task['story'], enhanced_prompt)
+
+        for task in batch:
+            print(f"Generated prompt: {task['prompt'][:150]}...")
+            jobs.extend((task, i, variant_prompt(task['prompt'], i, variant_styles)) for i in range(image_per_story))
+        return jobs
+
+    generated = []
+
+    def synthesize(job):
+        task, i, image_prompt = job
+        image_usage = UsageStats()
+        result, task['variants'][i] = generate_story_image(task['filename'], task['story_hash'], i, image_prompt,
+                                                           output_dir, width, height, image_format, image_quality,
+                                                           png_compress_level, seed, use_cache, image_usage)
+        if result and image_usage.requests:
+            generated.append(result)
+        return result
+
+    lock = threading.Lock()
+
+    def collect(job, result):
+        task, i, _ = job
+        with lock:
+            task['paths'][i] = result
+            task['remaining'] -= 1
+            finished = task['remaining'] == 0
+        if finished:
+            record_story_images(manifest, task['key'], task['images_hash'], task['paths'], task['variants'])
+
+    batches = pack_batches(tasks.values(), max(1, prompt_batch_size), PROMPT_BATCH_CHAR_BUDGET,
+                           size=lambda task: len(task['story'][:enhancer.story_chars]))
+    run_two_stage_pipeline(batches, enhance, synthesize, prompt_workers, image_workers,
+                           queue_size=queue_size, on_result=collect)
+
+    reused = 0
+    for story_hash, copies in duplicates.items():
+        source = tasks[story_hash]
+        if source['remaining'] or not all(source['paths']):
+            continue
+        for task in copies:
+            image_paths = []
+            variants = []
+            for i, source_path in enumerate(source['paths']):
+                image_path = os.path.join(output_dir, story_image_filename(
+                    os.path.splitext(task['filename'])[0], i + 1, image_format))
+                link_or_copy(source_path, image_path)
+                remove_other_formats(image_path)
+                image_paths.append(image_path)
+                variants.append(dict(source['variants'][i], path=image_path))
+            manifest.record('images', task['key'], task['images_hash'], image_paths, variants=variants)
+            reused += len(image_paths)
+            print(f"Reused images of an identical story for {task['filename']}")
 
-            for i in range(image_per_story):
-                image_filename = f"{os.path.splitext(filename)[0]}_image_{i+1}.png"
-                result = generate_image_from_text(enhanced_prompt, output_dir, image_filename)
-                
-                if result:
-                    print(f"✓ Successfully generated image: {image_filename}")
-                else:
-                    print(f"✗ Failed to generate image for {filename}")
+    manifest.save()
+    # Only images the model was called for; cache hits are counted in the image cache stats below.
+    if generated:
+        total_bytes = sum(os.path.getsize(path) for path in generated)
+        print(f"Generated {len(generated)} image(s), {total_bytes / 1024:.1f} KB in total "
+              f"({total_bytes / len(generated) / 1024:.1f} KB per image).")
+    if reused:
+        print(f"Reused {reused} image(s) for identical stories instead of generating them.")
+    cache_stats = get_llm_cache().stats()
+    print(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    image_cache_stats = get_image_cache().stats()
+    print(f"Image cache: {image_cache_stats['hits']} hits, {image_cache_stats['misses']} misses")
+    if usage.stories:
+        usage.report()
+        saved = usage.stories - usage.requests
+        if saved > 0:
+            print(f"Batching saved {saved} of {usage.stories} prompt enhancement requests.")
+    return usage
 
 def test_image_generation():
     """
@@ -173,9 +542,9 @@ def list_groq_model_info():
     Display information about the Groq model being used.
     """
     print("--- Groq Model Information ---")
-    print(f"Model: deepseek-r1-distill-llama-70b")
-    print(f"Temperature: 0.7")
-    print(f"Max Tokens: 500")
+    print(f"Model: {PROMPT_MODEL}")
+    print(f"Temperature: {PROMPT_TEMPERATURE}")
+    print(f"Max Tokens: {PROMPT_MAX_TOKENS}")
     print("-----------------------------")
 
 
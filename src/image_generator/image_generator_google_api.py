@@ -1,123 +1,126 @@
 import os
 import sys
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.utils.file_utils import ensure_output_dir
-from src.utils.file_utils import ensure_output_dir
-from PIL import Image
-import google.generativeai as genai
-from huggingface_hub import InferenceClient
+from src.utils.llm_cache import cached_completion
+from src.image_generator import image_generator
+from src.image_generator.image_generator import PromptEnhancer, generate_image_from_text, _fallback_prompt
+from src.image_generator.prompt_batching import build_batch_prompt, parse_batch_response
+from src.utils.providers import register_provider, get_provider, require_env
 from dotenv import load_dotenv
 
 # Load environment variables at the start.
 load_dotenv()
 
-# Load HF_TOKEN from environment variable
-HF_TOKEN = os.getenv('HF_TOKEN')
-if not HF_TOKEN:
-    raise ValueError("HF_TOKEN environment variable is not set.")
+# Images are generated by image_generator.py's HuggingFace model; only prompt
+# enhancement differs.
 
-# Configure the HuggingFace Inference Client
-client = InferenceClient(
-    provider="replicate",
-    api_key=HF_TOKEN,
-)
+# Gemini model used for prompt enhancement (also part of the LLM cache key)
+PROMPT_MODEL = 'models/gemini-2.5-pro'
 
-def generate_image_from_text(prompt, output_path, filename):
-    """
-    Generates an image based on the given text prompt using Gemini's image generation model.
-
-    Args:
-        prompt (str): Text prompt for image generation.
-        output_path (str): Directory to save the generated image.
-        filename (str): Name of the output image file (e.g., 'image.png').
+# Characters of story text used per story
+PROMPT_STORY_CHARS = 500
 
-    Returns:
-        str: Path to the saved image file or None on failure.
+def _create_text_model():
     """
-    ensure_output_dir(output_path)
-    file_path = os.path.join(output_path, filename)
-
-    # Use HuggingFace InferenceClient to generate image
-    model_name = "stabilityai/stable-diffusion-3.5-large"
-    print(f"Using model: {model_name}")
+    Configures the Gemini text model. google.generativeai is only imported once a prompt is enhanced.
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=require_env('GOOGLE_API_KEY'))
+    return genai.GenerativeModel(PROMPT_MODEL)
 
-    try:
-        image = client.text_to_image(
-            prompt,
-            model=model_name,
-        )
-        image.save(file_path)
-        # Verify that the saved file is a valid image.
-        Image.open(file_path).verify()
-        print(f"Image successfully saved to {file_path}")
-        return file_path
-    except Exception as e:
-        print(f"An error occurred during image generation with {model_name}: {e}")
-        return None
+register_provider('gemini_prompt', _create_text_model)
 
-def generate_enhanced_prompt(story_text):
+def _invoke_llm(prompt, usage=None):
+    """
+    Sends the prompt to Gemini and returns the text of the first response part.
+    """
+    start = time.perf_counter()
+    response = get_provider('gemini_prompt').generate_content(prompt)
+    if usage is not None:
+        token_usage = getattr(response, 'usage_metadata', None)
+        usage.record_request(getattr(token_usage, 'prompt_token_count', 0),
+                             getattr(token_usage, 'candidates_token_count', 0),
+                             time.perf_counter() - start)
+    # It's good practice to access the text from the parts of the response.
+    if not response.parts:
+        raise ValueError("Gemini returned an empty response.")
+    return response.parts[0].text.strip()
+
+def generate_enhanced_prompt(story_text, use_cache=True, usage=None):
     """
     Creates an enhanced prompt for better image generation using a text model.
     
     Args:
         story_text (str): The story text to create a prompt from.
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens.
     
     Returns:
         str: An enhanced prompt for image generation.
     """
     # Using a capable text model to generate a descriptive prompt.
-    text_model = genai.GenerativeModel('models/gemini-2.5-pro')
-    
     enhancement_prompt = f"""
     Based on this children's story excerpt, create a detailed and vivid visual description for an image generation model. The description should be a single paragraph and include details about the characters, their appearance, the setting, colors, mood, and a child-friendly art style like 'storybook illustration' or 'cartoon'.
 
-    Story: "{story_text[:500]}..."
+    Story: "{story_text[:PROMPT_STORY_CHARS]}..."
     """
     
     try:
-        response = text_model.generate_content(enhancement_prompt)
-        # It's good practice to access the text from the parts of the response.
-        if response.parts:
-            return response.parts[0].text.strip()
-        return f"A colorful and child-friendly illustration of a scene from the story: {story_text[:200]}..."
+        return cached_completion("gemini", PROMPT_MODEL, None, None, enhancement_prompt,
+                                 lambda: _invoke_llm(enhancement_prompt, usage), use_cache=use_cache)
     except Exception as e:
         print(f"Error enhancing prompt: {e}")
-        return f"A colorful and child-friendly illustration of a scene from the story: {story_text[:200]}..."
+        return _fallback_prompt(story_text)
 
-def generate_images_for_stories(stories_dir, output_dir, image_per_story=1):
+def generate_enhanced_prompt_batch(story_texts, use_cache=True, usage=None):
     """
-    Generates images for stories saved in the stories directory.
+    Creates enhanced prompts for several stories with a single Gemini request.
+
+    Stories whose prompt is missing or malformed in the batched response are retried
+    one at a time with generate_enhanced_prompt.
 
     Args:
-        stories_dir (str): Directory containing story text files.
-        output_dir (str): Directory to save the generated images.
-        image_per_story (int): Number of images to generate per story.
+        story_texts (list): Story texts for this batch.
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the requests and their tokens.
+
+    Returns:
+        list: An enhanced prompt for each story, in order.
+    """
+    prompt = build_batch_prompt(
+        [f"{story_text[:PROMPT_STORY_CHARS]}..." for story_text in story_texts],
+        "Based on these children's story excerpts, create a detailed and vivid visual description of each for an image generation model. Each description should be a single paragraph and include details about the characters, their appearance, the setting, colors, mood, and a child-friendly art style like 'storybook illustration' or 'cartoon'.",
+    )
+    try:
+        content = cached_completion("gemini", PROMPT_MODEL, None, None, prompt,
+                                    lambda: _invoke_llm(prompt, usage), use_cache=use_cache)
+    except Exception as e:
+        print(f"Error enhancing batch of {len(story_texts)} prompts: {e}")
+        content = ""
+
+    prompts = parse_batch_response(content, len(story_texts))
+    for i, story_text in enumerate(story_texts):
+        if not prompts[i]:
+            print(f"Retrying prompt enhancement on its own for story {i + 1} of the batch")
+            prompts[i] = generate_enhanced_prompt(story_text, use_cache=use_cache, usage=usage)
+    return prompts
+
+def _prompt_enhancer():
+    # Looked up on every call, so the module's functions can be replaced (e.g. by benchmarks).
+    return PromptEnhancer(generate_enhanced_prompt, generate_enhanced_prompt_batch, PROMPT_MODEL, PROMPT_STORY_CHARS)
+
+def generate_images_for_stories(stories_dir, output_dir, **options):
+    """
+    Generates images for stories saved in the stories directory, with prompts enhanced by Gemini.
+
+    Takes the same options as image_generator.generate_images_for_stories, which runs the pipeline.
+
+    Returns:
+        UsageStats: Prompt enhancement requests, tokens and request time.
     """
-    ensure_output_dir(output_dir)
-
-    for filename in os.listdir(stories_dir):
-        if filename.endswith('.txt'):
-            story_path = os.path.join(stories_dir, filename)
-            
-            try:
-                with open(story_path, 'r', encoding='utf-8') as file:
-                    story = file.read()
-            except Exception as e:
-                print(f"Error reading story file {filename}: {e}")
-                continue
-
-            print(f"Processing story: {filename}")
-            enhanced_prompt = generate_enhanced_prompt(story)
-            print(f"Generated prompt: {enhanced_prompt[:150]}...")
-
-            for i in range(image_per_story):
-                image_filename = f"{os.path.splitext(filename)[0]}_image_{i+1}.png"
-                result = generate_image_from_text(enhanced_prompt, output_dir, image_filename)
-                
-                if result:
-                    print(f"✓ Successfully generated image: {image_filename}")
-                else:
-                    print(f"✗ Failed to generate image for {filename}")
+    return image_generator.generate_images_for_stories(stories_dir, output_dir, enhancer=_prompt_enhancer(),
+                                                       **options)
 
 def test_image_generation():
     """
@@ -143,6 +146,8 @@ def list_available_models():
     """
     print("--- Available Generative Models ---")
     try:
+        import google.generativeai as genai
+        genai.configure(api_key=require_env('GOOGLE_API_KEY'))
         for model in genai.list_models():
             if 'generateContent' in model.supported_generation_methods:
                 print(model.name)
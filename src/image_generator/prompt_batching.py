@@ -0,0 +1,92 @@
+import json
+import re
+
+# Prompts shorter than this are treated as malformed and enhanced again on their own.
+MIN_PROMPT_WORDS = 5
+
+
+def build_batch_prompt(story_texts, instruction):
+    """
+    Builds a single prompt asking for one image description per story, returned as a JSON array.
+
+    Args:
+        story_texts (list): Story texts for this batch.
+        instruction (str): What to write for each story (the single-story enhancement instruction).
+
+    Returns:
+        str: The rendered prompt.
+    """
+    story_blocks = "\n\n".join(f'    Story {i}: "{story}"' for i, story in enumerate(story_texts, start=1))
+    return f"""
+    {instruction}
+    Write one description for each of the {len(story_texts)} stories below.
+
+{story_blocks}
+
+    Respond with only a JSON array and no other text, in this exact form:
+    [{{"index": 1, "prompt": "..."}}, {{"index": 2, "prompt": "..."}}]
+    """
+
+
+def parse_batch_response(content, count):
+    """
+    Splits a batched response back into per-story image prompts.
+
+    Args:
+        content (str): Raw LLM response (may be wrapped in a ```json fence or surrounding text).
+        count (int): Number of stories in the batch.
+
+    Returns:
+        list: `count` prompts in story order; entries that are missing or malformed are empty strings.
+    """
+    prompts = [""] * count
+    match = re.search(r"\[.*\]", content or "", re.DOTALL)
+    if not match:
+        return prompts
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return prompts
+    if not isinstance(items, list):
+        return prompts
+
+    for position, item in enumerate(items):
+        if isinstance(item, dict):
+            index, prompt = item.get("index", position + 1), item.get("prompt")
+        else:
+            index, prompt = position + 1, item
+        if not isinstance(prompt, str) or len(prompt.split()) < MIN_PROMPT_WORDS:
+            continue
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= index <= count and not prompts[index - 1]:
+            prompts[index - 1] = prompt.strip()
+    return prompts
+
+
+def pack_batches(items, batch_size, char_budget, size=len):
+    """
+    Yields consecutive lists of items holding at most `batch_size` items and, where
+    possible, at most `char_budget` characters.
+
+    An item larger than the budget on its own still gets a batch of its own.
+
+    Args:
+        items (iterable): Items to group.
+        batch_size (int): Maximum items per batch.
+        char_budget (int): Maximum total size per batch, in characters.
+        size (callable): Returns the size of an item in characters (default: len).
+    """
+    batch = []
+    used = 0
+    for item in items:
+        item_size = size(item)
+        if batch and (len(batch) >= batch_size or used + item_size > char_budget):
+            yield batch
+            batch, used = [], 0
+        batch.append(item)
+        used += item_size
+    if batch:
+        yield batch
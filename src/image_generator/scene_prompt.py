@@ -0,0 +1,157 @@
+import re
+from collections import Counter
+
+# Appended to every locally built prompt so the images keep a consistent look.
+STYLE_SUFFIX = "Colorful, child-friendly storybook illustration, soft lighting, detailed background."
+
+# Longest scene description (in words) before the style suffix and character list.
+MAX_SCENE_WORDS = 60
+
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'so', 'of', 'in', 'on', 'at', 'to', 'for', 'from',
+    'with', 'by', 'as', 'into', 'onto', 'over', 'under', 'up', 'down', 'out', 'off', 'is', 'was',
+    'were', 'are', 'be', 'been', 'being', 'am', 'he', 'she', 'it', 'they', 'we', 'you', 'i', 'him',
+    'her', 'them', 'us', 'me', 'his', 'hers', 'its', 'their', 'our', 'your', 'my', 'this', 'that',
+    'these', 'those', 'there', 'here', 'then', 'than', 'when', 'while', 'who', 'whom', 'which',
+    'what', 'where', 'why', 'how', 'had', 'has', 'have', 'do', 'did', 'does', 'not', 'no', 'very',
+    'just', 'all', 'any', 'some', 'one', 'once', 'upon', 'time', 'day', 'said', 'would', 'could',
+    'will', 'can', 'also', 'too', 'if', 'every', 'each', 'after', 'before', 'again',
+}
+
+# Words that mark a sentence as describing where the story takes place.
+SETTING_WORDS = {
+    'forest', 'jungle', 'village', 'town', 'city', 'palace', 'castle', 'kingdom', 'river', 'lake',
+    'sea', 'ocean', 'shore', 'beach', 'island', 'mountain', 'mountains', 'hill', 'hills', 'valley',
+    'sky', 'clouds', 'garden', 'field', 'fields', 'meadow', 'cave', 'desert', 'temple', 'house',
+    'home', 'school', 'farm', 'tree', 'trees', 'night', 'morning', 'sunset', 'stars', 'moon',
+    'bridge', 'road', 'path', 'market', 'pond', 'court', 'ashram', 'battlefield',
+}
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*")
+
+
+def split_sentences(text):
+    """
+    Splits story text into sentences, ignoring titles, the moral and blank lines.
+    """
+    sentences = []
+    for paragraph in text.splitlines():
+        stripped = paragraph.strip()
+        paragraph = stripped.replace('*', '').replace('_', ' ').strip()
+        if (not paragraph or stripped.startswith('#') or (stripped.startswith('**') and stripped.endswith('**'))
+                or paragraph.lower().startswith(('title:', 'moral:', 'the moral'))):
+            continue
+        sentences.extend(part.strip() for part in _SENTENCE_RE.split(paragraph) if part.strip())
+    return sentences
+
+
+def _content_words(sentence):
+    return [word for word in (w.lower().strip("'-") for w in _WORD_RE.findall(sentence))
+            if len(word) > 2 and word not in STOPWORDS]
+
+
+def sentence_scores(sentences, damping=0.85, iterations=30):
+    """
+    Ranks sentences by TextRank over their TF-IDF vectors.
+
+    Args:
+        sentences (list): Sentences of one story.
+        damping (float): PageRank damping factor (default: 0.85).
+        iterations (int): Power-iteration steps (default: 30).
+
+    Returns:
+        numpy.ndarray: One score per sentence; higher is more central to the story.
+    """
+    # numpy is only imported once a prompt is built locally, not with the image pipeline.
+    import numpy as np
+    count = len(sentences)
+    if count == 0:
+        return np.zeros(0)
+    tokenized = [_content_words(sentence) for sentence in sentences]
+    vocabulary = {word: i for i, word in enumerate(sorted({w for words in tokenized for w in words}))}
+    if not vocabulary:
+        return np.ones(count) / count
+
+    counts = np.zeros((count, len(vocabulary)))
+    for row, words in enumerate(tokenized):
+        for word in words:
+            counts[row, vocabulary[word]] += 1
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + count) / (1 + document_frequency)) + 1
+    tfidf = counts * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf = np.divide(tfidf, norms, out=np.zeros_like(tfidf), where=norms > 0)
+
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences that share no words with the rest link to every sentence equally.
+    transition = np.divide(similarity, out_weight, out=np.full_like(similarity, 1.0 / count),
+                           where=out_weight > 0)
+
+    scores = np.ones(count) / count
+    for _ in range(iterations):
+        scores = (1 - damping) / count + damping * (transition.T @ scores)
+    return scores
+
+
+def find_characters(sentences, limit=3):
+    """
+    Returns the most frequent proper names in a story, most frequent first.
+
+    Names are words written with a capital letter somewhere other than at the start of
+    a sentence; once found, every occurrence of them is counted.
+    """
+    tokenized = [[re.sub(r"'s$", '', word.strip("'-")) for word in _WORD_RE.findall(sentence)]
+                 for sentence in sentences]
+    candidates = {word for words in tokenized for word in words[1:]
+                  if word[:1].isupper() and len(word) > 1 and word.lower() not in STOPWORDS}
+    names = Counter(word for words in tokenized for word in words if word in candidates)
+    return [name for name, _ in names.most_common(limit)]
+
+
+def build_scene_prompt(story_text, style_suffix=STYLE_SUFFIX, max_words=MAX_SCENE_WORDS):
+    """
+    Builds an image prompt from a story without calling an LLM.
+
+    The most central sentence that mentions a main character is used as the action and
+    the most central sentence that mentions a place as the setting. Both are trimmed to
+    `max_words`, followed by the character names and a style suffix.
+
+    Args:
+        story_text (str): The story text.
+        style_suffix (str): Text appended to describe the art style (default: STYLE_SUFFIX).
+        max_words (int): Maximum words taken from the story (default: MAX_SCENE_WORDS).
+
+    Returns:
+        str: The image prompt.
+    """
+    sentences = split_sentences(story_text)
+    if not sentences:
+        return style_suffix
+    scores = sentence_scores(sentences)
+    ranked = sorted(range(len(sentences)), key=lambda i: -scores[i])
+    characters = find_characters(sentences)
+
+    def first_match(condition, exclude=()):
+        return next((i for i in ranked if i not in exclude and condition(sentences[i])), None)
+
+    action = first_match(lambda s: any(name in s for name in characters[:2]))
+    if action is None:
+        action = ranked[0]
+    setting = first_match(lambda s: any(word in SETTING_WORDS for word in _content_words(s)), exclude=(action,))
+
+    # Keep the chosen sentences in story order so the scene reads naturally.
+    chosen = sorted(i for i in (action, setting) if i is not None)
+    words = ' '.join(sentences[i] for i in chosen).split()
+    scene = ' '.join(words[:max_words])
+    if len(words) > max_words:
+        scene = scene.rstrip(',;:') + '...'
+
+    parts = [scene]
+    if characters:
+        parts.append(f"Characters: {', '.join(characters)}.")
+    parts.append(style_suffix)
+    return ' '.join(parts)
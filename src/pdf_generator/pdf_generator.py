@@ -1,30 +1,42 @@
+import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from reportlab.lib.pagesizes import letter
+from reportlab.lib import pagesizes
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet
-from src.utils.file_utils import ensure_output_dir
+from xml.sax.saxutils import escape
+from src.utils.file_utils import ensure_output_dir, story_title
+from src.utils.manifest import manifest_for, hash_text, in_directory
+from src.utils.image_utils import index_story_images, story_images
+from src.utils.image_derivatives import configure_image_derivatives, get_image_derivatives, report_savings
 
-def add_text_to_pdf(story, flow):
+def add_text_to_pdf(story, flow, style=None):
     """
     Adds formatted text to the PDF.
 
     Args:
         story (str): The story text to add.
         flow (list): The list of elements to be added to the PDF.
+        style (ParagraphStyle): Paragraph style to use (default: None, the sample 'Normal' style).
     """
-    styles = getSampleStyleSheet()
+    if style is None:
+        style = getSampleStyleSheet()['Normal']
     paragraphs = story.split('\n\n')  # Split into paragraphs
     for paragraph in paragraphs:
-        flow.append(Paragraph(paragraph, styles['Normal']))
+        flow.append(Paragraph(paragraph, style))
         flow.append(Spacer(1, 12))  # Add spacing between paragraphs
 
 def add_image_to_pdf(image_path, flow, width=400, height=300):
     """
     Adds an image to the PDF.
 
+    A display-sized copy of the image (see image_derivatives.py) is embedded instead of
+    the full-resolution original.
+
     Args:
         image_path (str): Path to the image file.
         flow (list): The list of elements to be added to the PDF.
@@ -32,12 +44,176 @@ def add_image_to_pdf(image_path, flow, width=400, height=300):
         height (int): Height of the image in the PDF.
     """
     if os.path.exists(image_path):
-        flow.append(Image(image_path, width=width, height=height))
+        # lazy=2 releases the decoded image as soon as it has been drawn.
+        flow.append(Image(get_image_derivatives().derive(image_path, width, height), width=width, height=height,
+                          lazy=2))
         flow.append(Spacer(1, 12))  # Add spacing after the image
     else:
         print(f"Image not found: {image_path}")
 
-def create_pdf_for_story(story_path, images_dir, output_dir):
+def resolve_page_size(page_size):
+    """
+    Returns the (width, height) in points for a page size name from the config, such as
+    "letter" or "A4". Names are case-insensitive; "A4-landscape" turns the page sideways.
+    """
+    name = str(page_size).strip()
+    landscape = name.lower().endswith('-landscape')
+    if landscape:
+        name = name[:-len('-landscape')]
+    size = getattr(pagesizes, name.upper(), None) or getattr(pagesizes, name.lower(), None)
+    if not isinstance(size, tuple):
+        raise ValueError(f"Unknown page size {page_size!r}; use a ReportLab name such as 'letter' or 'A4'.")
+    return pagesizes.landscape(size) if landscape else size
+
+def story_flowables(story, image_paths, style=None):
+    """
+    Returns the flowables for one story: its paragraphs followed by its images.
+    """
+    flow = []
+    add_text_to_pdf(story, flow, style=style)
+    for image_path in image_paths:
+        add_image_to_pdf(image_path, flow)
+    return flow
+
+def render_anthology(story_paths, images_dir, output_path, page_size='letter', title="Story Anthology",
+                     themes=None):
+    """
+    Renders many stories into one PDF in a single build.
+
+    The document opens with a contents section that links to every story, and each
+    story starts on a new page with a heading and an entry in the PDF outline (the
+    bookmarks pane). The contents are laid out before the stories, so their page
+    numbers are drawn as forms that each story fills in when its first page is
+    drawn; no second layout pass is needed.
+
+    Flowables are created one story at a time as the layout reaches it (see
+    _LazyFlow), so only the current story's text and images are held in memory,
+    however many stories there are; what grows with the anthology is ReportLab's
+    record of the finished pages, a few KB each. Images are drawn by content digest,
+    so an image used by several stories (e.g. duplicate themes) is stored in the
+    file once.
+
+    Args:
+        story_paths (list): Story text files, in reading order.
+        images_dir (str): Directory containing images for the stories.
+        output_path (str): Path of the PDF to create.
+        page_size (str): Page size name from the config (default: 'letter').
+        title (str): Document title, used for the metadata and the contents heading.
+        themes (dict): Story path -> theme, for headings of stories without a title line (default: None).
+
+    Returns:
+        dict: 'stories', 'pages', 'images' (placed) and 'unique_images' (embedded).
+    """
+    directory = os.path.dirname(output_path)
+    if directory:
+        ensure_output_dir(directory)
+    doc = SimpleDocTemplate(output_path, pagesize=resolve_page_size(page_size), title=title, pageCompression=1)
+    styles = getSampleStyleSheet()
+    body_style = styles['Normal']
+    image_index = index_story_images(images_dir)
+    counts = {'images': 0}
+    unique_images = set()
+
+    def read_story(story_path):
+        with open(story_path, 'r', encoding='utf-8') as file:
+            story = file.read()
+        return story, story_title(story_path, story, (themes or {}).get(story_path))
+
+    def groups():
+        yield [_StoryAnchor('contents', 'Contents'), Paragraph(escape(title), styles['Title']),
+               Paragraph("Contents", styles['Heading1'])]
+        for number, story_path in enumerate(story_paths, start=1):
+            yield [_ContentsRow(f"story-{number}", read_story(story_path)[1], body_style)]
+        yield [PageBreak()]
+        for number, story_path in enumerate(story_paths, start=1):
+            story, heading = read_story(story_path)
+            image_paths = story_image_paths(story_path, images_dir, image_index)
+            story_flow = story_flowables(story, image_paths, body_style)
+            counts['images'] += len(image_paths)
+            unique_images.update(flow_item.filename for flow_item in story_flow if isinstance(flow_item, Image))
+            yield [_StoryAnchor(f"story-{number}", heading, body_style),
+                   Paragraph(escape(heading), styles['Heading1'])] + story_flow + [PageBreak()]
+
+    doc.build(_LazyFlow(groups()))
+    return {'stories': len(story_paths), 'pages': doc.page, 'images': counts['images'],
+            'unique_images': len(unique_images)}
+
+class _LazyFlow(list):
+    """
+    Flowable list for doc.build() that refills itself from an iterator of flowable
+    groups whenever it runs low, so the layout only ever holds the group it is placing.
+    """
+    def __init__(self, groups):
+        super().__init__()
+        self.groups = iter(groups)
+
+    def __len__(self):
+        # doc.build() checks the length before taking every flowable from the front.
+        while super().__len__() < 2:
+            group = next(self.groups, None)
+            if group is None:
+                break
+            self.extend(group)
+        return super().__len__()
+
+def _page_form(anchor):
+    return f"page-{anchor}"
+
+# Width kept free for the page numbers at the end of every contents row.
+CONTENTS_NUMBER_WIDTH = 48
+
+class _StoryAnchor(Flowable):
+    """
+    Zero-size flowable that marks where a story starts: it adds a named destination and
+    an outline entry, and fills in the page-number form used by its contents row.
+    """
+    def __init__(self, anchor, heading, number_style=None):
+        super().__init__()
+        self.anchor = anchor
+        self.heading = heading
+        self.number_style = number_style
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.anchor)
+        self.canv.addOutlineEntry(self.heading, self.anchor, level=0)
+        if self.number_style is not None:
+            style = self.number_style
+            self.canv.beginForm(_page_form(self.anchor), lowerx=-CONTENTS_NUMBER_WIDTH, lowery=-style.fontSize,
+                                upperx=0, uppery=style.leading)
+            self.canv.setFont(style.fontName, style.fontSize)
+            self.canv.setFillColor(colors.grey)
+            self.canv.drawRightString(0, 0, str(self.canv.getPageNumber()))
+            self.canv.endForm()
+
+class _ContentsRow(Flowable):
+    """
+    One contents row: a link to a story and, right-aligned, the page it starts on. The
+    page is not known yet when the row is drawn, so the row draws a form that the
+    story's _StoryAnchor defines later.
+    """
+    def __init__(self, anchor, heading, style):
+        super().__init__()
+        self.anchor = anchor
+        self.style = style
+        self.link = Paragraph(f'<a href="#{anchor}" color="blue">{escape(heading)}</a>', style)
+
+    def wrap(self, available_width, available_height):
+        self.width = available_width
+        self.height = self.link.wrap(available_width - CONTENTS_NUMBER_WIDTH, available_height)[1]
+        return self.width, self.height
+
+    def draw(self):
+        self.link.drawOn(self.canv, 0, 0)
+        self.canv.saveState()
+        # Baseline of the link's first line
+        self.canv.translate(self.width, self.height - self.style.fontSize)
+        self.canv.doForm(_page_form(self.anchor))
+        self.canv.restoreState()
+
+def create_pdf_for_story(story_path, images_dir, output_dir, page_size='letter', image_paths=None, theme=None):
     """
     Creates a PDF for a single story, including text and images.
 
@@ -45,51 +221,291 @@ def create_pdf_for_story(story_path, images_dir, output_dir):
         story_path (str): Path to the story text file.
         images_dir (str): Directory containing images for the story.
         output_dir (str): Directory to save the generated PDF.
+        page_size (str): Page size name from the config (default: 'letter').
+        image_paths (list): The story's images (default: None, looked up in `images_dir`).
+        theme (str): The story's theme, for the document title (default: None).
+
+    Returns:
+        str: Path to the created PDF.
     """
     ensure_output_dir(output_dir)
 
     # Extract story name from file path
     story_name = os.path.splitext(os.path.basename(story_path))[0]
-    pdf_filename = f"{story_name}.pdf"
-    pdf_path = os.path.join(output_dir, pdf_filename)
-
-    # Create PDF
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    flow = []
-
-    # Add story text to PDF
+    pdf_path = os.path.join(output_dir, f"{story_name}.pdf")
     with open(story_path, 'r', encoding='utf-8') as file:
         story = file.read()
-        add_text_to_pdf(story, flow)
-
-    # Add images to PDF
-    image_prefix = os.path.splitext(story_name)[0]
-    for i in range(1, 3):  # Assuming 1-2 images per story
-        image_filename = f"{image_prefix}_image_{i}.png"
-        image_path = os.path.join(images_dir, image_filename)
-        if os.path.exists(image_path):
-            add_image_to_pdf(image_path, flow)
+    if image_paths is None:
+        image_paths = story_image_paths(story_path, images_dir)
+    flow = story_flowables(story, image_paths)
 
     # Build PDF
+    start = time.perf_counter()
+    doc = SimpleDocTemplate(pdf_path, pagesize=resolve_page_size(page_size),
+                            title=story_title(story_path, story, theme))
     doc.build(flow)
-    print(f"PDF created: {pdf_path}")
+    print(f"PDF created: {pdf_path} ({os.path.getsize(pdf_path) / 1024:.1f} KB, "
+          f"built in {(time.perf_counter() - start) * 1000:.0f} ms)")
+    return pdf_path
+
+def story_image_paths(story_path, images_dir, image_index=None):
+    """
+    Returns the image files for a story in variant order, as recorded when they were generated.
 
-def create_pdfs_for_all_stories(stories_dir, images_dir, output_dir):
+    Pass the result of index_story_images(images_dir) as `image_index` when looking up
+    many stories, so the directory is listed once instead of probed per story.
+    """
+    return story_images(story_path, images_dir, image_index=image_index)
+
+def pdf_dependencies(manifest, story_path, images_dir, page_size, image_index=None):
+    """
+    Collects the hashes a story's PDF depends on.
+
+    File hashes come from the manifest's hash cache, so only files whose size or
+    modification time changed are read.
+
+    Args:
+        manifest (RunManifest): Manifest of the stories directory.
+        story_path (str): Path to the story text file.
+        images_dir (str): Directory containing images for the stories.
+        page_size (str): Page size name from the config.
+        image_index (dict): Result of index_story_images(images_dir) (default: None).
+
+    Returns:
+        dict: 'story' (hash of the text), 'theme' (the recorded theme, for the title),
+        'images' (image path -> hash, in page order) and 'template' (page size and image
+        derivative settings).
+    """
+    return {
+        'story': manifest.file_hash(story_path),
+        'theme': manifest.theme_for_story(story_path),
+        'images': {path: manifest.file_hash(path)
+                   for path in story_image_paths(story_path, images_dir, image_index)},
+        'template': {'page_size': page_size, 'images': get_image_derivatives().settings_key()},
+    }
+
+def rebuild_reason(record, dependencies, output_dir=None):
+    """
+    Explains why a PDF has to be rebuilt.
+
+    Args:
+        record (dict): The PDF's manifest record, or None if it was never built.
+        dependencies (dict): Current result of pdf_dependencies.
+        output_dir (str): Directory the PDF belongs in (default: None, anywhere).
+
+    Returns:
+        str: A short reason, or None if the recorded PDF is up to date.
+    """
+    if not record:
+        return "new story"
+    if record.get('status') != 'done':
+        return "previous build failed"
+    if not all(os.path.exists(path) for path in record.get('paths', [])):
+        return "PDF is missing"
+    if output_dir and not all(in_directory(path, output_dir) for path in record.get('paths', [])):
+        return "PDF was built in another directory"
+    previous = record.get('dependencies')
+    if not previous:
+        return "no recorded dependencies"
+    changed = []
+    if previous.get('story') != dependencies['story']:
+        changed.append("story text")
+    if previous.get('theme') != dependencies['theme']:
+        changed.append("theme")
+    if previous.get('images') != dependencies['images']:
+        changed.append("images")
+    if previous.get('template') != dependencies['template']:
+        changed.append("template settings")
+    return f"{' and '.join(changed)} changed" if changed else None
+
+def init_pdf_worker(derivative_settings):
+    """
+    Runs once in every worker process: gives it the same image derivative settings as the parent.
+    """
+    configure_image_derivatives(**derivative_settings)
+
+def render_pdf_job(job):
+    """
+    Builds one PDF. Runs in a worker process in process-pool mode, so it only receives
+    paths and returns plain values.
+
+    Args:
+        job (tuple): (story_path, images_dir, output_dir, page_size, image_paths, theme).
+            The image paths and theme come from pdf_dependencies in the parent, whose
+            manifest is up to date, rather than from the worker's copy of it.
+
+    Returns:
+        dict: 'story_path', 'pdf_path' (None on failure), 'seconds', 'error' and the
+        image derivative counters for this PDF.
+    """
+    story_path, images_dir, output_dir, page_size, image_paths, theme = job
+    derivatives = get_image_derivatives()
+    before = derivatives.stats()
+    start = time.perf_counter()
+    pdf_path, error = None, None
+    try:
+        pdf_path = create_pdf_for_story(story_path, images_dir, output_dir, page_size, image_paths, theme)
+    except Exception as e:
+        error = str(e)
+    after = derivatives.stats()
+    return {
+        'story_path': story_path,
+        'pdf_path': pdf_path,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+        'derivatives': {name: after[name] - before[name] for name in after},
+    }
+
+def record_pdf_result(manifest, key, dependencies, result):
+    """
+    Records the outcome of render_pdf_job in the run manifest.
+
+    Args:
+        manifest (RunManifest): Manifest of the stories directory.
+        key (str): The story's theme key.
+        dependencies (dict): The pdf_dependencies the PDF was built from.
+        result (dict): Result of render_pdf_job.
+    """
+    input_hash = hash_text(json.dumps(dependencies, sort_keys=True))
+    if result['pdf_path']:
+        manifest.record('pdf', key, input_hash, [result['pdf_path']], dependencies=dependencies,
+                        seconds=round(result['seconds'], 3))
+    else:
+        print(f"Error creating PDF for {os.path.basename(result['story_path'])}: {result['error']}")
+        manifest.record('pdf', key, input_hash, status='failed', dependencies=dependencies,
+                        error=result['error'])
+
+def create_pdfs_for_all_stories(stories_dir, images_dir, output_dir, max_workers=1, page_size='letter',
+                                dry_run=False):
     """
     Creates PDFs for all stories in the stories directory.
 
+    Each PDF's dependencies (the hashes of its story text and images, and the template
+    settings) are recorded in the run manifest, and only PDFs whose dependencies changed
+    are rebuilt. With max_workers > 1 the PDFs are laid out in a pool of worker processes, since
+    ReportLab layout is CPU-bound and holds the GIL.
+
     Args:
         stories_dir (str): Directory containing story text files.
         images_dir (str): Directory containing images for the stories.
         output_dir (str): Directory to save the generated PDFs.
+        max_workers (int): Worker processes; 1 builds in this process and None uses one per
+            CPU core (default: 1).
+        page_size (str): Page size name from the config, e.g. 'letter' or 'A4' (default: 'letter').
+        dry_run (bool): Only list the PDFs that would be rebuilt and why (default: False).
+
+    Returns:
+        list: One dict per story that was built, with 'story_path', 'pdf_path' (None on
+        failure), 'seconds' and 'error'. With dry_run, one dict per story that would be
+        built, with 'story_path' and 'reason'.
     """
-    ensure_output_dir(output_dir)
+    resolve_page_size(page_size)  # Fail early on a misspelt page size
+    manifest = manifest_for(stories_dir)
+    derivatives = get_image_derivatives()
+    before = derivatives.stats()
 
-    for filename in os.listdir(stories_dir):
+    check_start = time.perf_counter()
+    image_index = index_story_images(images_dir)
+    pending = {}
+    up_to_date = 0
+    for filename in sorted(os.listdir(stories_dir)):
         if filename.endswith('.txt'):
             story_path = os.path.join(stories_dir, filename)
-            create_pdf_for_story(story_path, images_dir, output_dir)
+            key = manifest.key_for_story(filename)
+            dependencies = pdf_dependencies(manifest, story_path, images_dir, page_size, image_index)
+            reason = rebuild_reason(manifest.get('pdf', key), dependencies, output_dir)
+            if reason is None:
+                up_to_date += 1
+                continue
+            print(f"{'Would rebuild' if dry_run else 'Rebuilding'} PDF for {filename}: {reason}.")
+            pending[story_path] = (key, dependencies, reason)
+    print(f"Checked {len(pending) + up_to_date} PDF(s) in {(time.perf_counter() - check_start) * 1000:.0f} ms: "
+          f"{len(pending)} to rebuild, {up_to_date} up to date.")
+    if dry_run:
+        # A dry run leaves the manifest on disk untouched.
+        return [{'story_path': story_path, 'reason': reason} for story_path, (_, _, reason) in pending.items()]
+    # Keep the hashes read during the check for the next run.
+    manifest.save()
+    ensure_output_dir(output_dir)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    jobs = [(story_path, images_dir, output_dir, page_size, list(dependencies['images']), dependencies['theme'])
+            for story_path, (_, dependencies, _) in pending.items()]
+    start = time.perf_counter()
+    if max_workers > 1 and len(jobs) > 1:
+        workers = min(max_workers, len(jobs))
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_pdf_worker,
+                                 initargs=(derivatives.settings(),)) as executor:
+            results = list(executor.map(render_pdf_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        workers = 1
+        results = [render_pdf_job(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+
+    totals = dict(before)
+    failed = 0
+    for result in results:
+        key, dependencies, _ = pending[result['story_path']]
+        record_pdf_result(manifest, key, dependencies, result)
+        if not result['pdf_path']:
+            failed += 1
+        for name, value in result['derivatives'].items():
+            totals[name] += value
+    manifest.save()
+
+    if results:
+        print(f"Built {len(results) - failed} PDF(s) in {elapsed:.1f} s with {workers} process(es) "
+              f"({sum(r['seconds'] for r in results) / len(results) * 1000:.0f} ms per PDF; "
+              f"{failed} failed, {up_to_date} up to date).")
+    report_savings("PDF images", before, totals)
+    return [{name: result[name] for name in ('story_path', 'pdf_path', 'seconds', 'error')} for result in results]
+
+def create_anthology_pdf(stories_dir, images_dir, output_path, page_size='letter', title="Story Anthology"):
+    """
+    Creates one PDF containing every story in the stories directory, with a linked
+    contents section and an outline entry per story.
+
+    The anthology is recorded in the run manifest and only rebuilt when a story, an
+    image or a setting changed.
+
+    Args:
+        stories_dir (str): Directory containing story text files.
+        images_dir (str): Directory containing images for the stories.
+        output_path (str): Path of the PDF to create.
+        page_size (str): Page size name from the config, e.g. 'letter' or 'A4' (default: 'letter').
+        title (str): Title of the anthology (default: "Story Anthology").
+
+    Returns:
+        str: Path to the anthology PDF, or None if no stories were found.
+    """
+    manifest = manifest_for(stories_dir)
+    derivatives = get_image_derivatives()
+    story_paths = [os.path.join(stories_dir, filename)
+                   for filename in sorted(os.listdir(stories_dir)) if filename.endswith('.txt')]
+    if not story_paths:
+        print(f"No stories found in {stories_dir}.")
+        return None
+
+    image_index = index_story_images(images_dir)
+    themes = {story_path: manifest.theme_for_story(story_path) for story_path in story_paths}
+    parts = [page_size, title, derivatives.settings_key()]
+    for story_path in story_paths:
+        parts.extend([manifest.file_hash(story_path), themes[story_path] or ''])
+        parts.extend(manifest.file_hash(path) for path in story_image_paths(story_path, images_dir, image_index))
+    input_hash = hash_text(*parts)
+    key = f"anthology:{os.path.basename(output_path)}"
+    if manifest.is_fresh('anthology', key, input_hash, os.path.dirname(os.path.abspath(output_path))):
+        print(f"Anthology {output_path} is up to date.")
+        return output_path
+
+    start = time.perf_counter()
+    result = render_anthology(story_paths, images_dir, output_path, page_size, title, themes)
+    manifest.record('anthology', key, input_hash, [output_path])
+    manifest.save()
+    print(f"Anthology created: {output_path} ({result['stories']} stories, {result['pages']} pages, "
+          f"{result['unique_images']} unique of {result['images']} images, "
+          f"{os.path.getsize(output_path) / 1024:.1f} KB, built in {time.perf_counter() - start:.1f} s)")
+    return output_path
 
 if __name__ == "__main__":
     # Paths and parameters
@@ -97,5 +513,5 @@ if __name__ == "__main__":
     images_dir = 'data/output/images'
     pdfs_dir = 'data/output/pdfs'
 
-    # Create PDFs for all stories
-    create_pdfs_for_all_stories(stories_dir, images_dir, pdfs_dir)
+    # Create PDFs for all stories; pass --dry-run to only list what would be rebuilt
+    create_pdfs_for_all_stories(stories_dir, images_dir, pdfs_dir, dry_run='--dry-run' in sys.argv)
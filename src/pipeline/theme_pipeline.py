@@ -0,0 +1,300 @@
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.utils.concurrency import StageEvent, StageScheduler
+from src.utils.dedup import ThemeDeduplicator
+from src.utils.file_utils import iter_themes
+from src.utils.image_derivatives import get_image_derivatives
+from src.utils.image_utils import story_images, variant_prompt
+from src.utils.manifest import manifest_for, theme_key, hash_text
+from src.utils.usage_stats import UsageStats
+from src.story_generator.story_generator import generate_story_for_theme, share_story_for_theme
+from src.image_generator.image_generator import (generate_story_image, images_input_hash, prompt_for_story,
+                                                 record_story_images)
+from src.pdf_generator.pdf_generator import (init_pdf_worker, pdf_dependencies, rebuild_reason, record_pdf_result,
+                                             render_pdf_job, resolve_page_size)
+from src.ppt_generator.ppt_generator import create_ppt_for_story, ppt_input_hash, template_key
+
+STAGES = ('story', 'prompt', 'image', 'pdf', 'ppt')
+# Story and prompt generators the pipeline can run. The Gemini modules
+# (*_google_api.py) have no per-theme helpers and only run through the staged steps.
+PROVIDERS = ('groq',)
+
+
+class _Theme:
+    """
+    Progress of one theme through its stages.
+    """
+    def __init__(self, idx, theme):
+        self.item = (idx, theme)
+        self.tasks = 0  # Submitted tasks whose events have not been read yet
+        self.lock = threading.Lock()
+        self.result = {'story': None, 'images': [], 'pdf': None, 'ppt': None, 'errors': []}
+        self.duplicates = []  # Duplicate themes that reuse this theme's story
+        self.shared = False  # Whether the duplicates have been sent on with the story
+
+
+def _start_pdf_processes(workers):
+    """
+    Starts a pool of PDF worker processes, all of them before any pipeline thread runs,
+    so no worker is forked while another thread holds a lock.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_pdf_worker,
+                                   initargs=(get_image_derivatives().settings(),))
+    for future in [executor.submit(os.getpid) for _ in range(workers)]:
+        future.result()
+    return executor
+
+
+def run_theme_pipeline(input_file, stories_dir, images_dir, pdfs_dir=None, ppts_dir=None, workers=None,
+                       target_age="5-12", word_count=200, use_cache=True, image_options=None,
+                       page_size='letter', max_words_per_slide=450, template_path=None, story_timeout=None,
+                       dedup_threshold=None, provider='groq'):
+    """
+    Generates the story, images and documents of every theme, streaming each theme
+    through its stages on its own.
+
+    Every theme is a small chain of tasks: story -> image prompt -> image variants ->
+    PDF and PPTX. Each kind of stage has its own workers, and a theme's next stage is
+    submitted as soon as its previous one finishes, so the first documents are ready
+    after one story, one prompt and one set of images rather than after every image of
+    the batch. Work recorded as up to date in the run manifest is skipped, exactly as in
+    generate_stories_from_themes, generate_images_for_stories, create_pdfs_for_all_stories
+    and create_ppts_for_all_stories, which can be used interchangeably with this runner.
+
+    With `dedup_threshold` set, themes are grouped as in generate_stories_from_themes
+    (while they are read at 1.0, after reading the whole file below it): only the
+    representative of each group is sent to the LLM, and its duplicates continue with a
+    copy of its story once it is written.
+
+    Stories are generated one request per theme; the batch story and prompt modes and
+    token streaming are only available through the stage-by-stage functions.
+
+    Args:
+        input_file (str): Excel, CSV or Parquet file with a Theme column.
+        stories_dir (str): Directory for the stories.
+        images_dir (str): Directory for the images.
+        pdfs_dir (str): Directory for one PDF per story (default: None, no PDFs).
+        ppts_dir (str): Directory for one PPTX per story (default: None, no PPTX files).
+        workers (dict): Concurrent tasks per stage, keyed by the names in STAGES (default:
+            1 each). More than one 'pdf' worker lays PDFs out in worker processes, and
+            None uses one per CPU core, as in create_pdfs_for_all_stories.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for each story (default: 200).
+        use_cache (bool): Reuse cached LLM responses and images (default: True).
+        image_options (dict): Keyword arguments of generate_images_for_stories, e.g. from
+            config.image_options. Only image_per_story, width, height, image_format,
+            image_quality, png_compress_level, seed, prompt_mode, variant_styles and
+            max_variants apply; the worker and batching settings come from `workers`.
+        page_size (str): PDF page size name (default: 'letter').
+        max_words_per_slide (int): Maximum words per PPTX slide (default: 450).
+        template_path (str): .pptx template for the decks (default: None, the python-pptx default).
+        story_timeout (float): Seconds before a story request is given up (default: None,
+            STORY_REQUEST_TIMEOUT).
+        dedup_threshold (float): Shingle similarity (0-1) at which themes are treated as
+            duplicates; 1.0 merges only identical wording (default: None, no grouping).
+        provider (str): Story and prompt generators to use; only 'groq' is supported
+            (default: 'groq').
+
+    Yields:
+        StageEvent: One per finished task, with stage 'story' (story path), 'prompt'
+        (prompt text), 'image' ((image path, variant) pair), 'pdf' (result of
+        render_pdf_job) or 'ppt' (PPTX path), and one with stage 'theme' when all of a
+        theme's work is finished. Its result is a dict with the theme's 'story',
+        'images', 'pdf' and 'ppt' paths, including ones that were already up to date, and
+        the 'errors' of its failed tasks. Items are (theme number, theme) pairs.
+
+    Raises:
+        ValueError: If `provider` or the prompt mode is not supported.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"The streaming pipeline only supports the {', '.join(PROVIDERS)} generators, not "
+                         f"{provider!r}; use pipeline_mode 'staged' with the *_google_api modules.")
+    options = dict(image_options or {})
+    image_per_story = options.get('image_per_story', 1)
+    max_variants = options.get('max_variants')
+    if max_variants and image_per_story > max_variants:
+        print(f"Limiting image_per_story from {image_per_story} to {max_variants} variants per story.")
+        image_per_story = max_variants
+    prompt_mode = options.get('prompt_mode', 'llm')
+    if prompt_mode not in ("llm", "local"):
+        raise ValueError(f"Unknown prompt_mode {prompt_mode!r}; expected 'llm' or 'local'.")
+    variant_styles = list(options.get('variant_styles') or [])
+    image_settings = (options.get('width'), options.get('height'), options.get('image_format', 'png'),
+                      options.get('image_quality', 90), options.get('png_compress_level', 6))
+    seed = options.get('seed')
+    if pdfs_dir:
+        resolve_page_size(page_size)  # Fail early on a misspelt page size
+    template = template_key(template_path) if ppts_dir else None
+
+    manifest = manifest_for(stories_dir)
+    usage = UsageStats(label="streaming pipeline")
+    stage_workers = dict({stage: 1 for stage in STAGES}, **(workers or {}))
+    if pdfs_dir:
+        pdf_workers = stage_workers['pdf'] or os.cpu_count() or 1
+        stage_workers['pdf'] = _start_pdf_processes(pdf_workers) if pdf_workers > 1 else 1
+    scheduler = StageScheduler(stage_workers)
+
+    def submit(state, stage, func, *args, then=None):
+        with state.lock:
+            state.tasks += 1
+        scheduler.submit(stage, func, *args, item=state.item, then=then)
+
+    def share_story(duplicate, story_path):
+        submit(duplicate, 'story', share_story_for_theme, story_path, duplicate.item[1], stories_dir,
+               target_age, word_count, usage, then=lambda path: story_done(duplicate, path))
+
+    def story_done(state, story_path):
+        if not story_path:
+            raise RuntimeError("no story was generated")
+        with state.lock:
+            # Duplicates read after this point are sent on by add_duplicate instead.
+            state.result['story'] = story_path
+            state.shared = True
+            duplicates = list(state.duplicates)
+        for duplicate in duplicates:
+            share_story(duplicate, story_path)
+        with open(story_path, 'r', encoding='utf-8') as file:
+            story = file.read()
+        state.key = manifest.key_for_story(story_path)
+        state.story_hash = hash_text(story)
+        state.images_hash = images_input_hash(state.story_hash, image_per_story, *image_settings, seed,
+                                              variant_styles)
+        if not image_per_story or manifest.is_fresh('images', state.key, state.images_hash, images_dir):
+            start_documents(state)
+            return
+        submit(state, 'prompt', prompt_for_story, story, state.key, manifest, prompt_mode, use_cache, usage,
+               then=lambda prompt: prompt_done(state, prompt))
+
+    def prompt_done(state, prompt):
+        state.paths = [None] * image_per_story
+        state.variants = [None] * image_per_story
+        state.remaining = image_per_story
+        for i in range(image_per_story):
+            submit(state, 'image', generate_story_image, os.path.basename(state.result['story']),
+                   state.story_hash, i, variant_prompt(prompt, i, variant_styles), images_dir, *image_settings,
+                   seed, use_cache, then=lambda result, i=i: image_done(state, i, result))
+
+    def image_done(state, i, result):
+        with state.lock:
+            state.paths[i], state.variants[i] = result
+            state.remaining -= 1
+            finished = state.remaining == 0
+        if finished:
+            record_story_images(manifest, state.key, state.images_hash, state.paths, state.variants)
+            start_documents(state)
+
+    def start_documents(state):
+        story_path = state.result['story']
+        image_paths = story_images(story_path, images_dir)
+        state.result['images'] = image_paths
+        if pdfs_dir:
+            dependencies = pdf_dependencies(manifest, story_path, images_dir, page_size)
+            record = manifest.get('pdf', state.key)
+            if rebuild_reason(record, dependencies, pdfs_dir) is None:
+                state.result['pdf'] = record['paths'][0]
+            else:
+                job = (story_path, images_dir, pdfs_dir, page_size, list(dependencies['images']),
+                       dependencies['theme'])
+                submit(state, 'pdf', render_pdf_job, job,
+                       then=lambda result: pdf_done(state, dependencies, result))
+        if ppts_dir:
+            input_hash = ppt_input_hash(manifest, story_path, image_paths, max_words_per_slide, template)
+            if manifest.is_fresh('ppt', state.key, input_hash, ppts_dir):
+                state.result['ppt'] = manifest.get('ppt', state.key)['paths'][0]
+            else:
+                submit(state, 'ppt', create_ppt_for_story, story_path, images_dir, ppts_dir, max_words_per_slide,
+                       template_path, image_paths, manifest.theme_for_story(story_path), then=lambda ppt_path: ppt_done(state, input_hash, ppt_path))
+
+    def pdf_done(state, dependencies, result):
+        record_pdf_result(manifest, state.key, dependencies, result)
+        if not result['pdf_path']:
+            raise RuntimeError(result['error'])
+        state.result['pdf'] = result['pdf_path']
+
+    def ppt_done(state, input_hash, ppt_path):
+        manifest.record('ppt', state.key, input_hash, [ppt_path])
+        state.result['ppt'] = ppt_path
+
+    deduplicator = ThemeDeduplicator(dedup_threshold) if dedup_threshold is not None else None
+
+    def add_duplicate(state, duplicate):
+        with state.lock:
+            state.duplicates.append(duplicate)
+            shared = state.shared
+        if shared:
+            share_story(duplicate, state.result['story'])
+
+    def unique_themes():
+        seen_keys = set()
+        for idx, theme in enumerate(iter_themes(input_file), start=1):
+            key = theme_key(theme)
+            if key in seen_keys:
+                # Same theme repeated with different spacing or case.
+                continue
+            seen_keys.add(key)
+            yield idx, theme, key
+
+    themes = {}
+    try:
+        unique = unique_themes()
+        duplicate_keys = set()
+        if deduplicator and deduplicator.needs_all_themes:
+            # Near-duplicate groups depend on every theme, so the file is read before generation
+            # starts, and every duplicate is attached before its representative's story can finish.
+            unique = list(unique)
+            themes = {key: _Theme(idx, theme) for idx, theme, key in unique}
+            representatives = deduplicator.group([theme for _, theme, _ in unique])
+            for (_, _, key), representative in zip(unique, representatives):
+                representative_key = theme_key(representative)
+                if representative_key != key:
+                    themes[representative_key].duplicates.append(themes[key])
+                    duplicate_keys.add(key)
+        for idx, theme, key in unique:
+            state = themes.setdefault(key, _Theme(idx, theme))
+            if deduplicator and not deduplicator.needs_all_themes:
+                # Exact duplicates are found as the themes are read; one whose representative
+                # already has its story is sent on straight away.
+                representative_key = theme_key(deduplicator.representative(theme))
+                if representative_key != key:
+                    add_duplicate(themes[representative_key], state)
+                    continue
+            if key in duplicate_keys:
+                continue
+            submit(state, 'story', generate_story_for_theme, theme, stories_dir, target_age, word_count,
+                   use_cache, usage, story_timeout,
+                   then=lambda story_path, state=state: story_done(state, story_path))
+    except Exception:
+        scheduler.close()
+        raise
+    print(f"Found {len(themes)} themes in the input file.")
+    by_item = {state.item: state for state in themes.values()}
+
+    finished = 0
+    for event in scheduler.events():
+        yield event
+        state = by_item[event.item]
+        if event.error:
+            state.result['errors'].append(f"{event.stage}: {event.error}")
+        with state.lock:
+            state.tasks -= 1
+            done = state.tasks == 0
+        if done:
+            finished += 1
+            yield StageEvent('theme', state.item, state.result, '; '.join(state.result['errors']) or None,
+                             event.elapsed)
+            if not state.shared:
+                # The story failed, so its duplicates have nothing to continue with.
+                for duplicate in state.duplicates:
+                    finished += 1
+                    yield StageEvent('theme', duplicate.item, duplicate.result,
+                                     f"story: no story for its representative theme {state.item[1]!r}",
+                                     event.elapsed)
+    manifest.save()
+    print(f"Finished {finished} theme(s).")
+    if deduplicator:
+        print(f"De-duplication: {deduplicator.themes} themes in {deduplicator.groups} groups, "
+              f"{deduplicator.calls_saved} story calls saved.")
+    usage.report()
@@ -1,12 +1,31 @@
+import copy
+import hashlib
+import io
 import os
+import re
 import sys
+import threading
+import time
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from pptx import Presentation
 from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
-from utils.file_utils import ensure_output_dir
+from lxml import etree
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, nsmap, qn
+from pptx.oxml.slide import CT_Slide
+from pptx.parts.image import Image as PptxImage, ImagePart
+from pptx.parts.slide import SlidePart
+from src.ppt_generator.pptx_package import DeckStory, read_story_index, write_deck
+from src.utils.concurrency import imap_ordered
+from src.utils.file_utils import ensure_output_dir, story_title
+from src.utils.manifest import manifest_for, hash_file, hash_text
+from src.utils.image_utils import index_story_images, story_images
+from src.utils.image_derivatives import get_image_derivatives, report_savings
 
 def set_font_size_12pt(text_frame):
     """
@@ -19,7 +38,279 @@ def set_font_size_12pt(text_frame):
         for run in paragraph.runs:
             run.font.size = Pt(12)
 
-def create_ppt_for_story(story_path, images_dir, output_dir, max_words_per_slide=450):
+def load_presentation(ppt_path):
+    """
+    Reads a PPTX file into memory in one call and parses it.
+    """
+    with open(ppt_path, 'rb') as file:
+        return Presentation(io.BytesIO(file.read()))
+
+_LINKS = etree.XPath('.//@r:id | .//@r:link', namespaces=nsmap('r'))
+_EMBEDDED = etree.XPath('.//*[@r:embed]', namespaces=nsmap('r'))
+
+class SlideCopier:
+    """
+    Copies slides from other presentations into one target presentation, in memory.
+
+    Shapes are copied as XML, so text keeps its paragraphs, runs and formatting. Images
+    are re-linked to image parts of the target, found by SHA-1 in a dictionary kept by the
+    copier (python-pptx's own lookup scans the whole package for every picture), so an
+    image used on several slides is stored once.
+
+    Slides and pictures are added through python-pptx internals that have no public
+    equivalent, so the python-pptx version is pinned in requirements.txt.
+    """
+    def __init__(self, prs):
+        self.prs = prs
+        self.package = prs.part.package
+        # Accessing prs.slides renames the slide parts to slide1.xml, slide2.xml, ... in order.
+        self._slide_count = len(prs.slides)
+        self._slide_ids = prs.part._element.get_or_add_sldIdLst()
+        self._next_slide_id = max([255] + [int(slide_id.id) for slide_id in self._slide_ids.sldId_lst]) + 1
+        self._blank_slide = CT_Slide.new()
+        self._image_parts = {}
+        self._next_image = 1
+        for part in self.package.iter_parts():
+            if isinstance(part, ImagePart) and part.partname.startswith('/ppt/media/'):
+                self._image_parts[part.sha1] = part
+                self._next_image = max(self._next_image, (part.partname.idx or 0) + 1)
+
+    def image_part(self, blob, filename=None):
+        """
+        Returns the target's image part for an image, adding one if the image is new.
+        """
+        sha1 = hashlib.sha1(blob).hexdigest()
+        part = self._image_parts.get(sha1)
+        if part is None:
+            image = PptxImage.from_blob(blob, filename)
+            partname = PackURI(f"/ppt/media/image{self._next_image}.{image.ext}")
+            part = ImagePart(partname, image.content_type, self.package, blob, filename)
+            self._next_image += 1
+            self._image_parts[sha1] = part
+        return part
+
+    def add_slide(self, slide_layout, placeholders=False):
+        """
+        Appends a slide using `slide_layout`, empty unless `placeholders` is set.
+
+        prs.slides.add_slide scans every existing slide to choose the new slide's part name,
+        relationship and id, which makes adding N slides O(N^2); the copier keeps count instead.
+        """
+        self._slide_count += 1
+        slide_part = SlidePart(PackURI(f"/ppt/slides/slide{self._slide_count}.xml"), CT.PML_SLIDE,
+                               self.package, copy.deepcopy(self._blank_slide))
+        slide_part.relate_to(slide_layout.part, RT.SLIDE_LAYOUT)
+        rId = self.prs.part._rels._add_relationship(RT.SLIDE, slide_part)
+        self._slide_ids._add_sldId(id=self._next_slide_id, rId=rId)
+        self._next_slide_id += 1
+        if placeholders:
+            slide_part.slide.shapes.clone_layout_placeholders(slide_layout)
+        return slide_part.slide
+
+    def add_picture(self, slide, image_path, left, top, width, height):
+        """
+        Adds a picture to a slide, storing each distinct image once per presentation.
+        """
+        with open(image_path, 'rb') as file:
+            image_part = self.image_part(file.read(), os.path.basename(image_path))
+        rId = slide.part.relate_to(image_part, RT.IMAGE)
+        slide.shapes._add_pic_from_image_part(image_part, rId, left, top, width, height)
+
+    def copy_slide(self, slide):
+        """
+        Appends a copy of a slide from another presentation.
+
+        The copy uses the layout at the same position in the target. Shapes that refer to
+        anything other than images (charts, media, hyperlinks) are left out.
+
+        Args:
+            slide: Slide to copy.
+
+        Returns:
+            The new slide.
+        """
+        source_layouts = slide.slide_layout.slide_master.slide_layouts
+        layout_index = min(source_layouts.index(slide.slide_layout), len(self.prs.slide_layouts) - 1)
+        # The source slide's own shapes, placeholders included, are copied onto the empty slide.
+        new_slide = self.add_slide(self.prs.slide_layouts[layout_index])
+        tree = new_slide.shapes._spTree
+
+        for shape_element in slide.shapes._spTree.iter_shape_elms():
+            element = copy.deepcopy(shape_element)
+            if _LINKS(element):
+                continue
+            for node in _EMBEDDED(element):
+                source_rel = slide.part.rels[node.get(qn('r:embed'))]
+                if source_rel.is_external or source_rel.reltype != RT.IMAGE:
+                    break
+                image_part = self.image_part(source_rel.target_part.blob)
+                node.set(qn('r:embed'), new_slide.part.relate_to(image_part, RT.IMAGE))
+            else:
+                tree.insert_element_before(element, 'p:extLst')
+        return new_slide
+
+_TITLES = {PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE}
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+class DeckBuilder:
+    """
+    Builds story decks from a template that is loaded once.
+
+    The template is a .pptx file whose slide masters and layouts give the decks their
+    look (the python-pptx default when None). It is parsed once, and every deck is built
+    on the same presentation: once a deck has been saved its slides are removed again,
+    so the masters, layouts and theme are never re-read. Each layout is looked up by
+    name and its placeholders are cloned once, and text is written as runs that already
+    carry the deck's font size instead of being restyled run by run afterwards. A
+    builder holds one deck at a time, so use one builder per thread. Like SlideCopier, it
+    relies on the pinned python-pptx version's internals to remove slides.
+    """
+    # Layout role -> (layout name in the template, position used if the name is missing).
+    LAYOUTS = {'title': ('Title Slide', 0), 'content': ('Title and Content', 1), 'picture': ('Title Only', 5)}
+
+    def __init__(self, template_path=None, font_size=12):
+        self.template_path = template_path
+        self.prs = Presentation(template_path)
+        self._run = parse_xml(f'<a:r {nsdecls("a")}><a:rPr lang="en-US" sz="{int(font_size * 100)}" dirty="0"/>'
+                              f'<a:t/></a:r>')
+        self._paragraph = parse_xml(f'<a:p {nsdecls("a")}/>')
+        self._left_paragraph = parse_xml(f'<a:p {nsdecls("a")}><a:pPr algn="l"/></a:p>')
+        self.clear()
+
+        # Role -> (layout, placeholder elements, position of the title, position of the body).
+        self.layouts = {}
+        layouts = self.prs.slide_layouts
+        for role, (name, index) in self.LAYOUTS.items():
+            layout = next((layout for layout in layouts if layout.name == name), None)
+            layout = layout or layouts[min(index, len(layouts) - 1)]
+            slide = self.copier.add_slide(layout, placeholders=True)
+            shapes = list(slide.shapes)
+            title = next((i for i, shape in enumerate(shapes)
+                          if shape.placeholder_format.type in _TITLES), None)
+            body = next((i for i, shape in enumerate(shapes)
+                         if shape.placeholder_format.type not in _TITLES), None)
+            self.layouts[role] = (layout, [shape._element for shape in shapes], title, body)
+        self.clear()
+
+    def clear(self):
+        """
+        Removes every slide, leaving the template's masters and layouts for the next deck.
+        """
+        slide_ids = self.prs.slides._sldIdLst
+        for slide_id in list(slide_ids):
+            self.prs.part._rels.pop(slide_id.rId)
+            slide_ids.remove(slide_id)
+        self.copier = SlideCopier(self.prs)
+
+    def write_text(self, shape_element, text, align_left=False):
+        """
+        Replaces a shape's text with one paragraph per line, each holding a single styled run.
+        """
+        body = shape_element.txBody
+        for paragraph in body.p_lst:
+            body.remove(paragraph)
+        for line in _CONTROL_CHARS.sub('', text).split('\n'):
+            paragraph = copy.deepcopy(self._left_paragraph if align_left else self._paragraph)
+            if line:
+                run = copy.deepcopy(self._run)
+                run[-1].text = line
+                paragraph.append(run)
+            body.append(paragraph)
+
+    def add_slide(self, role):
+        """
+        Adds a slide with the layout for a role ('title', 'content' or 'picture').
+
+        Returns:
+            tuple: (slide, title placeholder element, subtitle or body placeholder element);
+            either element is None if the layout has no such placeholder.
+        """
+        layout, placeholders, title, body = self.layouts[role]
+        slide = self.copier.add_slide(layout)
+        tree = slide.shapes._spTree
+        elements = [copy.deepcopy(placeholder) for placeholder in placeholders]
+        for element in elements:
+            tree.insert_element_before(element, 'p:extLst')
+        return (slide, elements[title] if title is not None else None,
+                elements[body] if body is not None else None)
+
+    def add_story(self, story_path, images_dir, max_words_per_slide=450, image_paths=None, theme=None):
+        """
+        Adds a story's slides to the current deck: a title slide, the text split over
+        content slides, and one slide per image.
+
+        Args:
+            story_path (str): Path to the story text file.
+            images_dir (str): Directory containing images for the story.
+            max_words_per_slide (int): Maximum words per slide.
+            image_paths (list): The story's images, if already looked up (default: None).
+            theme (str): The story's theme, for the title slide (default: None).
+
+        Returns:
+            int: Number of slides added.
+        """
+        with open(story_path, 'r', encoding='utf-8') as file:
+            story = file.read()
+
+        # Title slide with the start of the story as a short description
+        slide, title, subtitle = self.add_slide('title')
+        if title is not None:
+            self.write_text(title, story_title(story_path, story, theme))
+        if subtitle is not None:
+            self.write_text(subtitle, story[:100])
+        slide_count = 1
+
+        # Content slides
+        words = story.split()
+        for i in range(0, len(words), max_words_per_slide):
+            slide, _, content = self.add_slide('content')
+            if content is not None:
+                self.write_text(content, " ".join(words[i:i + max_words_per_slide]), align_left=True)
+            slide_count += 1
+
+        # One image slide per generated variant, embedding a display-sized copy of the image
+        width, height = Inches(6), Inches(4.5)
+        if image_paths is None:
+            image_paths = story_images(story_path, images_dir)
+        for image_path in image_paths:
+            slide, _, _ = self.add_slide('picture')
+            left = top = Inches(1)
+            display_path = get_image_derivatives().derive(image_path, width.pt, height.pt)
+            self.copier.add_picture(slide, display_path, left, top, width, height)
+            slide_count += 1
+        return slide_count
+
+    def save(self, output_file):
+        """
+        Saves the current deck and starts a new, empty one.
+
+        Returns:
+            float: Seconds spent saving.
+        """
+        start = time.perf_counter()
+        try:
+            self.prs.save(output_file)
+        finally:
+            self.clear()
+        return time.perf_counter() - start
+
+_deck_builders = threading.local()
+
+def get_deck_builder(template_path=None):
+    """
+    Returns this thread's DeckBuilder for a template, creating it on first use.
+
+    Each thread keeps only the builder it used last, keyed by template_key, so asking for
+    another template or a template edited since replaces it rather than adding another.
+    """
+    key = template_key(template_path)
+    if getattr(_deck_builders, 'key', None) != key:
+        _deck_builders.builder = DeckBuilder(template_path)
+        _deck_builders.key = key
+    return _deck_builders.builder
+
+def create_ppt_for_story(story_path, images_dir, output_dir, max_words_per_slide=450, template_path=None,
+                         image_paths=None, theme=None):
     """
     Creates a PPTX file for a single story.
 
@@ -28,102 +319,260 @@ def create_ppt_for_story(story_path, images_dir, output_dir, max_words_per_slide
         images_dir (str): Directory containing images for the story.
         output_dir (str): Directory to save the generated PPTX.
         max_words_per_slide (int): Maximum words per slide.
+        template_path (str): .pptx template for the deck's look (default: None, the python-pptx default).
+        image_paths (list): The story's images (default: None, looked up in `images_dir`).
+        theme (str): The story's theme, for the title slide (default: None).
+
+    Returns:
+        str: Path to the created PPTX.
     """
     ensure_output_dir(output_dir)
     story_name = os.path.splitext(os.path.basename(story_path))[0]
     ppt_filename = f"{story_name}.pptx"
     ppt_path = os.path.join(output_dir, ppt_filename)
 
-    prs = Presentation()
-    title_slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(title_slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-
-    # Add title and subtitle
-    title.text = story_name.replace("_", " ").title()
-    with open(story_path, 'r', encoding='utf-8') as file:
-        story = file.read()
-    subtitle.text = story[:100]  # Short description
-    
-    # Set font size to 12pt for title and subtitle
-    set_font_size_12pt(title.text_frame)
-    set_font_size_12pt(subtitle.text_frame)
-
-    # Add content slides
-    words = story.split()
-    for i in range(0, len(words), max_words_per_slide):
-        slide_layout = prs.slide_layouts[1]
-        slide = prs.slides.add_slide(slide_layout)
-        content = slide.shapes.placeholders[1]
-        content.text = " ".join(words[i:i + max_words_per_slide])
-        content.text_frame.paragraphs[0].alignment = PP_ALIGN.LEFT
-        
-        # Set font size to 12pt for content
-        set_font_size_12pt(content.text_frame)
-
-    # Add image slide
-    image_prefix = os.path.splitext(story_name)[0]
-    image_filename = f"{image_prefix}_image_1.png"
-    image_path = os.path.join(images_dir, image_filename)
-    if os.path.exists(image_path):
-        slide_layout = prs.slide_layouts[5]  # Blank layout
-        slide = prs.slides.add_slide(slide_layout)
-        left = top = Inches(1)
-        pic = slide.shapes.add_picture(image_path, left, top, width=Inches(6), height=Inches(4.5))
+    builder = get_deck_builder(template_path)
+    try:
+        builder.add_story(story_path, images_dir, max_words_per_slide, image_paths, theme)
+    except Exception:
+        builder.clear()
+        raise
 
     # Save PPTX
-    prs.save(ppt_path)
-    print(f"PPTX created: {ppt_path}")
+    seconds = builder.save(ppt_path)
+    print(f"PPTX created: {ppt_path} ({os.path.getsize(ppt_path) / 1024:.1f} KB, "
+          f"saved in {seconds * 1000:.0f} ms)")
+    return ppt_path
+
+# Template path -> (modification time, size, hash) of the template last hashed there.
+_template_keys = {}
+_template_keys_lock = threading.Lock()
+
+def template_key(template_path):
+    """
+    Returns a string that changes whenever the deck template changes, for use in input hashes.
+
+    The template is only hashed again once its size or modification time changes.
+    """
+    if not template_path:
+        return 'default'
+    path = os.path.abspath(template_path)
+    stat = os.stat(path)
+    with _template_keys_lock:
+        cached = _template_keys.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    digest = hash_file(path)
+    with _template_keys_lock:
+        _template_keys[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+def ppt_input_hash(manifest, story_path, image_paths, max_words_per_slide=450, template=None):
+    """
+    Returns the hash a story's PPTX is recorded under in the run manifest.
+
+    Args:
+        manifest (RunManifest): Manifest of the stories directory, whose hash cache is used.
+        story_path (str): Path to the story text file.
+        image_paths (list): The story's images.
+        max_words_per_slide (int): Maximum words per slide.
+        template (str): Result of template_key for the deck template.
+    """
+    return hash_text(manifest.file_hash(story_path), manifest.theme_for_story(story_path), max_words_per_slide,
+                     get_image_derivatives().settings_key(), template, *[manifest.file_hash(path) for path in image_paths])
+
+def create_ppts_for_all_stories(stories_dir, images_dir, output_dir, max_words_per_slide=450, template_path=None):
+    """
+    Creates a PPTX file for every story in the stories directory.
+
+    Decks recorded in the run manifest for the same story text and images are not rebuilt.
+
+    Args:
+        stories_dir (str): Directory containing story text files.
+        images_dir (str): Directory containing images for the stories.
+        output_dir (str): Directory to save the generated PPTX files.
+        max_words_per_slide (int): Maximum words per slide.
+        template_path (str): .pptx template for the decks' look (default: None, the python-pptx default).
+
+    Returns:
+        list: Paths to the PPTX files for all stories, including ones that were up to date.
+    """
+    ensure_output_dir(output_dir)
+    manifest = manifest_for(stories_dir)
+    derivatives = get_image_derivatives()
+    before = derivatives.stats()
+    template = template_key(template_path)
+    ppt_paths = []
+
+    for filename in sorted(os.listdir(stories_dir)):
+        if filename.endswith('.txt'):
+            story_path = os.path.join(stories_dir, filename)
+            key = manifest.key_for_story(filename)
+            image_paths = story_images(story_path, images_dir)
+            input_hash = ppt_input_hash(manifest, story_path, image_paths, max_words_per_slide, template)
+            if manifest.is_fresh('ppt', key, input_hash, output_dir):
+                print(f"PPTX for {filename} is up to date.")
+                ppt_paths.extend(manifest.get('ppt', key)['paths'])
+                continue
+            try:
+                ppt_path = create_ppt_for_story(story_path, images_dir, output_dir, max_words_per_slide,
+                                                template_path, image_paths, manifest.theme_for_story(filename))
+                manifest.record('ppt', key, input_hash, [ppt_path])
+                ppt_paths.append(ppt_path)
+            except Exception as e:
+                print(f"Error creating PPTX for {filename}: {e}")
+                manifest.record('ppt', key, input_hash, status='failed')
+    manifest.save()
+    report_savings("PPTX images", before, derivatives.stats())
+    return ppt_paths
+
+def create_combined_ppt(stories_dir, images_dir, output_file, max_words_per_slide=450, template_path=None,
+                        append=False):
+    """
+    Creates one PPTX file with the slides of every story, straight from the story texts
+    and images.
+
+    The deck is built in memory and saved once, without writing and re-reading a deck per
+    story. It is recorded in the run manifest and only rebuilt when a story, an image or
+    a setting changed. The deck also carries an index of the stories it contains, keyed
+    by the hash of each story's text and images.
+
+    With `append`, an existing deck built with the same settings is updated instead: only
+    stories whose name and hash are not in its index are built. Their slides are added
+    without loading the slides already in the deck, the slides of the earlier version of
+    an edited story and of stories that were deleted are dropped, and images the deck
+    already has are shared rather than stored twice. The slides end up in the same order
+    as in a full build.
 
+    Args:
+        stories_dir (str): Directory containing story text files.
+        images_dir (str): Directory containing images for the stories.
+        output_file (str): Path of the PPTX file to create.
+        max_words_per_slide (int): Maximum words per slide.
+        template_path (str): .pptx template for the deck's look (default: None, the python-pptx default).
+        append (bool): Add only new stories to an existing deck (default: False).
+
+    Returns:
+        str: Path to the combined PPTX, or None if no stories were found.
+    """
+    manifest = manifest_for(stories_dir)
+    derivatives = get_image_derivatives()
+    story_paths = [os.path.join(stories_dir, filename)
+                   for filename in sorted(os.listdir(stories_dir)) if filename.endswith('.txt')]
+    if not story_paths:
+        print(f"No stories found in {stories_dir}.")
+        return None
+
+    image_index = index_story_images(images_dir)
+    stories = []
+    for story_path in story_paths:
+        image_paths = story_images(story_path, images_dir, image_index=image_index)
+        content_hash = hash_text(manifest.file_hash(story_path), manifest.theme_for_story(story_path),
+                                 *[manifest.file_hash(path) for path in image_paths])
+        stories.append((story_path, image_paths, content_hash))
+    settings = hash_text(max_words_per_slide, derivatives.settings_key(), template_key(template_path))
+    input_hash = hash_text(settings, append, *[content_hash for _, _, content_hash in stories])
+    key = f"combined_ppt:{os.path.basename(output_file)}"
+    if manifest.is_fresh('combined_ppt', key, input_hash, os.path.dirname(os.path.abspath(output_file))):
+        print(f"Combined PPTX {output_file} is up to date.")
+        return output_file
 
-def combine_ppts(input_dir, output_file):
+    index = read_story_index(output_file) if append else None
+    if index is not None and index[0] != settings:
+        print(f"Combined PPTX {output_file} was built with other settings; rebuilding it.")
+        index = None
+    current = {os.path.basename(story_path): content_hash for story_path, _, content_hash in stories}
+    kept = [story for story in index[1] if current.get(story.name) == story.hash] if index else []
+    removed = [story for story in index[1] if current.get(story.name) != story.hash] if index else []
+    kept_names = {story.name for story in kept}
+    new_stories = [story for story in stories if os.path.basename(story[0]) not in kept_names]
+    if index is not None and not new_stories and not removed:
+        manifest.record('combined_ppt', key, input_hash, [output_file])
+        manifest.save()
+        print(f"Combined PPTX {output_file} already contains every story.")
+        return output_file
+
+    start = time.perf_counter()
+    before = derivatives.stats()
+    builder = get_deck_builder(template_path)
+    entries = {story.name: story for story in kept}
+    slide_count = 0
+    try:
+        for story_path, image_paths, content_hash in new_stories:
+            slides = builder.add_story(story_path, images_dir, max_words_per_slide, image_paths,
+                                       manifest.theme_for_story(story_path))
+            entries[os.path.basename(story_path)] = DeckStory(os.path.basename(story_path), content_hash, slides, None)
+            slide_count += slides
+    except Exception:
+        builder.clear()
+        raise
+    deck = io.BytesIO()
+    builder.save(deck)
+
+    directory = os.path.dirname(output_file)
+    if directory:
+        ensure_output_dir(directory)
+    # Stories in file name order, as in a full build
+    order = [entries[name] for name in sorted(entries)]
+    save_start = time.perf_counter()
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        if index is not None:
+            write_deck(output_file, temp_file, settings, order, addition=deck, removed=removed)
+        else:
+            write_deck(deck, temp_file, settings, order)
+        os.replace(temp_file, output_file)
+    except ValueError as e:
+        print(f"Could not append to {output_file}: {e}; rebuilding it.")
+        return create_combined_ppt(stories_dir, images_dir, output_file, max_words_per_slide, template_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    manifest.record('combined_ppt', key, input_hash, [output_file])
+    manifest.save()
+    if index is not None:
+        action = (f"updated ({len(new_stories)} of {len(stories)} stories added or replaced, "
+                  f"{len(removed)} removed or replaced)")
+    else:
+        action = "created"
+    print(f"Combined PPTX {action}: {output_file} ({len(new_stories)} stories, {slide_count} slides, "
+          f"{os.path.getsize(output_file) / 1024:.1f} KB, built in {time.perf_counter() - start:.1f} s, "
+          f"saved in {(time.perf_counter() - save_start) * 1000:.0f} ms)")
+    report_savings("PPTX images", before, derivatives.stats())
+    return output_file
+
+def combine_ppts(input_dir, output_file, max_workers=2):
     """
     Combines multiple PPTX files into a single PPTX file.
 
+    The decks are read and parsed on a thread pool, a few at a time, and their slides are
+    copied in file name order entirely in memory.
+
     Args:
         input_dir (str): Directory containing individual PPTX files.
         output_file (str): Path to save the combined PPTX file.
+        max_workers (int): Decks loaded concurrently (default: 2).
     """
-    from pptx import Presentation
+    start = time.perf_counter()
+    # The output often lives in the same directory; never combine it into itself.
+    ppt_paths = [os.path.join(input_dir, ppt_file)
+                 for ppt_file in sorted(os.listdir(input_dir)) if ppt_file.endswith(".pptx")
+                 and os.path.abspath(os.path.join(input_dir, ppt_file)) != os.path.abspath(output_file)]
 
     prs = Presentation()
-    for ppt_file in os.listdir(input_dir):
-        if ppt_file.endswith(".pptx"):
-            src_prs = Presentation(os.path.join(input_dir, ppt_file))
-            for slide in src_prs.slides:
-                slide_layout = prs.slide_layouts[0]
-                new_slide = prs.slides.add_slide(slide_layout)
-                
-                # Track text content for the slide
-                slide_text = ""
-                
-                for shape in slide.shapes:
-                    if shape.has_text_frame:
-                        for paragraph in shape.text_frame.paragraphs:
-                            slide_text += paragraph.text + "\n"
-                    elif shape.shape_type == 13:  # Picture
-                        # Save image to a temp file and re-insert
-                        image = shape.image
-                        image_bytes = image.blob
-                        import tempfile
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_img:
-                            tmp_img.write(image_bytes)
-                            tmp_img_path = tmp_img.name
-                        left = shape.left
-                        top = shape.top
-                        width = shape.width
-                        height = shape.height
-                        new_slide.shapes.add_picture(tmp_img_path, left, top, width, height)
-                        os.remove(tmp_img_path)
-                
-                # Add text content to the new slide and set font size to 12pt
-                if slide_text.strip():
-                    new_slide.shapes[0].text = slide_text
-                    set_font_size_12pt(new_slide.shapes[0].text_frame)
-                    
+    copier = SlideCopier(prs)
+    slide_count = 0
+    for ppt_path, src_prs in imap_ordered(load_presentation, ppt_paths, max_workers=max_workers):
+        if src_prs is None:
+            continue
+        for slide in src_prs.slides:
+            copier.copy_slide(slide)
+            slide_count += 1
+
     prs.save(output_file)
-    print(f"Combined PPTX saved to: {output_file}")
+    print(f"Combined PPTX saved to: {output_file} ({len(ppt_paths)} decks, {slide_count} slides, "
+          f"{len(copier._image_parts)} unique images, {os.path.getsize(output_file) / 1024:.1f} KB, "
+          f"built in {time.perf_counter() - start:.1f} s)")
 
 if __name__ == "__main__":
     pass
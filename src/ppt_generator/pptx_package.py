@@ -0,0 +1,373 @@
+import posixpath
+import shutil
+import time
+import uuid
+import zipfile
+import zlib
+from collections import namedtuple
+
+from lxml import etree
+
+# Custom XML part that records which stories a combined deck contains.
+STORY_INDEX_NS = 'urn:poem-generator:story-index'
+# Version 2 lists the slide and media parts of every story; older indexes are rebuilt.
+STORY_INDEX_VERSION = '2'
+
+_CT_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_P_NS = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+_R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_DS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/customXml'
+
+RT_SLIDE = _R_NS + '/slide'
+RT_SLIDE_LAYOUT = _R_NS + '/slideLayout'
+RT_IMAGE = _R_NS + '/image'
+RT_CUSTOM_XML = _R_NS + '/customXml'
+RT_CUSTOM_XML_PROPS = _R_NS + '/customXmlProps'
+CT_SLIDE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+CT_CUSTOM_XML_PROPS = 'application/vnd.openxmlformats-officedocument.customXmlProperties+xml'
+
+PRESENTATION = 'ppt/presentation.xml'
+PRESENTATION_RELS = 'ppt/_rels/presentation.xml.rels'
+CONTENT_TYPES = '[Content_Types].xml'
+
+
+def _rels_name(name):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, '_rels', filename + '.rels')
+
+
+def _resolve(source_name, target):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_name), target))
+
+
+def _relative(source_name, name):
+    return posixpath.relpath(name, posixpath.dirname(source_name))
+
+
+def _xml(element):
+    return etree.tostring(element, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def _next_free(names, pattern, start=1):
+    """
+    Returns the first number n >= start for which pattern % n is not in names.
+    """
+    n = start
+    while pattern % n in names:
+        n += 1
+    return n
+
+
+# Media that is already compressed is stored as is instead of being deflated again.
+_STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+
+# A story of a combined deck: its file name, the hash of its text and images, its number
+# of slides and the slide and media parts it uses (None for stories not written yet).
+DeckStory = namedtuple('DeckStory', 'name hash slides parts')
+
+
+def _member_info(name, source_info=None):
+    """
+    Returns the ZipInfo for writing a member, stored or deflated depending on its type.
+    """
+    info = zipfile.ZipInfo(name, source_info.date_time if source_info else time.localtime()[:6])
+    info.external_attr = source_info.external_attr if source_info else 0o600 << 16
+    extension = posixpath.splitext(name)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in _STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    return info
+
+
+def _copy_member(source, info, target):
+    """
+    Streams one member from `source` to `target` without holding it in memory.
+    """
+    copy_info = _member_info(info.filename, info)
+    copy_info.file_size = info.file_size  # Lets zipfile decide on ZIP64 before writing
+    with source.open(info) as reader, target.open(copy_info, 'w') as writer:
+        shutil.copyfileobj(reader, writer, 1 << 20)
+
+
+def build_story_index(settings, stories):
+    """
+    Serialises the story index of a combined deck.
+
+    Args:
+        settings (str): Key of the settings the deck was built with.
+        stories (list): DeckStory entries, with their parts, in deck order.
+
+    Returns:
+        bytes: XML for the index part.
+    """
+    root = etree.Element(f'{{{STORY_INDEX_NS}}}stories', nsmap={None: STORY_INDEX_NS}, settings=settings,
+                         version=STORY_INDEX_VERSION)
+    for story in stories:
+        element = etree.SubElement(root, f'{{{STORY_INDEX_NS}}}story', name=story.name, hash=story.hash)
+        for part in story.parts:
+            etree.SubElement(element, f'{{{STORY_INDEX_NS}}}part', name=part)
+    return _xml(root)
+
+
+def _find_story_index(archive, names, presentation_rels):
+    for rel in presentation_rels:
+        if rel.get('Type') == RT_CUSTOM_XML:
+            name = _resolve(PRESENTATION, rel.get('Target'))
+            if name in names:
+                root = etree.fromstring(archive.read(name))
+                if root.tag == f'{{{STORY_INDEX_NS}}}stories':
+                    return name, root
+    return None, None
+
+
+def read_story_index(ppt_path):
+    """
+    Reads the story index of a combined deck.
+
+    Returns:
+        tuple: (settings key, list of DeckStory), or None if the file is missing or has
+        no story index of the current version.
+    """
+    try:
+        with zipfile.ZipFile(ppt_path) as archive:
+            presentation_rels = etree.fromstring(archive.read(PRESENTATION_RELS))
+            _, root = _find_story_index(archive, set(archive.namelist()), presentation_rels)
+    except (OSError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError):
+        return None
+    if root is None or root.get('version') != STORY_INDEX_VERSION:
+        return None
+    stories = []
+    for story in root:
+        parts = [part.get('name') for part in story]
+        slides = sum(1 for part in parts if part.startswith('ppt/slides/'))
+        stories.append(DeckStory(story.get('name'), story.get('hash'), slides, parts))
+    return root.get('settings'), stories
+
+
+def write_deck(base, output_path, settings, stories, addition=None, removed=()):
+    """
+    Writes a deck made of `base`, minus the parts of `removed` stories, plus the slides
+    of `addition`, with the slides in the order of `stories` and a new story index.
+
+    The result is written to `output_path` with the public zipfile API; write it to a
+    temporary file and rename it over the old deck. Members of `base` that do not
+    change are streamed across unparsed, and only the presentation part, its
+    relationships, the content types and the story index are rewritten, so no slide of
+    `base` is loaded. Images of `addition` whose bytes are already in `base` are shared
+    instead of being added again, and the media of removed stories is dropped unless a
+    remaining slide still uses it.
+
+    Both decks must come from the same template, so that the slide layouts used by
+    `addition` exist in `base` under the same names.
+
+    Args:
+        base (str or file): Existing deck.
+        output_path (str or file): Where to write the result; must not be `base`.
+        settings (str): Key of the settings the deck is built with, stored in the index.
+        stories (list): DeckStory entries in deck order. Stories already in `base` have
+            their parts; the others have parts None and take their `slides` in turn from
+            the slides of `addition`, or of `base` itself when there is no `addition`.
+        addition (str or file): Deck whose slides are appended (default: None, none).
+        removed (list): DeckStory entries of `base` whose slides are dropped (default: none).
+
+    Returns:
+        list: The `stories` with their parts filled in, as recorded in the new index.
+
+    Raises:
+        ValueError: If `addition` uses parts that cannot be appended (e.g. a layout that
+            `base` does not have, or charts and media other than images).
+    """
+    with zipfile.ZipFile(base) as source:
+        names = set(source.namelist())
+        presentation = etree.fromstring(source.read(PRESENTATION))
+        presentation_rels = etree.fromstring(source.read(PRESENTATION_RELS))
+        content_types = etree.fromstring(source.read(CONTENT_TYPES))
+        index_name, _ = _find_story_index(source, names, presentation_rels)
+        slide_ids = presentation.find(f'{{{_P_NS}}}sldIdLst')
+        if slide_ids is None:
+            raise ValueError("the existing deck has no slide list")
+
+        replaced = {}
+        added = {}
+        skipped = set()
+        rel_ids = {rel.get('Id') for rel in presentation_rels}
+        rels_by_id = {rel.get('Id'): rel for rel in presentation_rels}
+        next_rel = [1]
+        # Slide part name -> its entry in the slide list
+        slide_elements = {_resolve(PRESENTATION, rels_by_id[slide_id.get(f'{{{_R_NS}}}id')].get('Target')): slide_id
+                          for slide_id in slide_ids}
+
+        def add_relationship(rel_type, target_name):
+            next_rel[0] = _next_free(rel_ids, 'rId%d', next_rel[0])
+            rel_id = f'rId{next_rel[0]}'
+            rel_ids.add(rel_id)
+            etree.SubElement(presentation_rels, f'{{{_RELS_NS}}}Relationship', Id=rel_id, Type=rel_type,
+                             Target=_relative(PRESENTATION, target_name))
+            return rel_id
+
+        def ensure_default(extension, content_type):
+            for default in content_types.iter(f'{{{_CT_NS}}}Default'):
+                if default.get('Extension').lower() == extension.lower():
+                    return
+            content_types.insert(0, etree.Element(f'{{{_CT_NS}}}Default', Extension=extension,
+                                                  ContentType=content_type))
+
+        def add_override(name, content_type):
+            etree.SubElement(content_types, f'{{{_CT_NS}}}Override', PartName='/' + name,
+                             ContentType=content_type)
+
+        if addition is not None:
+            new_slides = _append_slides(source, names, slide_ids, slide_elements, add_relationship,
+                                        ensure_default, add_override, addition, added)
+        else:
+            new_slides = [[name] + _slide_media(source, name) for name in slide_elements]
+
+        result = []
+        for story in stories:
+            if story.parts is None:
+                slides, new_slides = new_slides[:story.slides], new_slides[story.slides:]
+                story = story._replace(parts=[part for parts in slides for part in parts])
+            result.append(story)
+
+        # Drop the parts of removed stories that no remaining slide uses.
+        kept_parts = {part for story in result for part in story.parts}
+        for part in {part for story in removed for part in story.parts} - kept_parts:
+            if part in slide_elements:
+                slide_id = slide_elements.pop(part)
+                slide_ids.remove(slide_id)
+                presentation_rels.remove(rels_by_id[slide_id.get(f'{{{_R_NS}}}id')])
+                for override in content_types.iter(f'{{{_CT_NS}}}Override'):
+                    if override.get('PartName') == '/' + part:
+                        content_types.remove(override)
+                        break
+                skipped.add(_rels_name(part))
+            skipped.add(part)
+
+        # Put the slides in story order; slides that belong to no story stay at the end.
+        ordered = [slide_elements.pop(part) for story in result for part in story.parts if part in slide_elements]
+        ordered.extend(slide_elements.values())
+        for slide_id in ordered:
+            slide_ids.append(slide_id)
+
+        story_index = build_story_index(settings, result)
+        if index_name is None:
+            index_name = f'customXml/item{_next_free(names, "customXml/item%d.xml")}.xml'
+            props_name = f'customXml/itemProps{_next_free(names, "customXml/itemProps%d.xml")}.xml'
+            props = etree.Element(f'{{{_DS_NS}}}datastoreItem', nsmap={'ds': _DS_NS})
+            props.set(f'{{{_DS_NS}}}itemID', '{' + str(uuid.uuid4()).upper() + '}')
+            schema_refs = etree.SubElement(props, f'{{{_DS_NS}}}schemaRefs')
+            etree.SubElement(schema_refs, f'{{{_DS_NS}}}schemaRef').set(f'{{{_DS_NS}}}uri', STORY_INDEX_NS)
+            item_rels = etree.Element(f'{{{_RELS_NS}}}Relationships', nsmap={None: _RELS_NS})
+            etree.SubElement(item_rels, f'{{{_RELS_NS}}}Relationship', Id='rId1', Type=RT_CUSTOM_XML_PROPS,
+                             Target=_relative(index_name, props_name))
+            added[props_name] = _xml(props)
+            added[_rels_name(index_name)] = _xml(item_rels)
+            add_relationship(RT_CUSTOM_XML, index_name)
+            ensure_default('xml', 'application/xml')
+            add_override(props_name, CT_CUSTOM_XML_PROPS)
+            added[index_name] = story_index
+        else:
+            replaced[index_name] = story_index
+
+        replaced[PRESENTATION] = _xml(presentation)
+        replaced[PRESENTATION_RELS] = _xml(presentation_rels)
+        replaced[CONTENT_TYPES] = _xml(content_types)
+
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as target:
+            # The content types stay the first member, where file type sniffers look for them.
+            target.writestr(_member_info(CONTENT_TYPES), replaced.pop(CONTENT_TYPES))
+            for info in source.infolist():
+                if info.filename not in skipped and info.filename not in replaced and info.filename != CONTENT_TYPES:
+                    _copy_member(source, info, target)
+            for name, data in list(replaced.items()) + list(added.items()):
+                target.writestr(_member_info(name), data)
+    return result
+
+
+def _slide_media(archive, slide_name):
+    """
+    Returns the media parts a slide uses.
+    """
+    rels_name = _rels_name(slide_name)
+    try:
+        slide_rels = etree.fromstring(archive.read(rels_name))
+    except KeyError:
+        return []
+    return [_resolve(slide_name, rel.get('Target')) for rel in slide_rels if rel.get('Type') == RT_IMAGE]
+
+
+def _append_slides(source, names, slide_ids, slide_elements, add_relationship, ensure_default, add_override,
+                   addition, added):
+    """
+    Adds the slides of `addition` after the slides of `source`.
+
+    Returns:
+        list: For each added slide, its part name followed by the media it uses.
+    """
+    next_slide_id = max([255] + [int(slide_id.get('id')) for slide_id in slide_ids]) + 1
+    next_slide = _next_free(names, 'ppt/slides/slide%d.xml')
+    media_stems = {posixpath.splitext(name)[0] for name in names if name.startswith('ppt/media/')}
+    next_image = 1
+    # (size, CRC-32) -> media parts of the existing deck, from its central directory
+    existing_media = {}
+    for info in source.infolist():
+        if info.filename.startswith('ppt/media/'):
+            existing_media.setdefault((info.file_size, info.CRC), []).append(info.filename)
+
+    def find_media(data, extension):
+        for name in existing_media.get((len(data), zlib.crc32(data)), ()):
+            if posixpath.splitext(name)[1] == extension and (added.get(name) or source.read(name)) == data:
+                return name
+        return None
+
+    new_slides = []
+    with zipfile.ZipFile(addition) as extra:
+        extra_presentation = etree.fromstring(extra.read(PRESENTATION))
+        extra_rels = {rel.get('Id'): rel for rel in etree.fromstring(extra.read(PRESENTATION_RELS))}
+        extra_types = etree.fromstring(extra.read(CONTENT_TYPES))
+        defaults = {default.get('Extension').lower(): default.get('ContentType')
+                    for default in extra_types.iter(f'{{{_CT_NS}}}Default')}
+        renamed_images = {}
+
+        for extra_slide_id in extra_presentation.find(f'{{{_P_NS}}}sldIdLst'):
+            extra_name = _resolve(PRESENTATION, extra_rels[extra_slide_id.get(f'{{{_R_NS}}}id')].get('Target'))
+            next_slide = _next_free(names, 'ppt/slides/slide%d.xml', next_slide)
+            slide_name = f'ppt/slides/slide{next_slide}.xml'
+            names.add(slide_name)
+            parts = [slide_name]
+
+            slide_rels = etree.fromstring(extra.read(_rels_name(extra_name)))
+            for rel in slide_rels:
+                target_name = _resolve(extra_name, rel.get('Target'))
+                if rel.get('Type') == RT_SLIDE_LAYOUT:
+                    if target_name not in names:
+                        raise ValueError(f"the existing deck has no layout {target_name}")
+                elif rel.get('Type') == RT_IMAGE:
+                    if target_name not in renamed_images:
+                        data = extra.read(target_name)
+                        extension = posixpath.splitext(target_name)[1]
+                        image_name = find_media(data, extension)
+                        if image_name is None:
+                            next_image = _next_free(media_stems, 'ppt/media/image%d', next_image)
+                            media_stems.add(f'ppt/media/image{next_image}')
+                            image_name = f'ppt/media/image{next_image}{extension}'
+                            names.add(image_name)
+                            added[image_name] = data
+                            existing_media.setdefault((len(data), zlib.crc32(data)), []).append(image_name)
+                            ensure_default(extension[1:], defaults.get(extension[1:].lower(), 'image/png'))
+                        renamed_images[target_name] = image_name
+                    target_name = renamed_images[target_name]
+                    if target_name not in parts:
+                        parts.append(target_name)
+                else:
+                    raise ValueError(f"cannot append a slide related to {rel.get('Type')}")
+                rel.set('Target', _relative(slide_name, target_name))
+
+            added[slide_name] = extra.read(extra_name)
+            added[_rels_name(slide_name)] = _xml(slide_rels)
+            add_override(slide_name, CT_SLIDE)
+            slide_id = etree.SubElement(slide_ids, f'{{{_P_NS}}}sldId', id=str(next_slide_id))
+            slide_id.set(f'{{{_R_NS}}}id', add_relationship(RT_SLIDE, slide_name))
+            slide_elements[slide_name] = slide_id
+            next_slide_id += 1
+            new_slides.append(parts)
+    return new_slides
@@ -0,0 +1,83 @@
+import json
+import re
+
+# Stories shorter than this are treated as malformed and generated again on their own.
+MIN_STORY_WORDS = 30
+
+
+def build_batch_prompt(themes, target_age="5-12", word_count=200):
+    """
+    Builds a single prompt asking for one story per theme, returned as a JSON array.
+
+    Args:
+        themes (list): Story themes for this batch.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for each story (default: 200).
+
+    Returns:
+        str: The rendered prompt.
+    """
+    theme_lines = "\n".join(f"    {i}. {theme}" for i, theme in enumerate(themes, start=1))
+    return f"""
+    Generate {len(themes)} separate short, engaging stories for children aged {target_age}, one for each theme below.
+    Each story should be simple, easy to understand, and around {word_count} words.
+    Include a moral or lesson at the end of each story. Use Indian mythological elements from Ramayana or Mahabharata.
+
+    Themes:
+{theme_lines}
+
+    Respond with only a JSON array and no other text, in this exact form:
+    [{{"index": 1, "story": "..."}}, {{"index": 2, "story": "..."}}]
+    """
+
+
+def parse_batch_response(content, count):
+    """
+    Splits a batched response back into per-theme stories.
+
+    Args:
+        content (str): Raw LLM response (may be wrapped in a ```json fence or surrounding text).
+        count (int): Number of themes in the batch.
+
+    Returns:
+        list: `count` stories in theme order; entries that are missing or malformed are empty strings.
+    """
+    stories = [""] * count
+    match = re.search(r"\[.*\]", content or "", re.DOTALL)
+    if not match:
+        return stories
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return stories
+    if not isinstance(items, list):
+        return stories
+
+    for position, item in enumerate(items):
+        if isinstance(item, dict):
+            index, story = item.get("index", position + 1), item.get("story")
+        else:
+            index, story = position + 1, item
+        if not isinstance(story, str) or len(story.split()) < MIN_STORY_WORDS:
+            continue
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= index <= count and not stories[index - 1]:
+            stories[index - 1] = story.strip()
+    return stories
+
+
+def chunk(items, size):
+    """
+    Yields consecutive lists of at most `size` items from an iterable.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,29 +1,70 @@
 import sys
 import os
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.utils.file_utils import read_themes_from_excel, write_story_to_txt
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage
+from src.utils.manifest import manifest_for, theme_key, hash_text
+from src.utils.llm_cache import cached_completion, cached_stream
+from src.utils.stream_utils import ThinkTagFilter
+from src.utils.usage_stats import UsageStats
+from src.story_generator.story_batching import build_batch_prompt, parse_batch_response
+from src.story_generator.story_runner import StoryProvider, generate_stories, save_story, story_filename
+from src.utils.providers import register_provider, get_provider, require_env
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Load API key from environment variable
-GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is not set.")
+# Groq model settings (also part of the LLM cache key)
+STORY_MODEL = "deepseek-r1-distill-llama-70b"
+STORY_TEMPERATURE = 0.1  # Add some creativity to story generation
+STORY_MAX_TOKENS = 2000  # Ensure enough tokens for longer stories
+# Seconds before a request is given up on the client side, so a story that
+# generate_stories_from_themes stopped waiting for does not hold its worker for long
+STORY_REQUEST_TIMEOUT = 300
 
-# Configure Groq LLM
-llm = ChatGroq(
-    model="deepseek-r1-distill-llama-70b",
-    groq_api_key=GROQ_API_KEY,
-    temperature=0.1,  # Add some creativity to story generation
-    max_tokens=2000   # Ensure enough tokens for longer stories
-)
+def _create_llm():
+    """
+    Configures the Groq LLM. langchain is only imported once a story is actually generated.
+    """
+    from langchain_groq import ChatGroq
+    return ChatGroq(
+        model=STORY_MODEL,
+        groq_api_key=require_env('GROQ_API_KEY'),
+        temperature=STORY_TEMPERATURE,
+        max_tokens=STORY_MAX_TOKENS,
+        request_timeout=STORY_REQUEST_TIMEOUT
+    )
+
+register_provider('groq_story', _create_llm)
 
-def generate_story(theme, target_age="5-12", word_count=200):
+def _invoke_llm(prompt, usage=None, max_tokens=None, request_timeout=None):
     """
-    Generates a story based on the given theme using Groq LLM.
+    Sends the prompt to the Groq LLM and returns the response without the DeepSeek R1 reasoning.
+    """
+    from langchain.schema import HumanMessage
+    llm = get_provider('groq_story')
+    message = HumanMessage(content=prompt)
+    options = {}
+    if max_tokens:
+        options['max_tokens'] = max_tokens
+    if request_timeout:
+        options['timeout'] = request_timeout
+    start = time.perf_counter()
+    response = llm.invoke([message], **options)
+    if usage is not None:
+        token_usage = getattr(response, 'usage_metadata', None) or {}
+        usage.record_request(token_usage.get('input_tokens', 0), token_usage.get('output_tokens', 0),
+                             time.perf_counter() - start)
+
+    # Filter out thinking tags from DeepSeek R1 model
+    content = response.content
+    if '<think>' in content and '</think>' in content:
+        # Extract only the content after </think>
+        content = content.split('</think>')[-1].strip()
+    return content
+
+def build_story_prompt(theme, target_age="5-12", word_count=200):
+    """
+    Builds the story generation prompt for a theme.
 
     Args:
         theme (str): The story theme.
@@ -31,55 +72,201 @@ def generate_story(theme, target_age="5-12", word_count=200):
         word_count (int): Desired word count for the story (default: 200).
 
     Returns:
-        str: Generated story text.
+        str: The rendered prompt.
     """
-    prompt = f"""
+    return f"""
     Generate a short, engaging story for children aged {target_age} based on the following theme:
     Theme: {theme}
     The story should be simple, easy to understand, and around {word_count} words.
     Include a moral or lesson at the end. Use Indian mythological elements from Ramayana or Mahabharata.
     """
+
+def generate_story(theme, target_age="5-12", word_count=200, use_cache=True, usage=None, timeout=None):
+    """
+    Generates a story based on the given theme using Groq LLM.
+
+    Args:
+        theme (str): The story theme.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for the story (default: 200).
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens.
+        timeout (float): Seconds before each attempt of the request is given up
+            (default: None, STORY_REQUEST_TIMEOUT).
+
+    Returns:
+        str: Generated story text.
+    """
+    prompt = build_story_prompt(theme, target_age, word_count)
     try:
-        # Create a message for the LLM
-        message = HumanMessage(content=prompt)
-        response = llm.invoke([message])
-        
-        # Filter out thinking tags from DeepSeek R1 model
-        content = response.content
-        if '<think>' in content and '</think>' in content:
-            # Extract only the content after </think>
-            content = content.split('</think>')[-1].strip()
-    
-        return content
-  
+        return cached_completion("groq", STORY_MODEL, STORY_TEMPERATURE, STORY_MAX_TOKENS, prompt,
+                                 lambda: _invoke_llm(prompt, usage, request_timeout=timeout), use_cache=use_cache)
     except Exception as e:
         print(f"Error generating story for theme '{theme}': {e}")
         return ""
 
-def generate_stories_from_themes(input_file, output_dir, target_age="5-12", word_count=200):
+def generate_story_batch(themes, target_age="5-12", word_count=200, use_cache=True, usage=None):
     """
-    Generates stories for all themes in the input Excel file and saves them as text files.
+    Generates stories for several themes with a single Groq request.
+
+    Themes whose story is missing or malformed in the batched response are retried
+    one at a time with generate_story.
 
     Args:
-        input_file (str): Path to the Excel file containing themes.
-        output_dir (str): Directory to save the generated stories.
+        themes (list): Story themes for this batch.
         target_age (str): Target age group (default: "5-12").
         word_count (int): Desired word count for each story (default: 200).
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the requests and their tokens.
+
+    Returns:
+        list: Generated story text for each theme, in order (empty string on failure).
+    """
+    prompt = build_batch_prompt(themes, target_age, word_count)
+    max_tokens = STORY_MAX_TOKENS * len(themes)
+    try:
+        content = cached_completion("groq", STORY_MODEL, STORY_TEMPERATURE, max_tokens, prompt,
+                                    lambda: _invoke_llm(prompt, usage, max_tokens,
+                                                        STORY_REQUEST_TIMEOUT * len(themes)),
+                                    use_cache=use_cache)
+    except Exception as e:
+        print(f"Error generating batch of {len(themes)} stories: {e}")
+        content = ""
+
+    stories = parse_batch_response(content, len(themes))
+    for i, theme in enumerate(themes):
+        if not stories[i]:
+            print(f"Retrying theme on its own: {theme}")
+            stories[i] = generate_story(theme, target_age, word_count, use_cache=use_cache, usage=usage)
+    return stories
+
+def stream_story(theme, target_age="5-12", word_count=200, use_cache=True, usage=None, timeout=None):
+    """
+    Streams a story for the given theme from the Groq LLM, dropping the DeepSeek R1 reasoning block.
+
+    Args:
+        theme (str): The story theme.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for the story (default: 200).
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens once it ends.
+        timeout (float): Seconds before the request is given up (default: None, STORY_REQUEST_TIMEOUT).
+
+    Yields:
+        str: Pieces of story text as soon as they are generated.
+
+    Raises:
+        Exception: If the request fails, possibly after some pieces were yielded.
+    """
+    prompt = build_story_prompt(theme, target_age, word_count)
+
+    def stream():
+        from langchain.schema import HumanMessage
+        message = HumanMessage(content=prompt)
+        think_filter = ThinkTagFilter()
+        token_usage = {}
+        start = time.perf_counter()
+        for piece in get_provider('groq_story').stream([message], timeout=timeout or STORY_REQUEST_TIMEOUT):
+            # The token counts arrive with the last piece.
+            token_usage = getattr(piece, 'usage_metadata', None) or token_usage
+            text = think_filter.feed(piece.content)
+            if text:
+                yield text
+        tail = think_filter.flush()
+        if tail:
+            yield tail
+        if usage is not None:
+            usage.record_request(token_usage.get('input_tokens', 0), token_usage.get('output_tokens', 0),
+                                 time.perf_counter() - start)
+
+    try:
+        yield from cached_stream("groq", STORY_MODEL, STORY_TEMPERATURE, STORY_MAX_TOKENS, prompt,
+                                 stream, use_cache=use_cache)
+    except Exception as e:
+        print(f"Error generating story for theme '{theme}': {e}")
+        raise
+
+def story_input_hash(theme, target_age="5-12", word_count=200):
+    """
+    Returns the hash of everything a theme's story depends on, as recorded in the run manifest.
+    """
+    return hash_text(STORY_MODEL, build_story_prompt(theme, target_age, word_count))
+
+def generate_story_for_theme(theme, output_dir, target_age="5-12", word_count=200, use_cache=True, usage=None,
+                             timeout=None):
+    """
+    Generates and saves the story for a single theme, unless the run manifest already has it.
+
+    Args:
+        theme (str): Story theme.
+        output_dir (str): Directory to save the story in.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count (default: 200).
+        use_cache (bool): Reuse a cached response for a theme generated before (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens.
+        timeout (float): Seconds before each attempt of the request is given up (default: None,
+            STORY_REQUEST_TIMEOUT).
+
+    Returns:
+        str: Path to the story file, or None if no story could be generated.
+    """
+    manifest = manifest_for(output_dir)
+    key = theme_key(theme)
+    input_hash = story_input_hash(theme, target_age, word_count)
+    if manifest.is_fresh('story', key, input_hash, output_dir):
+        print(f"Story for theme '{theme}' is up to date.")
+        return manifest.get('story', key)['paths'][0]
+    story = generate_story(theme, target_age, word_count, use_cache=use_cache, usage=usage, timeout=timeout)
+    if not story:
+        return None
+    save_story((None, theme, key, input_hash), story, output_dir, usage or UsageStats(), manifest)
+    return os.path.join(output_dir, story_filename(theme))
+
+def share_story_for_theme(story_path, theme, output_dir, target_age="5-12", word_count=200, usage=None):
+    """
+    Saves a duplicate theme's story as a copy of its representative's story, unless the
+    run manifest already has one.
+
+    Args:
+        story_path (str): Story file of the theme's representative.
+        theme (str): The duplicate theme.
+        output_dir (str): Directory to save the story in.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count (default: 200).
+        usage (UsageStats): Optional counters that record the story.
+
+    Returns:
+        str: Path to the duplicate theme's story file.
+    """
+    manifest = manifest_for(output_dir)
+    key = theme_key(theme)
+    input_hash = story_input_hash(theme, target_age, word_count)
+    if manifest.is_fresh('story', key, input_hash, output_dir):
+        return manifest.get('story', key)['paths'][0]
+    with open(story_path, 'r', encoding='utf-8') as file:
+        story = file.read()
+    print(f"Reusing story for duplicate theme: {theme}")
+    save_story((None, theme, key, input_hash), story, output_dir, usage or UsageStats(), manifest)
+    return os.path.join(output_dir, story_filename(theme))
+
+def _story_provider():
+    # Looked up on every call, so the module's functions can be replaced (e.g. by benchmarks).
+    return StoryProvider(generate_story, generate_story_batch, stream_story, story_input_hash)
+
+def generate_stories_from_themes(input_file, output_dir, target_age="5-12", word_count=200,
+                                 max_workers=1, timeout=None, use_cache=True, on_token=None,
+                                 mode="single", batch_size=5, dedup_threshold=None):
+    """
+    Generates stories for all themes in the input file with the Groq LLM and saves them as text files.
+
+    See story_runner.generate_stories for how themes are scheduled, skipped when up to
+    date and de-duplicated; the arguments are the same apart from `provider`.
+
+    Returns:
+        UsageStats: Requests and tokens spent, for comparing the two modes.
     """
-    themes = read_themes_from_excel(input_file)
-    print(f"Found {len(themes)} themes in the Excel file.")
-    if not themes:
-        print("No themes found in the Excel file.")
-        return
-
-    for idx, theme in enumerate(themes, start=1):
-        print(f"Generating story for theme {idx}: {theme}")
-        story = generate_story(theme, target_age, word_count)
-        if story:
-            safe_theme = theme.replace(" ", "_").replace(",", "_").replace(".", "_")
-            short_theme = safe_theme[:10]
-            filename = f"story_{idx}_{short_theme}.txt"
-            write_story_to_txt(story, output_dir, filename)
+    return generate_stories(_story_provider(), input_file, output_dir, target_age, word_count, max_workers,
+                            timeout, use_cache, on_token, mode, batch_size, dedup_threshold)
 
 if __name__ == "__main__":
     
@@ -1,21 +1,45 @@
-import os
-import google.generativeai as genai
-from src.utils.file_utils import read_themes_from_excel, write_story_to_txt
+import time
+from src.utils.manifest import hash_text
+from src.utils.llm_cache import cached_completion, cached_stream
+from src.story_generator.story_batching import build_batch_prompt, parse_batch_response
+from src.story_generator.story_runner import StoryProvider, generate_stories, story_filename
+from src.utils.providers import register_provider, get_provider, require_env
 from dotenv import load_dotenv
 load_dotenv()
 
-# Load API key from environment variable
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable is not set.")
+# Gemini model settings (also part of the LLM cache key)
+STORY_MODEL = 'models/gemini-2.5-pro'  # Use Gemini Pro for text generation
+# Seconds before a request is given up on the client side, so a story that
+# generate_stories_from_themes stopped waiting for does not hold its worker for long
+STORY_REQUEST_TIMEOUT = 300
 
-# Configure Gemini LLM
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('models/gemini-2.5-pro')  # Use Gemini Pro for text generation
+def _create_model():
+    """
+    Configures the Gemini LLM. google.generativeai is only imported once a story is actually generated.
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=require_env('GOOGLE_API_KEY'))
+    return genai.GenerativeModel(STORY_MODEL)
 
-def generate_story(theme, target_age="5-12", word_count=200):
+register_provider('gemini_story', _create_model)
+
+def _invoke_llm(prompt, usage=None, request_timeout=None):
     """
-    Generates a story based on the given theme using Gemini LLM.
+    Sends the prompt to Gemini and returns the response text.
+    """
+    start = time.perf_counter()
+    response = get_provider('gemini_story').generate_content(
+        prompt, request_options={'timeout': request_timeout or STORY_REQUEST_TIMEOUT})
+    if usage is not None:
+        token_usage = getattr(response, 'usage_metadata', None)
+        usage.record_request(getattr(token_usage, 'prompt_token_count', 0),
+                             getattr(token_usage, 'candidates_token_count', 0),
+                             time.perf_counter() - start)
+    return response.text
+
+def build_story_prompt(theme, target_age="5-12", word_count=200):
+    """
+    Builds the story generation prompt for a theme.
 
     Args:
         theme (str): The story theme.
@@ -23,46 +47,134 @@ def generate_story(theme, target_age="5-12", word_count=200):
         word_count (int): Desired word count for the story (default: 200).
 
     Returns:
-        str: Generated story text.
+        str: The rendered prompt.
     """
-    prompt = f"""
+    return f"""
     Generate a short, engaging story for children aged {target_age} based on the following theme:
     Theme: {theme}
     The story should be simple, easy to understand, and around {word_count} words.
     Include a moral or lesson at the end. Use Indian mythological elements from Ramayana or Mahabharata.
     """
 
+def generate_story(theme, target_age="5-12", word_count=200, use_cache=True, usage=None):
+    """
+    Generates a story based on the given theme using Gemini LLM.
+
+    Args:
+        theme (str): The story theme.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for the story (default: 200).
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens.
+
+    Returns:
+        str: Generated story text.
+    """
+    prompt = build_story_prompt(theme, target_age, word_count)
+
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return cached_completion("gemini", STORY_MODEL, None, None, prompt,
+                                 lambda: _invoke_llm(prompt, usage), use_cache=use_cache)
     except Exception as e:
         print(f"Error generating story for theme '{theme}': {e}")
         return ""
 
-def generate_stories_from_themes(input_file, output_dir, target_age="5-12", word_count=200):
+def generate_story_batch(themes, target_age="5-12", word_count=200, use_cache=True, usage=None):
     """
-    Generates stories for all themes in the input Excel file and saves them as text files.
+    Generates stories for several themes with a single Gemini request.
+
+    Themes whose story is missing or malformed in the batched response are retried
+    one at a time with generate_story.
 
     Args:
-        input_file (str): Path to the Excel file containing themes.
-        output_dir (str): Directory to save the generated stories.
+        themes (list): Story themes for this batch.
         target_age (str): Target age group (default: "5-12").
         word_count (int): Desired word count for each story (default: 200).
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the requests and their tokens.
+
+    Returns:
+        list: Generated story text for each theme, in order (empty string on failure).
+    """
+    prompt = build_batch_prompt(themes, target_age, word_count)
+    try:
+        content = cached_completion("gemini", STORY_MODEL, None, None, prompt,
+                                    lambda: _invoke_llm(prompt, usage, STORY_REQUEST_TIMEOUT * len(themes)),
+                                    use_cache=use_cache)
+    except Exception as e:
+        print(f"Error generating batch of {len(themes)} stories: {e}")
+        content = ""
+
+    stories = parse_batch_response(content, len(themes))
+    for i, theme in enumerate(themes):
+        if not stories[i]:
+            print(f"Retrying theme on its own: {theme}")
+            stories[i] = generate_story(theme, target_age, word_count, use_cache=use_cache, usage=usage)
+    return stories
+
+def stream_story(theme, target_age="5-12", word_count=200, use_cache=True, usage=None, timeout=None):
+    """
+    Streams a story for the given theme from the Gemini LLM.
+
+    Args:
+        theme (str): The story theme.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for the story (default: 200).
+        use_cache (bool): Reuse a cached response for an identical request (default: True).
+        usage (UsageStats): Optional counters that record the request and its tokens once it ends.
+        timeout (float): Seconds before the request is given up (default: None, STORY_REQUEST_TIMEOUT).
+
+    Yields:
+        str: Pieces of story text as soon as they are generated.
+
+    Raises:
+        Exception: If the request fails, possibly after some pieces were yielded.
+    """
+    prompt = build_story_prompt(theme, target_age, word_count)
+
+    def stream():
+        start = time.perf_counter()
+        response = get_provider('gemini_story').generate_content(
+            prompt, stream=True, request_options={'timeout': timeout or STORY_REQUEST_TIMEOUT})
+        for piece in response:
+            if piece.text:
+                yield piece.text
+        if usage is not None:
+            token_usage = getattr(response, 'usage_metadata', None)
+            usage.record_request(getattr(token_usage, 'prompt_token_count', 0),
+                                 getattr(token_usage, 'candidates_token_count', 0),
+                                 time.perf_counter() - start)
+
+    try:
+        yield from cached_stream("gemini", STORY_MODEL, None, None, prompt, stream, use_cache=use_cache)
+    except Exception as e:
+        print(f"Error generating story for theme '{theme}': {e}")
+        raise
+
+def story_input_hash(theme, target_age="5-12", word_count=200):
+    """
+    Returns the hash of everything a theme's story depends on, as recorded in the run manifest.
+    """
+    return hash_text(STORY_MODEL, build_story_prompt(theme, target_age, word_count))
+
+def _story_provider():
+    # Looked up on every call, so the module's functions can be replaced (e.g. by benchmarks).
+    return StoryProvider(generate_story, generate_story_batch, stream_story, story_input_hash)
+
+def generate_stories_from_themes(input_file, output_dir, target_age="5-12", word_count=200,
+                                 max_workers=1, timeout=None, use_cache=True, on_token=None,
+                                 mode="single", batch_size=5, dedup_threshold=None):
+    """
+    Generates stories for all themes in the input file with the Gemini LLM and saves them as text files.
+
+    See story_runner.generate_stories for how themes are scheduled, skipped when up to
+    date and de-duplicated; the arguments are the same apart from `provider`.
+
+    Returns:
+        UsageStats: Requests and tokens spent, for comparing the two modes.
     """
-    themes = read_themes_from_excel(input_file)
-    print(f"Found {len(themes)} themes in the Excel file.")
-    if not themes:
-        print("No themes found in the Excel file.")
-        return
-
-    for idx, theme in enumerate(themes, start=1):
-        print(f"Generating story for theme {idx}: {theme}")
-        story = generate_story(theme, target_age, word_count)
-        if story:
-            safe_theme = theme.replace(" ", "_").replace(",", "_").replace(".", "_")
-            short_theme = safe_theme[:10]
-            filename = f"story_{idx}_{short_theme}.txt"
-            write_story_to_txt(story, output_dir, filename)
+    return generate_stories(_story_provider(), input_file, output_dir, target_age, word_count, max_workers,
+                            timeout, use_cache, on_token, mode, batch_size, dedup_threshold)
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,219 @@
+import os
+from collections import namedtuple
+from src.utils.file_utils import iter_themes, write_story_to_txt, write_story_stream_to_txt
+from src.utils.concurrency import imap_ordered
+from src.utils.manifest import manifest_for, theme_key
+from src.utils.dedup import ThemeDeduplicator
+from src.utils.llm_cache import get_llm_cache
+from src.utils.usage_stats import UsageStats
+from src.story_generator.story_batching import chunk
+
+# The functions of a story module (story_generator.py for Groq, story_generator_google_api.py
+# for Gemini) that the shared steps below call:
+#   generate_story(theme, target_age, word_count, use_cache=..., usage=...) -> str
+#   generate_story_batch(themes, target_age, word_count, use_cache=..., usage=...) -> list
+#   stream_story(theme, target_age, word_count, use_cache=..., usage=..., timeout=...) -> iterator of str
+#   input_hash(theme, target_age, word_count) -> str recorded in the run manifest
+StoryProvider = namedtuple('StoryProvider', 'generate_story generate_story_batch stream_story input_hash')
+
+
+def story_filename(theme):
+    """
+    Builds the story file name for a theme.
+
+    The theme key is part of the name, so themes that start with the same
+    characters no longer overwrite each other's files.
+    """
+    safe_theme = theme.replace(" ", "_").replace(",", "_").replace(".", "_")
+    short_theme = safe_theme[:10]
+    return f"story_{short_theme}_{theme_key(theme)[:8]}.txt"
+
+
+def generate_stories(provider, input_file, output_dir, target_age="5-12", word_count=200,
+                     max_workers=1, timeout=None, use_cache=True, on_token=None,
+                     mode="single", batch_size=5, dedup_threshold=None):
+    """
+    Generates stories for all themes in the input file (.xlsx, .csv or .parquet) and saves them as text files.
+
+    Themes are sent to the LLM concurrently (up to `max_workers` requests at once),
+    but stories are written in theme order. When `on_token` is given, stories are instead
+    streamed one at a time and every piece of visible text is passed to it as it arrives;
+    `max_workers` does not apply then, and "batch" mode cannot be streamed. In "batch"
+    mode, `batch_size` themes are packed into each request instead.
+
+    Themes whose story is already recorded in the run manifest with the same prompt are
+    skipped, so re-running after a crash or after adding themes only generates what is missing.
+    With `dedup_threshold` set, duplicate themes are grouped (see ThemeDeduplicator): only the
+    representative of each group is sent to the LLM and its story is copied to the others.
+    At 1.0 this happens as the themes are read; lower thresholds read the whole file first.
+
+    Args:
+        provider (StoryProvider): The story functions of the LLM to use.
+        input_file (str): Path to the Excel, CSV or Parquet file containing themes.
+        output_dir (str): Directory to save the generated stories.
+        target_age (str): Target age group (default: "5-12").
+        word_count (int): Desired word count for each story (default: 200).
+        max_workers (int): Maximum number of concurrent story requests (default: 1). Ignored
+            when streaming.
+        timeout (float): Seconds to wait for a single story before skipping it (default: None, no limit).
+            In "batch" mode a request gets this much time per theme in it; when streaming,
+            it is the request's own timeout (default: STORY_REQUEST_TIMEOUT).
+        use_cache (bool): Reuse cached responses for themes that were generated before (default: True).
+        on_token (callable): Optional function called as on_token(idx, theme, text) while streaming.
+        mode (str): "single" for one request per theme, or "batch" (default: "single").
+        batch_size (int): Number of themes per request in "batch" mode (default: 5).
+        dedup_threshold (float): Shingle similarity (0-1) at which themes are treated as
+            duplicates; 1.0 only merges themes that are equal after normalisation
+            (default: None, no de-duplication).
+
+    Returns:
+        UsageStats: Requests and tokens spent, for comparing the two modes.
+
+    Raises:
+        ValueError: If `on_token` is given in "batch" mode.
+    """
+    if on_token and mode == "batch":
+        raise ValueError("Stories are streamed one request per theme; use mode 'single' with on_token.")
+    if on_token and (max_workers or 1) > 1:
+        print(f"Streaming stories one at a time; max_workers={max_workers} does not apply.")
+    usage = UsageStats(label="streaming" if on_token else f"{mode} mode")
+    manifest = manifest_for(output_dir)
+    counts = {'themes': 0, 'up_to_date': 0}
+    deduplicator = ThemeDeduplicator(dedup_threshold) if dedup_threshold is not None else None
+    duplicates = {}  # Representative theme key -> duplicate themes waiting for its story
+    seen_keys = set()
+
+    def unique_themes():
+        # Themes are read lazily, so generation starts while the rest of the file is still being read.
+        for idx, theme in enumerate(iter_themes(input_file), start=1):
+            counts['themes'] += 1
+            key = theme_key(theme)
+            if key in seen_keys:
+                # Same theme repeated with different spacing or case.
+                continue
+            seen_keys.add(key)
+            yield idx, theme, key
+
+    def pending_themes():
+        themes = unique_themes()
+        grouped = deduplicator and deduplicator.needs_all_themes
+        if grouped:
+            # Near-duplicate groups depend on every theme, so the file is read before generation starts.
+            themes = list(themes)
+            representatives = deduplicator.group([theme for _, theme, _ in themes])
+        for i, (idx, theme, key) in enumerate(themes):
+            input_hash = provider.input_hash(theme, target_age, word_count)
+            if grouped:
+                representative_key = theme_key(representatives[i])
+            elif deduplicator:
+                # Exact duplicates are found as the themes are read.
+                representative_key = theme_key(deduplicator.representative(theme))
+            else:
+                representative_key = key
+            if manifest.is_fresh('story', key, input_hash, output_dir):
+                counts['up_to_date'] += 1
+                continue
+            if representative_key != key:
+                duplicates.setdefault(representative_key, []).append((idx, theme, key, input_hash))
+                continue
+            yield (idx, theme, key, input_hash)
+
+    pending = pending_themes()
+
+    if on_token:
+        for item in pending:
+            idx, theme, key, input_hash = item
+            print(f"Streaming story for theme {idx}: {theme}")
+            chunks = provider.stream_story(theme, target_age, word_count, use_cache=use_cache, usage=usage,
+                                           timeout=timeout)
+            filename = story_filename(theme)
+            story = write_story_stream_to_txt(chunks, output_dir, filename,
+                                              on_chunk=lambda text, idx=idx, theme=theme: on_token(idx, theme, text))
+            if story.strip():
+                manifest.record('story', key, input_hash, [os.path.join(output_dir, filename)], theme=theme)
+                usage.record_stories()
+    elif mode == "batch":
+        _generate_story_batches(provider, pending, output_dir, target_age, word_count,
+                                max_workers, timeout, use_cache, batch_size, usage, manifest)
+    else:
+        _generate_stories_concurrently(provider, pending, output_dir, target_age, word_count,
+                                       max_workers, timeout, use_cache, usage, manifest)
+    fan_out_duplicates(duplicates, output_dir, usage, manifest)
+    manifest.save()
+
+    print(f"Found {counts['themes']} themes in the input file, {counts['up_to_date']} already up to date.")
+    if not counts['themes']:
+        print("No themes found in the input file.")
+    if deduplicator:
+        print(f"De-duplication: {deduplicator.themes} themes in {deduplicator.groups} groups, "
+              f"{deduplicator.calls_saved} story calls saved.")
+
+    cache_stats = get_llm_cache().stats()
+    print(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    usage.report()
+    return usage
+
+
+def save_story(item, story, output_dir, usage, manifest):
+    """
+    Writes a generated story and records it in the run manifest.
+    """
+    idx, theme, key, input_hash = item
+    filename = story_filename(theme)
+    write_story_to_txt(story, output_dir, filename)
+    manifest.record('story', key, input_hash, [os.path.join(output_dir, filename)], theme=theme)
+    usage.record_stories()
+
+
+def fan_out_duplicates(duplicates, output_dir, usage, manifest):
+    """
+    Copies each representative theme's story to the near-duplicate themes grouped with it.
+    """
+    for representative_key, items in duplicates.items():
+        record = manifest.get('story', representative_key)
+        if not record or record.get('status') != 'done' or not record.get('paths'):
+            print(f"No story to share with {len(items)} duplicate theme(s) of '{items[0][1]}'.")
+            continue
+        with open(record['paths'][0], 'r', encoding='utf-8') as file:
+            story = file.read()
+        for item in items:
+            print(f"Reusing story for duplicate theme {item[0]}: {item[1]}")
+            save_story(item, story, output_dir, usage, manifest)
+
+
+def _generate_stories_concurrently(provider, pending, output_dir, target_age, word_count, max_workers, timeout,
+                                   use_cache, usage, manifest):
+    """
+    Generates stories on a thread pool and writes them in theme order.
+    """
+    def generate(item):
+        idx, theme = item[0], item[1]
+        print(f"Generating story for theme {idx}: {theme}")
+        return provider.generate_story(theme, target_age, word_count, use_cache=use_cache, usage=usage)
+
+    results = imap_ordered(generate, pending, max_workers=max_workers, timeout=timeout, default="")
+    for item, story in results:
+        if story:
+            save_story(item, story, output_dir, usage, manifest)
+
+
+def _generate_story_batches(provider, pending, output_dir, target_age, word_count, max_workers, timeout,
+                            use_cache, batch_size, usage, manifest):
+    """
+    Generates stories `batch_size` themes per request and writes them in theme order.
+    """
+    def generate(batch):
+        print(f"Generating stories for themes {batch[0][0]}-{batch[-1][0]}")
+        return provider.generate_story_batch([item[1] for item in batch], target_age, word_count,
+                                             use_cache=use_cache, usage=usage)
+
+    batch_size = max(1, int(batch_size))
+    batches = chunk(pending, batch_size)
+    # A batch asks for batch_size stories (and may retry some on their own), so it gets
+    # the time of that many single requests.
+    batch_timeout = timeout * batch_size if timeout else None
+    results = imap_ordered(generate, batches, max_workers=max_workers, timeout=batch_timeout, default=[])
+    for batch, stories in results:
+        for item, story in zip(batch, stories):
+            if story:
+                save_story(item, story, output_dir, usage, manifest)
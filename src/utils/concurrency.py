@@ -0,0 +1,275 @@
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import (FIRST_COMPLETED, CancelledError, Executor, ThreadPoolExecutor,
+                                TimeoutError as FutureTimeoutError, wait)
+
+
+class _Task:
+    """
+    A single submitted call, with the time it was submitted.
+    """
+    def __init__(self, item):
+        self.item = item
+        self.submit_time = time.monotonic()
+        self.future = None
+
+
+def _wait_for_task(task, timeout, default):
+    """
+    Waits for a task's result, giving it `timeout` seconds from the moment it was submitted.
+    """
+    try:
+        if timeout is None:
+            return task.future.result()
+        remaining = timeout - (time.monotonic() - task.submit_time)
+        return task.future.result(timeout=max(0.0, remaining))
+    except FutureTimeoutError:
+        task.future.cancel()
+        print(f"Timed out after {timeout}s while processing: {task.item!r}")
+        return default
+    except Exception as e:
+        print(f"Error while processing {task.item!r}: {e}")
+        return default
+
+
+def imap_ordered(func, items, max_workers=4, timeout=None, default=None):
+    """
+    Applies a function to every item on a thread pool and yields the results in input order.
+
+    A call that times out cannot be interrupted: it keeps its worker until it returns on
+    its own, and that worker is not given a new item until then. Give the function a
+    timeout of its own (e.g. a client-side request timeout) so abandoned calls end.
+
+    Args:
+        func (callable): Function called with a single item.
+        items (iterable): Items to process. Consumed lazily; at most 2 * max_workers
+            items are in flight at any time, or max_workers with a timeout.
+        max_workers (int): Maximum number of concurrent calls (default: 4).
+        timeout (float): Seconds a single call may take, counted from its submission,
+            before it is abandoned and `default` is yielded in its place (default: None,
+            no limit). An item that finds every worker still busy with abandoned calls
+            for `timeout` seconds is skipped the same way.
+        default: Value yielded for calls that time out or raise (default: None).
+
+    Yields:
+        tuple: (item, result) pairs in the same order as `items`.
+    """
+    max_workers = max(1, int(max_workers))
+    # With a timeout, calls are only submitted to free workers, so each one starts when
+    # it is submitted and no call loses part of its time waiting in the queue.
+    limit = 2 * max_workers if timeout is None else max_workers
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    iterator = iter(items)
+    pending = deque()
+    abandoned = set()  # Timed-out calls that still hold a worker
+    exhausted = False
+    try:
+        while True:
+            abandoned = {future for future in abandoned if not future.done()}
+            # Keep the pool fed without reading the whole input up front.
+            while not exhausted and len(pending) + len(abandoned) < limit:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                task = _Task(item)
+                task.future = executor.submit(func, item)
+                pending.append(task)
+
+            if pending:
+                task = pending.popleft()
+                result = _wait_for_task(task, timeout, default)
+                if not task.future.done():
+                    abandoned.add(task.future)
+                yield task.item, result
+            elif exhausted:
+                break
+            elif not wait(abandoned, timeout=timeout, return_when=FIRST_COMPLETED).done:
+                # Every worker is still stuck in an abandoned call.
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    continue
+                print(f"Timed out after {timeout}s waiting for a free worker: {item!r}")
+                yield item, default
+    finally:
+        # Abandoned (timed out) calls are left to finish in the background.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+_STOP = object()
+
+
+def run_two_stage_pipeline(items, first_stage, second_stage, first_workers=1, second_workers=1,
+                           queue_size=None, on_result=None):
+    """
+    Runs items through two stages whose work overlaps in time.
+
+    Each stage has its own pool of worker threads and the stages are joined by a bounded
+    queue. While the second stage works on earlier jobs, the first stage already prepares
+    the next ones, and blocks when the second stage falls behind by `queue_size` jobs.
+
+    Args:
+        items (iterable): Inputs for the first stage.
+        first_stage (callable): Called with an item; returns an iterable of jobs for the second stage.
+        second_stage (callable): Called with a job; returns its result.
+        first_workers (int): Concurrent calls to `first_stage` (default: 1).
+        second_workers (int): Concurrent calls to `second_stage` (default: 1).
+        queue_size (int): Maximum jobs waiting between the stages (default: 2 * second_workers).
+        on_result (callable): Optional function called as on_result(job, result) from a
+            second-stage worker whenever a job finishes. Failed jobs give a result of None.
+            Errors it raises are printed, and the worker goes on with the next job, so the
+            queue is always drained and the first stage never blocks for good.
+    """
+    second_workers = max(1, int(second_workers))
+    jobs = queue.Queue(maxsize=queue_size or 2 * second_workers)
+
+    def consume():
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                return
+            try:
+                result = second_stage(job)
+            except Exception as e:
+                print(f"Error while processing {job!r}: {e}")
+                result = None
+            if on_result:
+                try:
+                    on_result(job, result)
+                except Exception as e:
+                    print(f"Error while handling the result of {job!r}: {e}")
+
+    consumers = [threading.Thread(target=consume, daemon=True) for _ in range(second_workers)]
+    for consumer in consumers:
+        consumer.start()
+
+    def produce(item):
+        for job in first_stage(item) or ():
+            jobs.put(job)
+
+    try:
+        for _ in imap_ordered(produce, items, max_workers=first_workers):
+            pass
+    finally:
+        for _ in consumers:
+            jobs.put(_STOP)
+        for consumer in consumers:
+            consumer.join()
+
+
+# A finished task: its stage, the item it was for, its result (None on failure), the
+# error message if it failed and the seconds since the scheduler started.
+StageEvent = namedtuple('StageEvent', 'stage item result error elapsed')
+
+
+class StageScheduler:
+    """
+    Runs small task graphs with a separate worker limit for every kind of stage.
+
+    Each stage has its own executor, so a slow stage never holds up the workers of
+    another. Tasks are submitted with the stage they belong to, and a task's `then`
+    callback may submit the tasks that depend on it, which lets every item move through
+    its own stages as soon as they are ready instead of waiting for the whole batch at
+    each stage. Finished tasks are reported as StageEvents through events(), on the
+    thread that iterates it.
+
+    Submit the first tasks, then iterate events() until it ends:
+
+        scheduler = StageScheduler({'fetch': 8, 'parse': 2})
+        scheduler.submit('fetch', download, url, item=url, then=lambda page: scheduler.submit('parse', ...))
+        for event in scheduler.events():
+            ...
+    """
+    def __init__(self, workers):
+        """
+        Args:
+            workers (dict): Stage name -> number of worker threads, or an Executor to use
+                for that stage (e.g. a ProcessPoolExecutor for CPU-bound work). The
+                scheduler shuts the executors down when it is closed.
+        """
+        self._executors = {
+            stage: value if isinstance(value, Executor)
+            else ThreadPoolExecutor(max_workers=max(1, int(value or 1)), thread_name_prefix=stage)
+            for stage, value in workers.items()
+        }
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        # The caller holds one slot until it starts reading events, so finishing the
+        # first tasks early cannot end the run before the rest are submitted.
+        self._pending = 1
+        self._start = time.monotonic()
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            finished = self._pending == 0
+        if finished:
+            self._events.put(_STOP)
+
+    def submit(self, stage, func, *args, item=None, then=None):
+        """
+        Runs func(*args) on the executor of `stage`.
+
+        Args:
+            stage (str): Stage whose executor runs the task.
+            func (callable): The task. Must be picklable for process pools.
+            *args: Arguments for `func`.
+            item: Value reported with the task's event (default: None).
+            then (callable): Called with the task's result in this process once it
+                succeeds, before its event is emitted. May submit further tasks.
+        """
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executors[stage].submit(func, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda future: self._finish(stage, item, future, then))
+
+    def _finish(self, stage, item, future, then):
+        result, error = None, None
+        try:
+            result = future.result()
+            if then:
+                then(result)
+        except CancelledError:
+            # Cancelled by close(); still reported, so the run's count of pending tasks adds up.
+            error = "cancelled"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            print(f"Error in the {stage} stage for {item!r}: {error}")
+        self.emit(stage, item, result, error)
+        self._release()
+
+    def emit(self, stage, item, result=None, error=None):
+        """
+        Reports an event without running a task, e.g. for work found to be up to date.
+        """
+        self._events.put(StageEvent(stage, item, result, error, time.monotonic() - self._start))
+
+    def events(self):
+        """
+        Yields StageEvents as tasks finish, until no task is left.
+        """
+        self._release()
+        try:
+            while True:
+                event = self._events.get()
+                if event is _STOP:
+                    return
+                yield event
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Shuts every executor down, cancelling tasks that have not started.
+        """
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,177 @@
+import re
+import unicodedata
+
+# Words that carry no meaning for telling themes apart.
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'for', 'from', 'with', 'by',
+    'his', 'her', 'their', 'its', 'is', 'was', 'were', 'are', 'be', 'as', 'into', 'during',
+    'towards', 'toward', 'about', 'story', 'stories',
+}
+
+# Shingles shared by more groups than this are too common to suggest a duplicate.
+MAX_POSTINGS = 200
+
+
+def normalize_theme(theme):
+    """
+    Normalises a theme for comparison: Unicode-folded, lower-cased, curly quotes and
+    possessives removed, punctuation replaced by spaces.
+
+    Args:
+        theme (str): Theme text as written in the input file.
+
+    Returns:
+        str: Normalised theme.
+    """
+    text = unicodedata.normalize('NFKC', str(theme)).casefold()
+    text = text.replace('’', "'").replace('‘', "'")
+    text = re.sub(r"'s\b", '', text)
+    text = re.sub(r"[^\w\s]", ' ', text)
+    return ' '.join(text.split())
+
+
+def theme_shingles(theme):
+    """
+    Returns the word shingles of a theme: its meaningful words and each pair of
+    neighbouring meaningful words.
+    """
+    words = [word for word in normalize_theme(theme).split() if word not in STOPWORDS]
+    return frozenset(words) | frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def theme_similarity(shingles_a, shingles_b):
+    """
+    Jaccard similarity of two themes' shingles: shared shingles divided by all shingles.
+
+    The measure is symmetric, and a short theme contained in a much longer one scores
+    low, since the longer theme's extra words count against it. Word pairs make
+    themes with the same words in a different role ("Rama's gift to Bharata" and
+    "Bharata's gift to Rama") score lower than ones that read alike.
+
+    Returns:
+        float: Similarity between 0.0 and 1.0.
+    """
+    if not shingles_a or not shingles_b:
+        return 1.0 if shingles_a == shingles_b else 0.0
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+class ThemeDeduplicator:
+    """
+    Groups themes that are the same apart from case, punctuation and possessives, and
+    optionally themes whose wording is nearly the same.
+
+    Groups depend only on the set of themes, not on their order in the file: themes are
+    considered in the order of their normalised text, and the first theme of each group
+    in that order is its representative. Candidate groups are found through an inverted
+    index on shingles, so each theme is only compared with groups it shares one with.
+    Every merge is logged.
+
+    With the default threshold, themes can instead be passed to representative() one at
+    a time as they are read, without waiting for the rest of the file.
+    """
+    def __init__(self, threshold=1.0):
+        """
+        Args:
+            threshold (float): Shingle similarity (0-1) at which two themes are merged.
+                1.0 (the default) only merges themes whose normalised text is equal.
+        """
+        self.threshold = threshold
+        self.themes = 0
+        self.groups = 0
+        self._first = {}  # Normalised text -> first theme read with it, for representative()
+
+    @property
+    def needs_all_themes(self):
+        """
+        Whether grouping has to see every theme first (near-duplicate thresholds below 1.0).
+        """
+        return self.threshold < 1.0
+
+    def representative(self, theme):
+        """
+        Returns the representative of a theme as themes are read one at a time: the first
+        theme read with the same normalised text.
+
+        Unlike group(), the representative depends on the order of the file. Only
+        available at threshold 1.0, since near-duplicates need every theme to be grouped.
+
+        Args:
+            theme (str): The next theme of the run.
+
+        Returns:
+            str: The theme's representative (the theme itself if it is the first of its group).
+
+        Raises:
+            ValueError: If the threshold is below 1.0.
+        """
+        if self.needs_all_themes:
+            raise ValueError("Near-duplicate themes can only be grouped once every theme is read; use group().")
+        text = normalize_theme(theme)
+        self.themes += 1
+        if text not in self._first:
+            self._first[text] = theme
+            self.groups += 1
+            return theme
+        representative = self._first[text]
+        print(f"Merging theme '{theme}' into '{representative}' (same wording).")
+        return representative
+
+    def group(self, themes):
+        """
+        Returns the representative theme of every theme.
+
+        Args:
+            themes (list): All themes of the run.
+
+        Returns:
+            list: The representative of each theme, in the order of `themes` (the theme
+            itself if it represents its group).
+        """
+        by_text = {}
+        for theme in themes:
+            by_text.setdefault(normalize_theme(theme), []).append(theme)
+
+        representatives = {}   # Normalised text -> representative theme
+        group_shingles = []    # Group id -> (representative theme, shingles)
+        postings = {}          # Shingle -> ids of groups containing it
+        for text in sorted(by_text):
+            representative = min(by_text[text])
+            shingles = theme_shingles(representative)
+            best_id, best_score = None, 0.0
+            if self.threshold < 1.0:
+                candidates = set()
+                for shingle in shingles:
+                    ids = postings.get(shingle, ())
+                    if len(ids) <= MAX_POSTINGS:
+                        candidates.update(ids)
+                for group_id in sorted(candidates):
+                    score = theme_similarity(shingles, group_shingles[group_id][1])
+                    if score > best_score:
+                        best_id, best_score = group_id, score
+
+            if best_id is not None and best_score >= self.threshold:
+                representatives[text] = group_shingles[best_id][0]
+                for theme in by_text[text]:
+                    print(f"Merging theme '{theme}' into '{representatives[text]}' "
+                          f"(similarity {best_score:.2f}).")
+                continue
+
+            representatives[text] = representative
+            for theme in by_text[text]:
+                if theme != representative:
+                    print(f"Merging theme '{theme}' into '{representative}' (same wording).")
+            for shingle in shingles:
+                postings.setdefault(shingle, []).append(len(group_shingles))
+            group_shingles.append((representative, shingles))
+
+        self.themes += len(themes)
+        self.groups += len(group_shingles)
+        return [representatives[normalize_theme(theme)] for theme in themes]
+
+    @property
+    def calls_saved(self):
+        """
+        Number of themes that will reuse another theme's story instead of calling the LLM.
+        """
+        return self.themes - self.groups
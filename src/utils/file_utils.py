@@ -1,10 +1,11 @@
-import pandas as pd
 import os
+import re
+import string
 
 # Ensure the 'output' directory exists
 def ensure_output_dir(output_path):
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
+    # exist_ok, since pipeline workers may create the same directory at the same time.
+    os.makedirs(output_path, exist_ok=True)
 
 # Read themes from an Excel file
 def read_themes_from_excel(file_path):
@@ -18,13 +19,83 @@ def read_themes_from_excel(file_path):
         list: List of themes.
     """
     try:
-        df = pd.read_excel(file_path)
-        themes = df['Theme'].tolist()  # Assuming 'Theme' is the column name
-        return themes
+        return list(iter_themes(file_path))
     except Exception as e:
-        print(f"Error reading Excel file: {e}")
+        print(f"Error reading themes file: {e}")
         return []
 
+# Stream themes from an Excel, CSV or Parquet file
+def iter_themes(file_path, column='Theme'):
+    """
+    Yields story themes one at a time while the file is being read.
+
+    .xlsx files are read with openpyxl in read-only mode, CSV files with the csv module
+    and Parquet files in record batches with pyarrow, so memory use stays flat no matter
+    how many rows the file has. Blank cells are skipped.
+
+    Args:
+        file_path (str): Path to an .xlsx, .csv or .parquet file.
+        column (str): Name of the column holding the themes (default: 'Theme').
+
+    Yields:
+        str: Each theme in file order.
+
+    Raises:
+        ValueError: If the file type is not supported or the file has no `column`.
+        ImportError: For a Parquet file when pyarrow is not installed.
+        Exception: Any error reading the file, possibly after some themes were yielded.
+    """
+    readers = {
+        '.xlsx': _iter_excel_column,
+        '.xlsm': _iter_excel_column,
+        '.csv': _iter_csv_column,
+        '.parquet': _iter_parquet_column,
+    }
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in readers:
+        raise ValueError(f"Unsupported themes file type '{extension}'.")
+    for value in readers[extension](file_path, column):
+        if value is None:
+            continue
+        theme = str(value).strip()
+        if theme:
+            yield theme
+
+def _iter_excel_column(file_path, column):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        if column not in header:
+            raise ValueError(f"No '{column}' column in {file_path}.")
+        index = header.index(column)
+        for row in rows:
+            yield row[index] if index < len(row) else None
+    finally:
+        workbook.close()
+
+def _iter_csv_column(file_path, column):
+    import csv
+
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.DictReader(file)
+        if column not in (reader.fieldnames or []):
+            raise ValueError(f"No '{column}' column in {file_path}.")
+        for row in reader:
+            yield row[column]
+
+def _iter_parquet_column(file_path, column, batch_size=4096):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow).")
+
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(columns=[column], batch_size=batch_size):
+        yield from batch.column(0).to_pylist()
+
 # Write a story to a text file
 def write_story_to_txt(story, output_path, filename):
     """
@@ -44,6 +115,50 @@ def write_story_to_txt(story, output_path, filename):
     except Exception as e:
         print(f"Error writing to file: {e}")
 
+# Write a story to a text file as it is being generated
+def write_story_stream_to_txt(chunks, output_path, filename, on_chunk=None):
+    """
+    Writes a streamed story to a text file chunk by chunk.
+
+    The chunks go to a temporary file that only replaces `filename` once the stream has
+    ended cleanly. If the stream breaks off, the partial story is discarded.
+
+    Args:
+        chunks (iterable): Pieces of story text in order.
+        output_path (str): Path to the output directory.
+        filename (str): Name of the output file (e.g., 'story1.txt').
+        on_chunk (callable): Optional function called with each chunk after it is written.
+
+    Returns:
+        str: The full story text, or an empty string if nothing was generated or the
+        stream failed.
+    """
+    ensure_output_dir(output_path)
+    file_path = os.path.join(output_path, filename)
+    part_path = file_path + '.part'
+    parts = []
+    try:
+        with open(part_path, 'w', encoding='utf-8') as file:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                file.write(chunk)
+                file.flush()
+                parts.append(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+    except Exception as e:
+        print(f"Story stream for {file_path} did not finish, discarding it: {e}")
+        parts = []
+
+    story = ''.join(parts)
+    if story.strip():
+        os.replace(part_path, file_path)
+        print(f"Story saved to {file_path}")
+    elif os.path.exists(part_path):
+        os.remove(part_path)
+    return story
+
 # Write themes to a new Excel file (optional, for debugging)
 def write_themes_to_excel(themes, output_path, filename):
     """
@@ -54,6 +169,8 @@ def write_themes_to_excel(themes, output_path, filename):
         output_path (str): Path to the output directory.
         filename (str): Name of the output file (e.g., 'generated_themes.xlsx').
     """
+    import pandas as pd
+
     ensure_output_dir(output_path)
     file_path = os.path.join(output_path, filename)
     try:
@@ -63,6 +180,36 @@ def write_themes_to_excel(themes, output_path, filename):
     except Exception as e:
         print(f"Error writing to Excel file: {e}")
 
+# Story title for documents and slides
+def story_title(story_path, story, theme=None):
+    """
+    Returns a story's title for documents and slides.
+
+    The title is the story's "Title:" line or short first line, else the theme it was
+    generated for, else the file name without its "story_" prefix and theme key suffix.
+
+    Args:
+        story_path (str): Path to the story text file.
+        story (str): Story text.
+        theme (str): Theme recorded for the story in the run manifest (default: None).
+
+    Returns:
+        str: The title.
+    """
+    for line in story.splitlines():
+        line = line.strip().strip('*#').strip()
+        if line:
+            if line.lower().startswith('title:'):
+                return line[len('title:'):].strip()
+            if len(line.split()) <= 12:
+                return line
+            break
+    if theme:
+        return theme
+    story_name = os.path.splitext(os.path.basename(story_path))[0]
+    story_name = re.sub(r'^story_|_[0-9a-f]{8}$', '', story_name)
+    return string.capwords(story_name.replace("_", " "))
+
 
 ################## Test the utility functions ##################
 # from file_utils import read_themes_from_excel
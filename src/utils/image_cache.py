@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from src.utils.image_utils import encode_image, save_image_atomic, write_bytes_atomic
+
+DEFAULT_CACHE_DIR = 'data/cache/images'
+INDEX_FILENAME = 'index.sqlite'
+
+# Eviction is checked every this many writes rather than on every write.
+EVICTION_INTERVAL = 20
+
+# Cached images are kept as lossless PNG at this zlib level, so any output format can
+# be encoded from them; PNG outputs at the same level are linked instead of re-encoded.
+CACHE_PNG_COMPRESS_LEVEL = 6
+
+
+def link_or_copy(source_path, file_path):
+    """
+    Hard-links `source_path` to `file_path`, falling back to a copy across file systems.
+
+    The link is created under a temporary name and renamed into place, so an existing
+    file at `file_path` is replaced atomically.
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ImageCache:
+    """
+    Persistent, content-addressed store for generated images.
+
+    Each image is keyed by a hash of (provider, model, prompt, width, height, seed, variant)
+    and kept as a lossless PNG under `cache_dir`, with a SQLite index recording its size
+    and last use. The least recently used images are evicted once the cache grows beyond
+    `max_entries` or `max_size_mb`. Hits are hard-linked into the output directory, or
+    re-encoded when another output format is requested.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, enabled=True, max_entries=5000, max_size_mb=2048):
+        self.cache_dir = cache_dir
+        # Setting IMAGE_CACHE_BYPASS=1 disables the cache without touching the config.
+        self.enabled = enabled and os.getenv('IMAGE_CACHE_BYPASS', '').lower() not in ('1', 'true', 'yes')
+        self.max_entries = max_entries
+        self.max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, INDEX_FILENAME), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON images (last_access)")
+            self._conn.commit()
+            self._evict()
+        return self._conn
+
+    @staticmethod
+    def make_key(provider, model, prompt, width, height, seed=None, variant=0):
+        """
+        Builds the cache key for a single image request.
+
+        Args:
+            provider (str): Provider name (e.g. 'huggingface').
+            model (str): Model name.
+            prompt (str): Image prompt.
+            width (int): Requested width, or None for the model default.
+            height (int): Requested height, or None for the model default.
+            seed (int): Sampling seed, or None if not set.
+            variant (int): Distinguishes several unseeded images for the same prompt (default: 0).
+
+        Returns:
+            str: Hex digest identifying the request.
+        """
+        payload = json.dumps([provider, model, prompt, width, height, seed, variant], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the path of the cached image for a key, or None on a miss.
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT path FROM images WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(os.path.join(self.cache_dir, row[0])):
+                if row is not None:
+                    # The file was removed behind our back; forget it.
+                    conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE images SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return os.path.join(self.cache_dir, row[0])
+
+    def put(self, key, file_path):
+        """
+        Adds an image file to the cache under a key, evicting old images if the cache
+        is over its limits. The file is hard-linked when possible, so it costs no extra space
+        while the output copy exists.
+        """
+        self._store(key, os.path.splitext(file_path)[1], lambda cached_path: link_or_copy(file_path, cached_path))
+
+    def put_image(self, key, image):
+        """
+        Adds an image to the cache under a key as a lossless PNG.
+        """
+        data = encode_image(image, 'png', compress_level=CACHE_PNG_COMPRESS_LEVEL)
+        self._store(key, '.png', lambda cached_path: write_bytes_atomic(data, cached_path))
+
+    def _store(self, key, extension, write):
+        relative_path = os.path.join(key[:2], key + extension)
+        cached_path = os.path.join(self.cache_dir, relative_path)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            write(cached_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO images (key, path, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, relative_path, os.path.getsize(cached_path), now, now),
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self):
+        conn = self._conn
+        stale = []
+        if self.max_entries:
+            stale.extend(conn.execute(
+                "SELECT key, path FROM images ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_entries,),
+            ).fetchall())
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                for key, path, size in conn.execute("SELECT key, path, size FROM images ORDER BY last_access"):
+                    stale.append((key, path))
+                    freed += size
+                    if freed >= excess:
+                        break
+        for key, path in stale:
+            try:
+                os.remove(os.path.join(self.cache_dir, path))
+            except OSError:
+                pass
+        conn.executemany("DELETE FROM images WHERE key = ?", [(key,) for key, _ in stale])
+        conn.commit()
+
+    def clear(self):
+        """
+        Removes every cached image.
+        """
+        with self._lock:
+            conn = self._connect()
+            for (path,) in conn.execute("SELECT path FROM images").fetchall():
+                try:
+                    os.remove(os.path.join(self.cache_dir, path))
+                except OSError:
+                    pass
+            conn.execute("DELETE FROM images")
+            conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this process.
+
+        Returns:
+            dict: 'hits', 'misses' and 'hit_rate'.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def configure_image_cache(**settings):
+    """
+    Replaces the shared cache with one built from the `image_cache` section of the config.
+
+    Args:
+        **settings: Keyword arguments for ImageCache (cache_dir, enabled, max_entries, max_size_mb).
+
+    Returns:
+        ImageCache: The new shared cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = ImageCache(**settings)
+    return _default_cache
+
+
+def get_image_cache():
+    """
+    Returns the shared image cache, creating it with default settings on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache()
+        return _default_cache
+
+
+def cached_image(provider, model, prompt, width, height, seed, variant, file_path, generate, use_cache=True,
+                 encode_options=None):
+    """
+    Writes the image for a request to `file_path`, calling `generate` only on a cache miss.
+
+    The cache holds the model's output and not the encoded file, so changing the output
+    format or its quality re-encodes cached images instead of generating them again.
+
+    Args:
+        provider (str): Provider name used in the cache key.
+        model (str): Model name used in the cache key.
+        prompt (str): Image prompt.
+        width (int): Requested width used in the cache key.
+        height (int): Requested height used in the cache key.
+        seed (int): Sampling seed used in the cache key.
+        variant (int): Index of the image among unseeded images for the same prompt.
+        file_path (str): Where the image should end up.
+        generate (callable): Zero-argument function that calls the model and returns the
+            generated PIL image.
+        use_cache (bool): Set to False to bypass the cache for this call (default: True).
+        encode_options (dict): Keyword arguments of save_image_atomic for the output file
+            (image_format, quality, compress_level; default: None, PNG).
+
+    Returns:
+        tuple: (path, True if the image came from the cache).
+    """
+    encode_options = dict(encode_options or {})
+    cache = get_image_cache()
+    if not use_cache or not cache.enabled:
+        _save_image(generate(), file_path, encode_options)
+        return file_path, False
+
+    key = cache.make_key(provider, model, prompt, width, height, seed, variant)
+    cached_path = cache.get(key)
+    if cached_path is not None:
+        if cached_path.endswith('.png') and _is_cache_encoding(encode_options):
+            link_or_copy(cached_path, file_path)
+        else:
+            from PIL import Image
+            with Image.open(cached_path) as image:
+                _save_image(image, file_path, encode_options)
+        return file_path, True
+
+    image = generate()
+    _save_image(image, file_path, encode_options)
+    try:
+        if _is_cache_encoding(encode_options):
+            cache.put(key, file_path)
+        else:
+            cache.put_image(key, image)
+    except OSError as e:
+        print(f"Could not add {file_path} to the image cache: {e}")
+    return file_path, False
+
+
+def _is_cache_encoding(encode_options):
+    # PNG outputs at the cache's level are the same file as the cached copy, so they can be linked.
+    return (encode_options.get('image_format', 'png').lower() == 'png'
+            and encode_options.get('compress_level', 6) == CACHE_PNG_COMPRESS_LEVEL)
+
+
+def _save_image(image, file_path, encode_options):
+    size, seconds = save_image_atomic(image, file_path, **encode_options)
+    print(f"Image successfully saved to {file_path} ({size / 1024:.1f} KB written in {seconds * 1000:.0f} ms)")
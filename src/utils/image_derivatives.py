@@ -0,0 +1,242 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+DEFAULT_DERIVATIVES_DIR = 'data/cache/derivatives'
+
+POINTS_PER_INCH = 72
+
+# The cache is pruned every this many new copies rather than on every one.
+PRUNE_INTERVAL = 50
+
+# Copies used this recently are never pruned, since a document being built elsewhere
+# may be about to embed them.
+PRUNE_GRACE_SECONDS = 3600
+
+
+class ImageDerivatives:
+    """
+    Produces display-sized, recompressed copies of images for embedding in documents.
+
+    A generated image is usually far larger than the box it is shown in (400x300 pt in the
+    PDFs, 6x4.5 in in the decks). Each image is resized to that box at `dpi` and re-encoded
+    once; the copy is stored under `cache_dir` keyed by the source file's hash and the
+    display settings, so every later document build reuses it.
+
+    A copy's modification time is its last use. Copies unused for `max_age_days` are
+    removed, and the least recently used ones once the cache grows beyond `max_size_mb`.
+    """
+    def __init__(self, cache_dir=DEFAULT_DERIVATIVES_DIR, enabled=True, dpi=150, image_format='jpeg', quality=85,
+                 max_size_mb=1024, max_age_days=30):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.dpi = dpi
+        self.image_format = image_format
+        self.quality = quality
+        self.max_size_mb = max_size_mb
+        self.max_age_days = max_age_days
+        self.created = 0
+        self.reused = 0
+        self.source_bytes = 0
+        self.derived_bytes = 0
+        self._lock = threading.Lock()
+
+    def settings(self):
+        """
+        Returns the constructor arguments, so worker processes can build an identical store.
+        """
+        return {'cache_dir': self.cache_dir, 'enabled': self.enabled, 'dpi': self.dpi,
+                'image_format': self.image_format, 'quality': self.quality,
+                'max_size_mb': self.max_size_mb, 'max_age_days': self.max_age_days}
+
+    def settings_key(self):
+        """
+        Returns a string that changes whenever the derivative settings change, for use in
+        document input hashes.
+        """
+        if not self.enabled:
+            return 'original'
+        return f"{self.dpi}dpi-{self.image_format}-{self.quality}"
+
+    def derive(self, image_path, width_pt, height_pt):
+        """
+        Returns the path of a display-sized copy of an image, creating it on first use.
+
+        Args:
+            image_path (str): Source image.
+            width_pt (float): Display width in points.
+            height_pt (float): Display height in points.
+
+        Returns:
+            str: Path of the derivative, or `image_path` itself if derivatives are disabled
+            or the image cannot be converted.
+        """
+        if not self.enabled or not os.path.exists(image_path):
+            return image_path
+        width_px = math.ceil(width_pt / POINTS_PER_INCH * self.dpi)
+        height_px = math.ceil(height_pt / POINTS_PER_INCH * self.dpi)
+
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        payload = json.dumps([digest.hexdigest(), width_px, height_px, self.image_format, self.quality])
+        key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+        from src.utils.image_utils import image_extension, save_image_atomic, write_bytes_atomic
+        base_path = os.path.join(self.cache_dir, key[:2], key)
+        source_size = os.path.getsize(image_path)
+        source_extension = os.path.splitext(image_path)[1]
+        for extension in (image_extension(self.image_format), image_extension('png'), source_extension):
+            if os.path.exists(base_path + extension):
+                try:
+                    os.utime(base_path + extension)  # Mark it as recently used
+                except OSError:
+                    pass
+                self._count(source_size, os.path.getsize(base_path + extension), created=False)
+                return base_path + extension
+
+        try:
+            from PIL import Image
+            os.makedirs(os.path.dirname(base_path), exist_ok=True)
+            with Image.open(image_path) as image:
+                image_format = self.image_format
+                if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                    # JPEG has no alpha channel; keep transparent images lossless.
+                    image_format = 'png'
+                # The document stretches the image to the display box, so resize to exactly
+                # that box, but never enlarge an image that is already smaller.
+                if image.width > width_px or image.height > height_px:
+                    image = image.resize((min(image.width, width_px), min(image.height, height_px)),
+                                         Image.LANCZOS)
+                derived_path = base_path + image_extension(image_format)
+                size, _ = save_image_atomic(image, derived_path, image_format, self.quality)
+            if size >= source_size:
+                # Recompressing did not help (e.g. a tiny PNG); keep the original bytes instead.
+                os.remove(derived_path)
+                derived_path = base_path + source_extension
+                with open(image_path, 'rb') as file:
+                    write_bytes_atomic(file.read(), derived_path)
+                size = source_size
+        except Exception as e:
+            print(f"Could not create a display copy of {image_path}, embedding the original: {e}")
+            return image_path
+        if self._count(source_size, size, created=True) % PRUNE_INTERVAL == 0:
+            self.prune()
+        return derived_path
+
+    def _count(self, source_size, derived_size, created):
+        with self._lock:
+            if created:
+                self.created += 1
+            else:
+                self.reused += 1
+            self.source_bytes += source_size
+            self.derived_bytes += derived_size
+            return self.created
+
+    def prune(self):
+        """
+        Removes copies unused for longer than `max_age_days`, then the least recently
+        used ones until the cache fits in `max_size_mb`.
+
+        Returns:
+            int: Number of copies removed.
+        """
+        now = time.time()
+        files = []
+        try:
+            subdirs = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except FileNotFoundError:
+            return 0
+        for subdir in subdirs:
+            for entry in os.scandir(subdir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        max_age = self.max_age_days * 86400 if self.max_age_days else None
+        max_bytes = self.max_size_mb * 1024 * 1024 if self.max_size_mb else None
+        removed = 0
+        for last_used, size, path in files:
+            if now - last_used < PRUNE_GRACE_SECONDS:
+                break
+            too_old = max_age is not None and now - last_used > max_age
+            too_big = max_bytes is not None and total > max_bytes
+            if not too_old and not too_big:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        """
+        Returns counters for this process.
+
+        Returns:
+            dict: 'created', 'reused', 'source_bytes' and 'derived_bytes'.
+        """
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'source_bytes': self.source_bytes,
+                'derived_bytes': self.derived_bytes,
+            }
+
+
+def report_savings(label, before, after):
+    """
+    Prints how much smaller the embedded images were than the originals between two
+    stats() snapshots.
+    """
+    source = after['source_bytes'] - before['source_bytes']
+    derived = after['derived_bytes'] - before['derived_bytes']
+    if not source:
+        return
+    created = after['created'] - before['created']
+    reused = after['reused'] - before['reused']
+    print(f"{label}: embedded {derived / 1024:.1f} KB of images instead of {source / 1024:.1f} KB "
+          f"({100 * (1 - derived / source):.0f}% smaller; {created} display copies created, {reused} reused)")
+
+
+_default_derivatives = None
+_default_derivatives_lock = threading.Lock()
+
+
+def configure_image_derivatives(**settings):
+    """
+    Replaces the shared derivative store with one built from the `image_derivatives`
+    section of the config.
+
+    Args:
+        **settings: Keyword arguments for ImageDerivatives (cache_dir, enabled, dpi, image_format,
+            quality, max_size_mb, max_age_days).
+
+    Returns:
+        ImageDerivatives: The new shared store.
+    """
+    global _default_derivatives
+    with _default_derivatives_lock:
+        _default_derivatives = ImageDerivatives(**settings)
+    return _default_derivatives
+
+
+def get_image_derivatives():
+    """
+    Returns the shared derivative store, creating it with default settings on first use.
+    """
+    global _default_derivatives
+    with _default_derivatives_lock:
+        if _default_derivatives is None:
+            _default_derivatives = ImageDerivatives()
+        return _default_derivatives
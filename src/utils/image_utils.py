@@ -0,0 +1,244 @@
+import io
+import os
+import re
+import threading
+import time
+
+# Supported output formats: config name -> (PIL format, file extension)
+IMAGE_FORMATS = {
+    'png': ('PNG', '.png'),
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+    'jpg': ('JPEG', '.jpg'),
+}
+
+
+def image_extension(image_format='png'):
+    """
+    Returns the file extension (with the dot) used for an image format.
+    """
+    return IMAGE_FORMATS[image_format.lower()][1]
+
+
+def story_image_filename(story_name, index, image_format='png'):
+    """
+    Builds the file name of a story's n-th image (1-based), e.g. 'story_x_image_1.png'.
+    """
+    return f"{story_name}_image_{index}{image_extension(image_format)}"
+
+
+def _newest(paths):
+    """
+    Returns the most recently written of several existing paths (by name on a tie).
+    """
+    return max(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def find_story_images(images_dir, story_name, max_images=None):
+    """
+    Returns the existing images of a story in order, whatever format they were saved in.
+
+    If an image exists in several formats, e.g. after image_format was changed, the
+    most recently written file is used.
+
+    Args:
+        images_dir (str): Directory containing the generated images.
+        story_name (str): Story file name without extension.
+        max_images (int): Stop after this many images (default: None, no limit).
+
+    Returns:
+        list: Paths of the story's images, for consecutive indexes starting at 1.
+    """
+    extensions = sorted({extension for _, extension in IMAGE_FORMATS.values()})
+    paths = []
+    index = 1
+    while max_images is None or index <= max_images:
+        candidates = [os.path.join(images_dir, f"{story_name}_image_{index}{extension}") for extension in extensions]
+        candidates = [path for path in candidates if os.path.exists(path)]
+        if not candidates:
+            break
+        paths.append(_newest(candidates))
+        index += 1
+    return paths
+
+
+_IMAGE_NAME_RE = re.compile(r'^(?P<story>.+)_image_(?P<index>\d+)(?P<extension>\.[A-Za-z]+)$')
+
+
+def index_story_images(images_dir):
+    """
+    Lists the images directory once and groups the images by story.
+
+    Gives the same result as calling find_story_images for every story, without probing
+    the file system for each possible name.
+
+    Args:
+        images_dir (str): Directory containing the generated images.
+
+    Returns:
+        dict: Story file name without extension -> image paths for consecutive indexes from 1.
+    """
+    extensions = {extension for _, extension in IMAGE_FORMATS.values()}
+    found = {}
+    try:
+        filenames = os.listdir(images_dir)
+    except FileNotFoundError:
+        return {}
+    for filename in filenames:
+        match = _IMAGE_NAME_RE.match(filename)
+        if match and match.group('extension') in extensions:
+            images = found.setdefault(match.group('story'), {})
+            images.setdefault(int(match.group('index')), []).append(os.path.join(images_dir, filename))
+    index = {}
+    for story_name, images in found.items():
+        paths = []
+        while len(paths) + 1 in images:
+            candidates = images[len(paths) + 1]
+            # Several formats for one index: keep the one find_story_images would pick.
+            paths.append(candidates[0] if len(candidates) == 1 else _newest(candidates))
+        if paths:
+            index[story_name] = paths
+    return index
+
+
+def remove_other_formats(file_path):
+    """
+    Deletes copies of an image saved under the same name in the other formats, so a
+    newly written image is the only one left for its story and index.
+    """
+    base, extension = os.path.splitext(file_path)
+    for _, other in set(IMAGE_FORMATS.values()):
+        if other != extension and os.path.exists(base + other):
+            try:
+                os.remove(base + other)
+            except OSError as e:
+                print(f"Could not remove the old image {base + other}: {e}")
+
+
+def encode_image(image, image_format='png', quality=90, compress_level=6):
+    """
+    Validates a PIL image in memory and encodes it.
+
+    Args:
+        image (PIL.Image.Image): The image to encode.
+        image_format (str): 'png', 'webp' or 'jpeg' (default: 'png').
+        quality (int): Quality for WebP and JPEG, 1-100 (default: 90).
+        compress_level (int): zlib level for PNG, 0-9 (default: 6).
+
+    Returns:
+        bytes: The encoded image.
+    """
+    # Forces the pixel data to be decoded, so truncated or corrupt images fail here
+    # instead of after they have been written to disk.
+    image.load()
+    if not image.width or not image.height:
+        raise ValueError("Generated image is empty.")
+
+    pil_format = IMAGE_FORMATS[image_format.lower()][0]
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    options = {'compress_level': compress_level} if pil_format == 'PNG' else {'quality': quality}
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def write_bytes_atomic(data, file_path):
+    """
+    Writes bytes to a temporary file next to `file_path` and renames it into place,
+    so readers never see a half-written file.
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_image_atomic(image, file_path, image_format='png', quality=90, compress_level=6):
+    """
+    Validates, encodes and atomically writes a PIL image.
+
+    Args:
+        image (PIL.Image.Image): The image to save.
+        file_path (str): Destination path.
+        image_format (str): 'png', 'webp' or 'jpeg' (default: 'png').
+        quality (int): Quality for WebP and JPEG, 1-100 (default: 90).
+        compress_level (int): zlib level for PNG, 0-9 (default: 6).
+
+    Returns:
+        tuple: (bytes written, seconds spent encoding and writing).
+    """
+    start = time.perf_counter()
+    data = encode_image(image, image_format, quality, compress_level)
+    write_bytes_atomic(data, file_path)
+    return len(data), time.perf_counter() - start
+
+
+def variant_seed(base_seed, story_hash, index):
+    """
+    Returns the seed for a story's n-th image (0-based).
+
+    With a base seed the images use base_seed, base_seed + 1, ...; without one the base
+    is derived from the story text, so every variant is still reproducible.
+
+    Args:
+        base_seed (int): Configured seed, or None.
+        story_hash (str): Hex digest of the story text.
+        index (int): Index of the image within the story.
+
+    Returns:
+        int: Seed in the range 0 to 2**32 - 1.
+    """
+    base = int(story_hash[:8], 16) if base_seed is None else int(base_seed)
+    return (base + index) % (2 ** 32)
+
+
+def variant_prompt(prompt, index, variant_styles=None):
+    """
+    Returns the prompt for a story's n-th image (0-based).
+
+    The first image uses the prompt as is; later images append one of `variant_styles`
+    in turn (e.g. "Close-up view."), so variants differ in more than their seed.
+    """
+    if index == 0 or not variant_styles:
+        return prompt
+    return f"{prompt} {variant_styles[(index - 1) % len(variant_styles)]}"
+
+
+def story_images(story_path, images_dir, max_images=None, image_index=None):
+    """
+    Returns a story's images, preferring the variants recorded in the run manifest.
+
+    Images recorded by generate_images_for_stories are returned in variant order, so
+    files left over from earlier runs with more variants are ignored. Stories without a
+    manifest record fall back to find_story_images.
+
+    Args:
+        story_path (str): Path of the story text file.
+        images_dir (str): Directory containing the generated images.
+        max_images (int): Return at most this many images (default: None, all).
+        image_index (dict): Result of index_story_images(images_dir), to avoid probing the
+            directory for every story (default: None).
+
+    Returns:
+        list: Image paths.
+    """
+    from src.utils.manifest import manifest_for
+    manifest = manifest_for(os.path.dirname(story_path) or '.')
+    record = manifest.get('images', manifest.key_for_story(story_path))
+    if record and record.get('paths'):
+        paths = record['paths']
+        in_dir = all(os.path.abspath(os.path.dirname(path)) == os.path.abspath(images_dir) for path in paths)
+        if in_dir and all(os.path.exists(path) for path in paths):
+            return paths[:max_images] if max_images else list(paths)
+    story_name = os.path.splitext(os.path.basename(story_path))[0]
+    if image_index is not None:
+        return image_index.get(story_name, [])[:max_images]
+    return find_story_images(images_dir, story_name, max_images=max_images)
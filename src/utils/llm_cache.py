@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = 'data/cache/llm_cache.sqlite'
+
+# Eviction is checked every this many writes rather than on every write.
+EVICTION_INTERVAL = 50
+
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache for LLM responses backed by SQLite.
+
+    Entries are keyed by a hash of (provider, model, temperature, max_tokens, prompt),
+    expire after `max_age_days`, and the least recently used entries are evicted once
+    the cache grows beyond `max_entries` or `max_size_mb`.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, enabled=True, max_entries=10000,
+                 max_size_mb=100, max_age_days=30):
+        self.path = path
+        # Setting LLM_CACHE_BYPASS=1 disables the cache without touching the config.
+        self.enabled = enabled and os.getenv('LLM_CACHE_BYPASS', '').lower() not in ('1', 'true', 'yes')
+        self.max_entries = max_entries
+        self.max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+            self._conn.commit()
+            self._evict()
+        return self._conn
+
+    @staticmethod
+    def make_key(provider, model, temperature, max_tokens, prompt):
+        """
+        Builds the cache key for a single LLM request.
+
+        Args:
+            provider (str): Provider name (e.g. 'groq', 'gemini').
+            model (str): Model name.
+            temperature (float): Sampling temperature, or None if not set.
+            max_tokens (int): Maximum output tokens, or None if not set.
+            prompt (str): Fully rendered prompt text.
+
+        Returns:
+            str: Hex digest identifying the request.
+        """
+        payload = json.dumps([provider, model, temperature, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached response for a key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        """
+        Stores a response under a key, evicting old entries if the cache is over its limits.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now),
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self):
+        conn = self._conn
+        if self.max_age:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    stale.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        conn.commit()
+
+    def clear(self):
+        """
+        Removes every cached response.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this process.
+
+        Returns:
+            dict: 'hits', 'misses' and 'hit_rate'.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def configure_llm_cache(**settings):
+    """
+    Replaces the shared cache with one built from the `llm_cache` section of the config.
+
+    Args:
+        **settings: Keyword arguments for LLMCache (path, enabled, max_entries, max_size_mb, max_age_days).
+
+    Returns:
+        LLMCache: The new shared cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = LLMCache(**settings)
+    return _default_cache
+
+
+def get_llm_cache():
+    """
+    Returns the shared LLM cache, creating it with default settings on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def cached_completion(provider, model, temperature, max_tokens, prompt, generate, use_cache=True):
+    """
+    Returns a cached LLM response for the prompt, calling `generate` only on a miss.
+
+    Args:
+        provider (str): Provider name used in the cache key.
+        model (str): Model name used in the cache key.
+        temperature (float): Sampling temperature used in the cache key.
+        max_tokens (int): Maximum output tokens used in the cache key.
+        prompt (str): Fully rendered prompt text.
+        generate (callable): Zero-argument function that calls the LLM and returns its text.
+            Exceptions propagate and nothing is cached.
+        use_cache (bool): Set to False to bypass the cache for this call (default: True).
+
+    Returns:
+        str: The response text.
+    """
+    cache = get_llm_cache()
+    if not use_cache or not cache.enabled:
+        return generate()
+
+    key = cache.make_key(provider, model, temperature, max_tokens, prompt)
+    content = cache.get(key)
+    if content is not None:
+        return content
+
+    content = generate()
+    if content:
+        cache.put(key, content)
+    return content
+
+
+def cached_stream(provider, model, temperature, max_tokens, prompt, stream, use_cache=True):
+    """
+    Streaming counterpart of cached_completion.
+
+    On a hit the cached response is yielded as a single chunk; on a miss the chunks from
+    `stream` are passed through as they arrive and the joined text is cached at the end.
+
+    Args:
+        provider (str): Provider name used in the cache key.
+        model (str): Model name used in the cache key.
+        temperature (float): Sampling temperature used in the cache key.
+        max_tokens (int): Maximum output tokens used in the cache key.
+        prompt (str): Fully rendered prompt text.
+        stream (callable): Zero-argument function returning an iterator of text chunks.
+        use_cache (bool): Set to False to bypass the cache for this call (default: True).
+
+    Yields:
+        str: Chunks of the response text.
+    """
+    cache = get_llm_cache()
+    if not use_cache or not cache.enabled:
+        yield from stream()
+        return
+
+    key = cache.make_key(provider, model, temperature, max_tokens, prompt)
+    content = cache.get(key)
+    if content is not None:
+        yield content
+        return
+
+    parts = []
+    for chunk in stream():
+        parts.append(chunk)
+        yield chunk
+    content = ''.join(parts).strip()
+    if content:
+        cache.put(key, content)
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# Minimum seconds between automatic saves; call save() to write immediately.
+AUTOSAVE_INTERVAL = 1.0
+
+# Files modified more recently than this are always re-hashed, since a second write
+# within the file system's timestamp resolution would not change their mtime.
+HASH_CACHE_MIN_AGE = 2.0
+
+
+def hash_text(*parts):
+    """
+    Returns a stable SHA-256 hex digest of one or more strings.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def hash_file(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def in_directory(path, directory):
+    """
+    Checks whether a path lies inside a directory (or one of its subdirectories).
+    """
+    path, directory = os.path.abspath(path), os.path.abspath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+
+def theme_key(theme):
+    """
+    Returns the stable key used for a theme in the manifest.
+
+    Themes that differ only in surrounding whitespace or case share a key.
+    """
+    return hash_text(' '.join(str(theme).split()).casefold())[:16]
+
+
+class RunManifest:
+    """
+    JSON manifest that maps each theme to the artifacts generated for it.
+
+    Every stage ('story', 'prompt', 'images', 'pdf', 'ppt') is recorded per theme key
+    with the hash of its inputs, the files it produced and its status, so a later run
+    can skip work whose inputs have not changed and resume after a crash.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._last_save = 0.0
+        self._dirty = False
+        self.entries = {}
+        # Absolute path -> [size, mtime_ns, sha256], so unchanged files are not read again.
+        self.file_hashes = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                self.entries = data.get('entries', {})
+                self.file_hashes = data.get('file_hashes', {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {path}: {e}")
+        # Story file name -> theme key, so later stages can find a story's entry.
+        self._story_index = {}
+        for key, entry in self.entries.items():
+            story = entry.get('stages', {}).get('story')
+            if story and story.get('paths'):
+                self._story_index[os.path.basename(story['paths'][0])] = key
+
+    def key_for_story(self, story_filename):
+        """
+        Returns the theme key for a story file, or the file's own name for stories
+        that were not generated through the manifest.
+        """
+        name = os.path.basename(story_filename)
+        return self._story_index.get(name, os.path.splitext(name)[0])
+
+    def theme_for_story(self, story_filename):
+        """
+        Returns the theme a story file was generated for, or None if none is recorded.
+        """
+        key = self._story_index.get(os.path.basename(story_filename))
+        with self._lock:
+            return self.entries.get(key, {}).get('theme') if key else None
+
+    def file_hash(self, path):
+        """
+        Returns the SHA-256 of a file, reusing the recorded hash while the file's size and
+        modification time are unchanged.
+
+        Args:
+            path (str): File to hash.
+
+        Returns:
+            str: Hex digest of the file's contents.
+        """
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self.file_hashes.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hash_file(path)
+        if time.time() - stat.st_mtime >= HASH_CACHE_MIN_AGE:
+            with self._lock:
+                self.file_hashes[key] = [stat.st_size, stat.st_mtime_ns, digest]
+                self._dirty = True
+        return digest
+
+    def get(self, stage, key):
+        """
+        Returns the recorded stage entry for a key, or None.
+        """
+        with self._lock:
+            return self.entries.get(key, {}).get('stages', {}).get(stage)
+
+    def is_fresh(self, stage, key, input_hash, output_dir=None):
+        """
+        Checks whether a stage already completed for these exact inputs and its files still exist.
+
+        Args:
+            stage (str): Stage name (e.g. 'story', 'images').
+            key (str): Theme key.
+            input_hash (str): Hash of everything the stage's output depends on.
+            output_dir (str): Directory the stage writes to. Several output directories
+                can share a manifest, so files recorded in another directory do not count
+                (default: None, files may be anywhere).
+
+        Returns:
+            bool: True if the stage can be skipped.
+        """
+        record = self.get(stage, key)
+        paths = record.get('paths', []) if record else []
+        return bool(
+            record
+            and record.get('status') == 'done'
+            and record.get('input_hash') == input_hash
+            and all(os.path.exists(path) for path in paths)
+            and (output_dir is None or all(in_directory(path, output_dir) for path in paths))
+        )
+
+    def record(self, stage, key, input_hash, paths=(), status='done', **extra):
+        """
+        Records the outcome of a stage for a key and saves the manifest.
+
+        Args:
+            stage (str): Stage name.
+            key (str): Theme key.
+            input_hash (str): Hash of the stage's inputs.
+            paths (list): Files produced by the stage.
+            status (str): 'done' or 'failed' (default: 'done').
+            **extra: Additional values to store with the stage (e.g. theme, prompt text).
+        """
+        with self._lock:
+            entry = self.entries.setdefault(key, {'stages': {}})
+            if 'theme' in extra:
+                entry['theme'] = extra.pop('theme')
+            entry['stages'][stage] = dict(
+                extra, input_hash=input_hash, paths=list(paths), status=status, updated=time.time(),
+            )
+            if stage == 'story' and paths:
+                self._story_index[os.path.basename(paths[0])] = key
+            self._dirty = True
+            if time.monotonic() - self._last_save >= AUTOSAVE_INTERVAL:
+                self.save()
+
+    def save(self):
+        """
+        Writes the manifest atomically if it has unsaved changes, dropping the hashes of
+        files that no longer exist.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self.file_hashes = {path: value for path, value in self.file_hashes.items() if os.path.exists(path)}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': 1, 'entries': self.entries, 'file_hashes': self.file_hashes},
+                          file, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def manifest_for(stories_dir):
+    """
+    Returns the shared manifest for an output tree.
+
+    The manifest lives next to the stories directory (data/output/manifest.json for
+    data/output/stories), so every stage finds the same file from the paths it is given.
+    """
+    path = os.path.abspath(os.path.join(stories_dir, '..', MANIFEST_FILENAME))
+    with _manifests_lock:
+        if path not in _manifests:
+            _manifests[path] = RunManifest(path)
+        return _manifests[path]
@@ -0,0 +1,189 @@
+import io
+import os
+import re
+import threading
+
+DEFAULT_COVER_DIR = 'data/cache/covers'
+
+# Pages searched for an illustration before falling back to a plain placeholder.
+COVER_SEARCH_PAGES = 3
+
+_cover_lock = threading.Lock()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+_COLOR_MODES = {'/DeviceRGB': 'RGB', '/DeviceGray': 'L', '/DeviceCMYK': 'CMYK'}
+
+
+def _xobject_images(resources, depth=0):
+    """
+    Yields the image XObjects of a resource dictionary, including those nested in form
+    XObjects, which is how ReportLab places images.
+    """
+    xobjects = resources.get('/XObject') if resources else None
+    if not xobjects or depth > 3:
+        return
+    for reference in xobjects.get_object().values():
+        xobject = reference.get_object()
+        if xobject.get('/Subtype') == '/Image':
+            yield xobject
+        elif xobject.get('/Subtype') == '/Form':
+            yield from _xobject_images(xobject.get('/Resources'), depth + 1)
+
+
+def _decode_image(xobject):
+    from PIL import Image
+    filters = xobject.get('/Filter') or []
+    if not isinstance(filters, list):
+        filters = [filters]
+    # PyPDF2 undoes every filter except DCTDecode and JPXDecode, whose data is the image file itself.
+    data = xobject.get_data()
+    if '/DCTDecode' in filters or '/JPXDecode' in filters:
+        return Image.open(io.BytesIO(data))
+    mode = _COLOR_MODES.get(xobject.get('/ColorSpace'))
+    if mode is None or xobject.get('/BitsPerComponent', 8) != 8:
+        return None
+    return Image.frombytes(mode, (xobject['/Width'], xobject['/Height']), data)
+
+
+def _first_illustration(reader):
+    for page in reader.pages[:COVER_SEARCH_PAGES]:
+        for xobject in _xobject_images(page.get('/Resources')):
+            try:
+                image = _decode_image(xobject)
+                if image is not None:
+                    image.load()
+                    return image
+            except Exception:
+                continue
+    return None
+
+
+def _placeholder(title, width):
+    from PIL import Image, ImageDraw
+    height = int(width * 11 / 8.5)
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(200, 200, 200))
+    words, lines = title.split(), []
+    for word in words:
+        if lines and len(lines[-1]) + len(word) < width // 8:
+            lines[-1] += ' ' + word
+        else:
+            lines.append(word)
+    for i, line in enumerate(lines[:6]):
+        draw.text((10, 12 + 14 * i), line, fill=(60, 60, 60))
+    return image
+
+
+def _evict_covers(cache_dir, max_entries):
+    # Least recently shown first: pdf_cover touches a cover's modification time on every hit.
+    covers = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith('.jpg'):
+                path = os.path.join(root, name)
+                try:
+                    covers.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+    covers.sort(reverse=True)
+    for _, path in covers[max_entries:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def pdf_cover(pdf_path, cache_dir=DEFAULT_COVER_DIR, width=240, max_entries=500):
+    """
+    Returns a small JPEG cover image for a PDF, creating it on first use.
+
+    This is not a rendering of the first page: the cover is the first illustration found
+    in the opening pages, read with PyPDF2 without rendering the document. PDFs without
+    one get a placeholder showing their title. Covers are cached under `cache_dir` by
+    path, size and modification time, so a rebuilt PDF gets a new one; the least recently
+    shown covers beyond `max_entries` are deleted.
+
+    Args:
+        pdf_path (str): PDF to show.
+        cache_dir (str): Directory for cached covers (default: DEFAULT_COVER_DIR).
+        width (int): Cover width in pixels (default: 240).
+        max_entries (int): Covers kept in `cache_dir` (default: 500; None for no limit).
+
+    Returns:
+        str: Path of the cover image.
+    """
+    from src.utils.manifest import hash_text
+    from src.utils.image_utils import save_image_atomic
+    key = hash_text(*_file_signature(pdf_path), width)
+    cover_path = os.path.join(cache_dir, key[:2], key + '.jpg')
+    if _touch(cover_path):
+        return cover_path
+
+    with _cover_lock:
+        if _touch(cover_path):
+            return cover_path
+        os.makedirs(os.path.dirname(cover_path), exist_ok=True)
+        title = os.path.splitext(os.path.basename(pdf_path))[0].replace('_', ' ')
+        try:
+            from PyPDF2 import PdfReader
+            reader = PdfReader(pdf_path)
+            title = (reader.metadata or {}).get('/Title') or title
+            image = _first_illustration(reader)
+        except Exception as e:
+            print(f"Could not read a cover image from {pdf_path}: {e}")
+            image = None
+        if image is None:
+            image = _placeholder(title, width)
+        image = image.convert('RGB')
+        image.thumbnail((width, width * 2))
+        save_image_atomic(image, cover_path, 'jpeg', 80)
+        if max_entries:
+            _evict_covers(cache_dir, max_entries)
+    return cover_path
+
+
+def publish_pdf(pdf_path, static_dir):
+    """
+    Makes a PDF available to the app's static file route, which serves it with byte-range
+    support instead of sending the whole file through the page.
+
+    The PDF is hard-linked (or copied across file systems) into `static_dir` under a name
+    that changes whenever the PDF is rebuilt, so browsers never show a stale cached copy;
+    the links of its earlier versions are removed.
+
+    Args:
+        pdf_path (str): PDF to publish.
+        static_dir (str): Directory served by the static file route.
+
+    Returns:
+        str: File name of the PDF in `static_dir`.
+    """
+    from src.utils.manifest import hash_text
+    from src.utils.image_cache import link_or_copy
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    name = f"{stem}-{hash_text(*_file_signature(pdf_path))[:12]}.pdf"
+    static_path = os.path.join(static_dir, name)
+    if not os.path.exists(static_path):
+        os.makedirs(static_dir, exist_ok=True)
+        link_or_copy(pdf_path, static_path)
+        for other in os.listdir(static_dir):
+            if other != name and re.fullmatch(re.escape(stem) + r'-[0-9a-f]{12}\.pdf', other):
+                try:
+                    os.remove(os.path.join(static_dir, other))
+                except OSError:
+                    pass
+    return name
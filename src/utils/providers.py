@@ -0,0 +1,62 @@
+import os
+import threading
+
+# Provider name -> zero-argument function that builds the client.
+_factories = {}
+# Provider name -> client built on first use.
+_instances = {}
+_lock = threading.Lock()
+
+
+def register_provider(name, factory):
+    """
+    Registers a factory for a provider client without creating it.
+
+    Modules register their clients at import time; the (often slow) client libraries are
+    only imported and the API keys only checked once get_provider is first called.
+
+    Args:
+        name (str): Provider name (e.g. 'groq_story').
+        factory (callable): Zero-argument function that returns the client.
+    """
+    with _lock:
+        _factories[name] = factory
+
+
+def get_provider(name):
+    """
+    Returns the client for a provider, creating it on first use.
+
+    Args:
+        name (str): Provider name passed to register_provider.
+
+    Returns:
+        The client built by the registered factory.
+    """
+    client = _instances.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _instances:
+            if name not in _factories:
+                raise KeyError(f"No provider registered under '{name}'.")
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def reset_providers():
+    """
+    Drops every created client so the next get_provider call builds a fresh one.
+    """
+    with _lock:
+        _instances.clear()
+
+
+def require_env(name):
+    """
+    Returns an environment variable, raising ValueError if it is not set.
+    """
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"{name} environment variable is not set.")
+    return value
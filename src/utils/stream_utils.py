@@ -0,0 +1,67 @@
+class ThinkTagFilter:
+    """
+    Incrementally removes a leading <think>...</think> reasoning block from streamed LLM output.
+
+    Reasoning models such as DeepSeek R1 open their response with a <think> block. Feed the
+    streamed chunks in order; only the text after </think> is returned, with the whitespace
+    that follows the closing tag dropped. Tags split across chunks are handled by buffering
+    the few characters that could still be part of a tag. Responses that do not start with
+    <think> are passed through unchanged.
+    """
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+
+    def __init__(self):
+        self._state = 'start'
+        self._buffer = ''
+
+    def feed(self, chunk):
+        """
+        Consumes the next chunk of the response.
+
+        Args:
+            chunk (str): The next piece of streamed text.
+
+        Returns:
+            str: Visible text that can be shown now (may be empty).
+        """
+        self._buffer += chunk or ''
+        while True:
+            if self._state == 'start':
+                stripped = self._buffer.lstrip()
+                if not stripped:
+                    return ''
+                if stripped.startswith(self.OPEN_TAG):
+                    self._buffer = stripped[len(self.OPEN_TAG):]
+                    self._state = 'think'
+                elif self.OPEN_TAG.startswith(stripped):
+                    # Could still turn into the opening tag once more text arrives.
+                    return ''
+                else:
+                    self._state = 'text'
+            elif self._state == 'think':
+                end = self._buffer.find(self.CLOSE_TAG)
+                if end == -1:
+                    # Keep just enough to detect a closing tag split across chunks.
+                    self._buffer = self._buffer[-(len(self.CLOSE_TAG) - 1):]
+                    return ''
+                self._buffer = self._buffer[end + len(self.CLOSE_TAG):]
+                self._state = 'after_think'
+            elif self._state == 'after_think':
+                self._buffer = self._buffer.lstrip()
+                if not self._buffer:
+                    return ''
+                self._state = 'text'
+            else:
+                text, self._buffer = self._buffer, ''
+                return text
+
+    def flush(self):
+        """
+        Returns any buffered visible text once the stream has ended.
+
+        An unterminated reasoning block is discarded.
+        """
+        text = self._buffer if self._state in ('start', 'text') else ''
+        self._buffer = ''
+        return text
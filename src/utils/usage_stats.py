@@ -0,0 +1,76 @@
+import threading
+
+
+class UsageStats:
+    """
+    Thread-safe counters for LLM requests, tokens and request time spent on a set of stories.
+    """
+    def __init__(self, label=""):
+        self.label = label
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.request_seconds = 0.0
+        self.stories = 0
+        self._lock = threading.Lock()
+
+    def record_request(self, input_tokens=0, output_tokens=0, seconds=0.0):
+        """
+        Records one API request, the tokens it used and how long it took.
+        """
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += input_tokens or 0
+            self.output_tokens += output_tokens or 0
+            self.request_seconds += seconds or 0.0
+
+    def record_stories(self, count=1):
+        """
+        Records stories that were successfully produced.
+        """
+        with self._lock:
+            self.stories += count
+
+    def merge(self, other):
+        """
+        Adds the counters of another UsageStats to these.
+        """
+        with self._lock:
+            self.requests += other.requests
+            self.input_tokens += other.input_tokens
+            self.output_tokens += other.output_tokens
+            self.request_seconds += other.request_seconds
+            self.stories += other.stories
+
+    @property
+    def total_tokens(self):
+        return self.input_tokens + self.output_tokens
+
+    def summary(self):
+        """
+        Returns the counters together with per-story averages.
+
+        Returns:
+            dict: Totals plus 'requests_per_story', 'tokens_per_story' and 'seconds_per_story'.
+        """
+        stories = self.stories or 1
+        return {
+            'requests': self.requests,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'request_seconds': self.request_seconds,
+            'stories': self.stories,
+            'requests_per_story': self.requests / stories,
+            'tokens_per_story': self.total_tokens / stories,
+            'seconds_per_story': self.request_seconds / stories,
+        }
+
+    def report(self):
+        """
+        Prints a one-line summary of the counters.
+        """
+        s = self.summary()
+        label = f"[{self.label}] " if self.label else ""
+        print(f"{label}{s['stories']} stories, {s['requests']} requests, {self.total_tokens} tokens "
+              f"({s['requests_per_story']:.2f} requests/story, {s['tokens_per_story']:.0f} tokens/story), "
+              f"{s['request_seconds']:.1f} s in requests ({s['seconds_per_story']:.2f} s/story)")
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import image_cache, image_derivatives, llm_cache, manifest
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path):
+    """
+    Points the shared LLM, image and derivative caches at a temporary directory and
+    forgets the loaded manifests, so no test reads or writes data/cache.
+    """
+    cache_dir = tmp_path / 'cache'
+    llm_cache.configure_llm_cache(path=str(cache_dir / 'llm_cache.sqlite'))
+    image_cache.configure_image_cache(cache_dir=str(cache_dir / 'images'))
+    image_derivatives.configure_image_derivatives(cache_dir=str(cache_dir / 'derivatives'))
+    manifest._manifests.clear()
+    yield
+    manifest._manifests.clear()
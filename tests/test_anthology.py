@@ -0,0 +1,82 @@
+import os
+
+from PIL import Image
+from PyPDF2 import PdfReader
+
+from src.pdf_generator import pdf_generator
+from src.pdf_generator.pdf_generator import create_anthology_pdf
+from src.story_generator.story_runner import story_filename
+from src.utils.manifest import manifest_for, theme_key
+
+
+def write_stories(directory, images_dir, count):
+    os.makedirs(directory)
+    os.makedirs(images_dir)
+    for number in range(count):
+        name = f"story_tale_{number:03d}"
+        with open(os.path.join(directory, f"{name}.txt"), 'w', encoding='utf-8') as file:
+            file.write(f"Title: Tale number {number}\n\n" + "A monkey leapt across the sea. " * 40 * (number % 3 + 1))
+        if number % 4 == 0:
+            Image.new('RGB', (32, 32), (number, 0, 0)).save(os.path.join(images_dir, f"{name}_image_1.png"))
+
+
+def test_contents_come_first_with_the_story_pages(tmp_path):
+    stories_dir, images_dir = str(tmp_path / 'stories'), str(tmp_path / 'images')
+    write_stories(stories_dir, images_dir, 12)
+
+    output_path = create_anthology_pdf(stories_dir, images_dir, str(tmp_path / 'anthology.pdf'))
+
+    reader = PdfReader(output_path)
+    contents = reader.pages[0].extract_text()
+    assert contents.index("Contents") < contents.index("Tale number 0")
+    titles = [entry.title for entry in reader.outline]
+    assert titles == ["Contents"] + [f"Tale number {number}" for number in range(12)]
+    for entry in reader.outline[1:]:
+        page = reader.get_destination_page_number(entry)
+        assert reader.pages[page].extract_text().startswith(entry.title)
+        assert f"{entry.title}\n{page + 1}" in contents
+
+
+def test_only_one_story_is_laid_out_at_a_time(tmp_path, monkeypatch):
+    stories_dir, images_dir = str(tmp_path / 'stories'), str(tmp_path / 'images')
+    write_stories(stories_dir, images_dir, 20)
+    sizes = []
+    length = pdf_generator._LazyFlow.__len__
+
+    def tracked_len(flow):
+        size = length(flow)
+        sizes.append(size)
+        return size
+
+    monkeypatch.setattr(pdf_generator._LazyFlow, '__len__', tracked_len)
+    create_anthology_pdf(stories_dir, images_dir, str(tmp_path / 'anthology.pdf'))
+
+    # The last flowable of the previous story, then the anchor, heading, two paragraphs
+    # and their spacers, an image and its spacer and the page break of the next one.
+    assert max(sizes) <= 10
+
+
+def test_documents_use_the_configured_page_size(tmp_path):
+    stories_dir, images_dir = str(tmp_path / 'stories'), str(tmp_path / 'images')
+    write_stories(stories_dir, images_dir, 2)
+    story_path = os.path.join(stories_dir, "story_tale_000.txt")
+
+    pdf_path = pdf_generator.create_pdf_for_story(story_path, images_dir, str(tmp_path / 'pdfs'), 'A4-landscape')
+    anthology = create_anthology_pdf(stories_dir, images_dir, str(tmp_path / 'anthology.pdf'), 'A4')
+
+    assert [round(float(value)) for value in PdfReader(pdf_path).pages[0].mediabox[2:]] == [842, 595]
+    assert [round(float(value)) for value in PdfReader(anthology).pages[-1].mediabox[2:]] == [595, 842]
+
+
+def test_pdfs_are_titled_after_the_theme_instead_of_the_file_name(tmp_path):
+    stories_dir, images_dir = str(tmp_path / 'stories'), str(tmp_path / 'images')
+    os.makedirs(stories_dir)
+    theme = "Hanuman's leap across the ocean"
+    story_path = os.path.join(stories_dir, story_filename(theme))
+    with open(story_path, 'w', encoding='utf-8') as file:
+        file.write("Once upon a time, long ago, a monkey leapt across the wide sea to find Sita.")
+    manifest_for(stories_dir).record('story', theme_key(theme), 'hash', [story_path], theme=theme)
+
+    results = pdf_generator.create_pdfs_for_all_stories(stories_dir, images_dir, str(tmp_path / 'pdfs'))
+
+    assert PdfReader(results[0]['pdf_path']).metadata.title == theme
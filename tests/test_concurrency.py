@@ -0,0 +1,128 @@
+import threading
+import time
+
+from src.utils.concurrency import StageScheduler, imap_ordered, run_two_stage_pipeline
+
+
+def test_results_come_back_in_input_order():
+    def slow_for_small(n):
+        time.sleep(0.02 * (5 - n))
+        return n * n
+
+    assert list(imap_ordered(slow_for_small, range(5), max_workers=5)) == [(n, n * n) for n in range(5)]
+
+
+def test_items_are_read_lazily():
+    read = []
+
+    def items():
+        for n in range(100):
+            read.append(n)
+            yield n
+
+    results = imap_ordered(lambda n: n, items(), max_workers=2)
+    next(results)
+    assert len(read) <= 5
+    results.close()
+
+
+def test_failures_and_timeouts_yield_the_default():
+    release = threading.Event()
+
+    def work(n):
+        if n == 1:
+            raise ValueError("bad theme")
+        if n == 2:
+            release.wait(5)
+        return n
+
+    start = time.monotonic()
+    results = list(imap_ordered(work, range(4), max_workers=4, timeout=0.2, default="skipped"))
+    release.set()
+    assert results == [(0, 0), (1, "skipped"), (2, "skipped"), (3, 3)]
+    assert time.monotonic() - start < 2
+
+
+def test_timeout_counts_from_submission_not_from_the_wait():
+    def work(n):
+        time.sleep(0.15)
+        return n
+
+    start = time.monotonic()
+    # Each call takes 0.15 s of its 0.3 s; waiting for the earlier results must not
+    # eat into the later calls' time.
+    assert list(imap_ordered(work, range(4), max_workers=4, timeout=0.3)) == [(n, n) for n in range(4)]
+    assert time.monotonic() - start < 1
+
+
+def test_abandoned_calls_keep_their_workers():
+    release = threading.Event()
+    running = []
+    lock = threading.Lock()
+    peak = []
+
+    def work(n):
+        with lock:
+            running.append(n)
+            peak.append(len(running))
+        if n == 0:
+            release.wait(5)
+        else:
+            time.sleep(0.01)
+        with lock:
+            running.remove(n)
+        return n
+
+    results = list(imap_ordered(work, range(6), max_workers=2, timeout=0.1, default=None))
+    release.set()
+    assert results[0] == (0, None)
+    assert [result for _, result in results[1:]] == [1, 2, 3, 4, 5]
+    assert max(peak) <= 2
+
+
+def test_a_failing_result_callback_does_not_stall_the_pipeline():
+    processed = []
+
+    def on_result(job, result):
+        raise RuntimeError("bad record")
+
+    runner = threading.Thread(target=run_two_stage_pipeline, daemon=True,
+                              args=(range(10), lambda n: [n, n + 100], processed.append),
+                              kwargs={'queue_size': 1, 'on_result': on_result})
+    runner.start()
+    runner.join(5)
+
+    assert not runner.is_alive()
+    assert sorted(processed) == sorted(list(range(10)) + list(range(100, 110)))
+
+
+def test_scheduler_runs_each_item_through_its_stages():
+    scheduler = StageScheduler({'fetch': 4, 'parse': 1})
+
+    def fetched(url, page):
+        if url == 'b':
+            raise ValueError("no links")
+        scheduler.submit('parse', str.upper, page, item=url)
+
+    for url in ['a', 'b', 'c']:
+        scheduler.submit('fetch', lambda url: f"page {url}", url, item=url,
+                         then=lambda page, url=url: fetched(url, page))
+    events = list(scheduler.events())
+
+    assert sorted((event.stage, event.item, event.result, event.error) for event in events) == [
+        ('fetch', 'a', 'page a', None), ('fetch', 'b', 'page b', 'no links'), ('fetch', 'c', 'page c', None),
+        ('parse', 'a', 'PAGE A', None), ('parse', 'c', 'PAGE C', None)]
+
+
+def test_closing_the_scheduler_reports_cancelled_tasks():
+    release = threading.Event()
+    scheduler = StageScheduler({'slow': 1})
+    scheduler.submit('slow', release.wait, 5, item='running')
+    scheduler.submit('slow', time.sleep, 0, item='queued')
+    scheduler.close()
+    release.set()
+
+    events = {event.item: event for event in scheduler.events()}
+
+    assert events['queued'].error == "cancelled"
+    assert events['running'].error is None
@@ -0,0 +1,12 @@
+import inspect
+import os
+
+from config.config import image_options, load_config
+from src.image_generator.image_generator import generate_images_for_stories
+
+
+def test_image_options_are_arguments_of_the_image_step():
+    options = image_options(load_config(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yml')))
+
+    assert set(options) <= set(inspect.signature(generate_images_for_stories).parameters)
+    assert image_options({})['image_format'] == 'png'
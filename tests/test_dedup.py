@@ -0,0 +1,62 @@
+import pytest
+
+from src.story_generator import story_generator, story_runner
+from src.utils.dedup import ThemeDeduplicator, normalize_theme
+
+
+def test_normalisation_drops_case_punctuation_and_possessives():
+    assert normalize_theme("Hanuman’s  LEAP!") == normalize_theme("hanuman leap") == "hanuman leap"
+
+
+def test_groups_do_not_depend_on_theme_order():
+    themes = ["Rama's gift to Bharata", "Hanuman's leap across the ocean", "Hanuman leap across the great ocean",
+              "Bharata's gift to Rama", "hanuman's LEAP across the ocean!"]
+    forward = ThemeDeduplicator(0.5).group(themes)
+    backward = ThemeDeduplicator(0.5).group(themes[::-1])[::-1]
+
+    assert forward == backward
+    assert forward[1] == forward[2] == forward[4]
+    assert len({forward[0], forward[3], forward[1]}) == 3
+
+
+def test_exact_threshold_only_merges_equal_wording():
+    deduplicator = ThemeDeduplicator()
+    representatives = deduplicator.group(["Hanuman's leap", "Hanuman leaps", "hanuman LEAP"])
+
+    assert representatives == ["Hanuman's leap", "Hanuman leaps", "Hanuman's leap"]
+    assert deduplicator.calls_saved == 1
+
+
+def test_representative_streams_exact_duplicates_in_file_order():
+    deduplicator = ThemeDeduplicator()
+
+    assert [deduplicator.representative(theme) for theme in ["hanuman LEAP", "Ganesha", "Hanuman's leap"]] == \
+        ["hanuman LEAP", "Ganesha", "hanuman LEAP"]
+    assert (deduplicator.themes, deduplicator.groups) == (3, 2)
+    with pytest.raises(ValueError):
+        ThemeDeduplicator(0.6).representative("Ganesha")
+
+
+@pytest.mark.parametrize('threshold, reads_whole_file', [(1.0, False), (0.6, True)])
+def test_exact_dedup_starts_generating_before_the_file_is_read(tmp_path, monkeypatch, threshold, reads_whole_file):
+    reads = []
+
+    def themes(input_file):
+        for theme in ["Hanuman", "Ganesha", "hanuman!", "Krishna"]:
+            reads.append(theme)
+            yield theme
+
+    def generate_story(theme, *args, **kwargs):
+        generated.append(len(reads))
+        return f"A story about {theme}."
+
+    generated = []
+    monkeypatch.setattr(story_runner, 'iter_themes', themes)
+    monkeypatch.setattr(story_generator, 'generate_story', generate_story)
+
+    story_generator.generate_stories_from_themes("themes.csv", str(tmp_path / 'stories'),
+                                                 dedup_threshold=threshold)
+
+    assert (generated[0] == 4) == reads_whole_file
+    assert len(generated) == 3
+    assert len(list((tmp_path / 'stories').glob('*.txt'))) == 4
@@ -0,0 +1,37 @@
+import pytest
+
+from src.story_generator import story_generator
+from src.utils.file_utils import iter_themes, read_themes_from_excel, story_title
+
+
+def write_csv(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_themes_are_read_in_file_order_without_blanks(tmp_path):
+    themes_file = write_csv(tmp_path / 'themes.csv', "Theme,Notes\nHanuman,a\n  ,b\nGanesha ,c\n")
+
+    assert list(iter_themes(themes_file)) == ["Hanuman", "Ganesha"]
+
+
+@pytest.mark.parametrize('name, text', [('themes.csv', "Topic\nHanuman\n"), ('themes.txt', "Hanuman\n")])
+def test_reading_errors_reach_the_caller(tmp_path, name, text):
+    themes_file = write_csv(tmp_path / name, text)
+
+    with pytest.raises(ValueError):
+        list(iter_themes(themes_file))
+    with pytest.raises(ValueError):
+        story_generator.generate_stories_from_themes(themes_file, str(tmp_path / 'stories'))
+    assert read_themes_from_excel(themes_file) == []
+
+
+@pytest.mark.parametrize('story, theme, title', [
+    ("Title: The Brave Monkey\n\nOnce upon a time.", "Hanuman's leap", "The Brave Monkey"),
+    ("**Ganesha Writes**\n\nOnce upon a time.", None, "Ganesha Writes"),
+    ("Once upon a time, long ago, a monkey leapt across the wide and wild sea to find Sita.", "Hanuman's leap",
+     "Hanuman's leap"),
+    ("Once upon a time, long ago, a monkey leapt across the wide and wild sea to find Sita.", None, "Hanuman's"),
+])
+def test_story_titles_never_show_the_theme_key(story, theme, title):
+    assert story_title("stories/story_Hanuman's_a7f8ea7a.txt", story, theme) == title
@@ -0,0 +1,64 @@
+import os
+
+from PIL import Image
+
+from src.utils.image_cache import ImageCache, cached_image, get_image_cache
+
+
+def model(calls, colour=(200, 40, 10)):
+    def generate():
+        calls.append(1)
+        return Image.new('RGB', (16, 16), colour)
+    return generate
+
+
+def request(tmp_path, filename, generate, seed=1, **encode_options):
+    return cached_image("huggingface", "model", "a monkey", 512, 512, seed, 0, str(tmp_path / filename), generate,
+                        encode_options=encode_options)
+
+
+def test_key_covers_the_request_but_not_the_encoding():
+    key = ImageCache.make_key("huggingface", "model", "a monkey", 512, 512, seed=1)
+    assert key == ImageCache.make_key("huggingface", "model", "a monkey", 512, 512, seed=1)
+    assert key != ImageCache.make_key("huggingface", "model", "a monkey", 512, 512, seed=2)
+    assert key != ImageCache.make_key("huggingface", "other", "a monkey", 512, 512, seed=1)
+    assert key != ImageCache.make_key("huggingface", "model", "a monkey", 512, 768, seed=1)
+
+
+def test_changing_the_format_reencodes_without_calling_the_model(tmp_path):
+    calls = []
+    path, cached = request(tmp_path, "s_image_1.png", model(calls), image_format='png')
+    assert (cached, len(calls)) == (False, 1)
+
+    for image_format, filename in (('webp', "s_image_1.webp"), ('jpeg', "s_image_1.jpg"), ('png', "s_image_2.png")):
+        path, cached = request(tmp_path, filename, model(calls), image_format=image_format, quality=80)
+        assert cached and len(calls) == 1
+        with Image.open(path) as image:
+            assert image.format == {'jpeg': 'JPEG', 'webp': 'WEBP', 'png': 'PNG'}[image_format]
+
+    request(tmp_path, "s_image_3.png", model(calls), seed=2)
+    assert len(calls) == 2
+
+
+def test_lossy_outputs_keep_a_lossless_copy_in_the_cache(tmp_path):
+    calls = []
+    request(tmp_path, "s_image_1.jpg", model(calls, colour=(13, 200, 77)), image_format='jpeg', quality=10)
+
+    key = ImageCache.make_key("huggingface", "model", "a monkey", 512, 512, seed=1)
+    cached_path = get_image_cache().get(key)
+    assert cached_path.endswith('.png')
+    with Image.open(cached_path) as image:
+        assert image.getpixel((0, 0)) == (13, 200, 77)
+
+    path, cached = request(tmp_path, "s_image_1.png", model(calls), image_format='png')
+    assert cached and len(calls) == 1
+    with Image.open(path) as image:
+        assert image.getpixel((0, 0)) == (13, 200, 77)
+
+
+def test_png_outputs_are_linked_from_the_cache(tmp_path):
+    calls = []
+    first, _ = request(tmp_path, "a.png", model(calls), image_format='png', compress_level=6)
+    second, cached = request(tmp_path, "b.png", model(calls), image_format='png', compress_level=6)
+    assert cached
+    assert os.path.samefile(first, second) or open(first, 'rb').read() == open(second, 'rb').read()
@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+import types
+
+import pytest
+from PIL import Image
+
+from src.image_generator import image_generator, image_generator_google_api
+from src.utils import manifest, providers
+from src.utils.manifest import manifest_for, hash_text
+
+
+class FakeImageModel:
+    def __init__(self):
+        self.prompts = []
+
+    def text_to_image(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return Image.new('RGB', (8, 8), (30, 120, 200))
+
+
+def write_stories(stories_dir, stories):
+    os.makedirs(stories_dir)
+    for name, text in stories.items():
+        with open(os.path.join(stories_dir, name), 'w', encoding='utf-8') as file:
+            file.write(text)
+
+
+@pytest.fixture
+def image_model(monkeypatch):
+    model = FakeImageModel()
+    monkeypatch.setitem(providers._instances, 'huggingface_image', model)
+    return model
+
+
+@pytest.mark.parametrize('module', [image_generator, image_generator_google_api])
+def test_both_prompt_llms_share_the_image_pipeline(tmp_path, monkeypatch, image_model, module):
+    calls = []
+    monkeypatch.setattr(module, 'generate_enhanced_prompt',
+                        lambda story, use_cache=True, usage=None: calls.append([story]) or f"Scene of {story}")
+    monkeypatch.setattr(module, 'generate_enhanced_prompt_batch',
+                        lambda stories, use_cache=True, usage=None: calls.append(stories) or
+                        [f"Scene of {story}" for story in stories])
+    stories_dir = str(tmp_path / 'stories')
+    images_dir = str(tmp_path / 'images')
+    write_stories(stories_dir, {'story_a.txt': "Hanuman", 'story_b.txt': "Ganesha", 'story_c.txt': "Krishna"})
+
+    module.generate_images_for_stories(stories_dir, images_dir, prompt_batch_size=2, use_cache=False)
+
+    assert calls == [["Hanuman", "Ganesha"], ["Krishna"]]
+    assert sorted(image_model.prompts) == ["Scene of Ganesha", "Scene of Hanuman", "Scene of Krishna"]
+    record = manifest_for(stories_dir).get('prompt', 'story_a')
+    assert record['input_hash'] == hash_text(hash_text("Hanuman"), module.PROMPT_MODEL)
+    assert sorted(os.listdir(images_dir)) == ['story_a_image_1.png', 'story_b_image_1.png', 'story_c_image_1.png']
+
+
+def test_identical_stories_share_images_and_drop_the_old_format(tmp_path, monkeypatch, image_model):
+    monkeypatch.setattr(image_generator, 'generate_enhanced_prompt',
+                        lambda story, use_cache=True, usage=None: f"Scene of {story}")
+    stories_dir = str(tmp_path / 'stories')
+    images_dir = str(tmp_path / 'images')
+    write_stories(stories_dir, {'story_a.txt': "Hanuman", 'story_b.txt': "Hanuman"})
+
+    image_generator.generate_images_for_stories(stories_dir, images_dir)
+    image_generator.generate_images_for_stories(stories_dir, images_dir, image_format='webp')
+
+    assert len(image_model.prompts) == 1
+    assert sorted(os.listdir(images_dir)) == ['story_a_image_1.webp', 'story_b_image_1.webp']
+    source, copy = (os.stat(os.path.join(images_dir, name)) for name in sorted(os.listdir(images_dir)))
+    assert source.st_ino == copy.st_ino
+
+
+class FakeGroq:
+    def __init__(self):
+        self.requests = 0
+
+    def invoke(self, messages, **kwargs):
+        self.requests += 1
+        count = messages[0].count('Story ')
+        prompts = [{'index': i, 'prompt': f"A bright painted scene of story {i} in a forest"}
+                   for i in range(1, count + 1)]
+        return types.SimpleNamespace(content=json.dumps(prompts), usage_metadata={})
+
+
+def test_summaries_count_only_real_model_calls(tmp_path, monkeypatch, capsys, image_model):
+    schema = types.ModuleType('langchain.schema')
+    schema.HumanMessage = lambda content: content
+    monkeypatch.setitem(sys.modules, 'langchain', types.ModuleType('langchain'))
+    monkeypatch.setitem(sys.modules, 'langchain.schema', schema)
+    llm = FakeGroq()
+    monkeypatch.setitem(providers._instances, 'groq_prompt', llm)
+    stories_dir = str(tmp_path / 'stories')
+    write_stories(stories_dir, {'story_a.txt': "Hanuman", 'story_b.txt': "Ganesha"})
+
+    usage = image_generator.generate_images_for_stories(stories_dir, str(tmp_path / 'first'), prompt_batch_size=2)
+    output = capsys.readouterr().out
+    assert (llm.requests, usage.requests, usage.stories) == (1, 1, 2)
+    assert "Batching saved 1 of 2 prompt enhancement requests." in output
+    assert "Generated 2 image(s)" in output
+
+    # A new output directory and fresh prompts make the stories run again, all from the caches.
+    manifest._manifests.clear()
+    os.remove(tmp_path / manifest.MANIFEST_FILENAME)
+    usage = image_generator.generate_images_for_stories(stories_dir, str(tmp_path / 'second'), prompt_batch_size=2)
+    output = capsys.readouterr().out
+    assert (llm.requests, usage.requests, usage.stories, len(image_model.prompts)) == (1, 0, 0, 2)
+    assert "Batching saved" not in output
+    assert "image(s)" not in output
+    assert "Image cache: 2 hits" in output
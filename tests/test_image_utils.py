@@ -0,0 +1,74 @@
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from src.image_generator import image_generator
+from src.utils import image_utils, providers
+from src.utils.image_utils import save_image_atomic, write_bytes_atomic
+from src.utils.manifest import RunManifest
+
+
+def truncated_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (30, 120, 200)).save(buffer, format='PNG', compress_level=0)
+    return Image.open(io.BytesIO(buffer.getvalue()[:200]))
+
+
+def test_a_corrupt_image_leaves_the_previous_file_untouched(tmp_path):
+    path = str(tmp_path / 'story_a_image_1.png')
+    save_image_atomic(Image.new('RGB', (8, 8), (200, 40, 10)), path)
+    before = open(path, 'rb').read()
+
+    with pytest.raises(OSError):
+        save_image_atomic(truncated_image(), path)
+
+    assert open(path, 'rb').read() == before
+    assert os.listdir(tmp_path) == ['story_a_image_1.png']
+
+
+def test_a_failed_rename_removes_the_temporary_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'image.png')
+    write_bytes_atomic(b'old', path)
+
+    def replace(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(image_utils.os, 'replace', replace)
+    with pytest.raises(OSError):
+        write_bytes_atomic(b'new', path)
+
+    assert open(path, 'rb').read() == b'old'
+    assert os.listdir(tmp_path) == ['image.png']
+
+
+def test_generation_writes_no_file_for_a_corrupt_image(tmp_path, monkeypatch):
+    model = type('Model', (), {'text_to_image': lambda self, prompt, **kwargs: truncated_image()})()
+    monkeypatch.setitem(providers._instances, 'huggingface_image', model)
+
+    result = image_generator.generate_image_from_text("A monkey", str(tmp_path), 'story_a_image_1.png',
+                                                      use_cache=False)
+
+    assert result is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_a_failed_manifest_save_keeps_the_previous_manifest(tmp_path, monkeypatch):
+    path = str(tmp_path / 'manifest.json')
+    manifest = RunManifest(path)
+    manifest.record('story', 'k', 'hash-1')
+    manifest.save()
+    before = open(path, encoding='utf-8').read()
+
+    def dump(*args, **kwargs):
+        raise ValueError("interrupted")
+
+    manifest.record('story', 'k', 'hash-2')
+    monkeypatch.setattr(json, 'dump', dump)
+    with pytest.raises(ValueError):
+        manifest.save()
+
+    assert open(path, encoding='utf-8').read() == before
+    assert RunManifest(path).get('story', 'k')['input_hash'] == 'hash-1'
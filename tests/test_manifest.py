@@ -0,0 +1,84 @@
+import json
+import os
+
+from src.story_generator import story_generator
+from src.utils.manifest import RunManifest, in_directory, manifest_for, theme_key
+
+
+def write_themes(path, themes):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("Theme\n" + "".join(f"{theme}\n" for theme in themes))
+    return str(path)
+
+
+def test_is_fresh_needs_the_same_inputs_and_the_files(tmp_path):
+    manifest = RunManifest(str(tmp_path / 'manifest.json'))
+    story_path = tmp_path / 'stories' / 'story.txt'
+    story_path.parent.mkdir()
+    story_path.write_text("Once upon a time")
+    manifest.record('story', 'k', 'hash-1', [str(story_path)])
+
+    assert manifest.is_fresh('story', 'k', 'hash-1')
+    assert not manifest.is_fresh('story', 'k', 'hash-2')
+    assert not manifest.is_fresh('story', 'other', 'hash-1')
+    manifest.record('story', 'k', 'hash-1', [str(story_path)], status='failed')
+    assert not manifest.is_fresh('story', 'k', 'hash-1')
+    manifest.record('story', 'k', 'hash-1', [str(story_path)])
+    story_path.unlink()
+    assert not manifest.is_fresh('story', 'k', 'hash-1')
+
+
+def test_records_in_another_output_dir_are_not_fresh(tmp_path):
+    manifest = RunManifest(str(tmp_path / 'manifest.json'))
+    story_path = tmp_path / 'stories' / 'story.txt'
+    story_path.parent.mkdir()
+    story_path.write_text("Once upon a time")
+    manifest.record('story', 'k', 'hash', [str(story_path)])
+
+    assert manifest.is_fresh('story', 'k', 'hash', str(tmp_path / 'stories'))
+    assert not manifest.is_fresh('story', 'k', 'hash', str(tmp_path / 'b'))
+    assert in_directory(str(story_path), str(tmp_path))
+    assert not in_directory(str(tmp_path / 'stories-old' / 'x.txt'), str(tmp_path / 'stories'))
+
+
+def test_save_round_trips_and_drops_hashes_of_removed_files(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    manifest = RunManifest(path)
+    kept, removed = tmp_path / 'kept.txt', tmp_path / 'removed.txt'
+    kept.write_text("a")
+    removed.write_text("b")
+    manifest.file_hashes = {str(kept): [1, 0, 'x'], str(removed): [1, 0, 'y']}
+    removed.unlink()
+    manifest.record('story', 'k', 'hash', [str(kept)], theme="Ganesha")
+    manifest.save()
+
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    assert list(data['file_hashes']) == [str(kept)]
+    reloaded = RunManifest(path)
+    assert reloaded.is_fresh('story', 'k', 'hash')
+    assert reloaded.key_for_story('kept.txt') == 'k'
+
+
+def test_stories_are_regenerated_for_a_new_output_dir(tmp_path, monkeypatch):
+    calls = []
+
+    def generate_story(theme, *args, **kwargs):
+        calls.append(theme)
+        return f"A story about {theme}."
+
+    monkeypatch.setattr(story_generator, 'generate_story', generate_story)
+    themes = ["Hanuman", "Ganesha", "Krishna"]
+    input_file = write_themes(tmp_path / 'themes.csv', themes)
+    first, second = str(tmp_path / 'out' / 'stories'), str(tmp_path / 'out' / 'b')
+
+    story_generator.generate_stories_from_themes(input_file, first)
+    story_generator.generate_stories_from_themes(input_file, first)
+    assert len(calls) == 3
+    story_generator.generate_stories_from_themes(input_file, second)
+
+    assert len(calls) == 6
+    assert sorted(os.listdir(second)) == sorted(os.listdir(first))
+    assert manifest_for(second) is manifest_for(first)
+    assert manifest_for(second).is_fresh('story', theme_key("Hanuman"),
+                                         story_generator.story_input_hash("Hanuman", "5-12", 200), second)
@@ -0,0 +1,58 @@
+import os
+
+from PIL import Image
+from reportlab.platypus import Image as PdfImage, Paragraph, SimpleDocTemplate
+from reportlab.lib.styles import getSampleStyleSheet
+
+from src.utils.pdf_preview import pdf_cover, publish_pdf
+
+
+def write_pdf(path, title, image_path=None):
+    flow = [Paragraph("Once upon a time.", getSampleStyleSheet()['Normal'])]
+    if image_path:
+        flow.append(PdfImage(image_path, width=100, height=100))
+    SimpleDocTemplate(str(path), title=title).build(flow)
+    return str(path)
+
+
+def test_cover_is_the_first_illustration_or_a_placeholder(tmp_path):
+    image_path = str(tmp_path / 'red.png')
+    Image.new('RGB', (64, 64), (220, 20, 20)).save(image_path)
+    illustrated = write_pdf(tmp_path / 'a.pdf', "Hanuman's leap", image_path)
+    plain = write_pdf(tmp_path / 'b.pdf', "Ganesha writes")
+    cache_dir = str(tmp_path / 'covers')
+
+    red, green, blue = Image.open(pdf_cover(illustrated, cache_dir, width=32)).getpixel((16, 16))
+    assert red > 200 and green < 60 and blue < 60
+    assert Image.open(pdf_cover(plain, cache_dir, width=32)).getpixel((16, 16)) == (255, 255, 255)
+
+
+def test_least_recently_shown_covers_are_evicted(tmp_path):
+    cache_dir = str(tmp_path / 'covers')
+    pdfs = [write_pdf(tmp_path / f"{i}.pdf", f"Story {i}") for i in range(3)]
+
+    first = pdf_cover(pdfs[0], cache_dir, max_entries=2)
+    second = pdf_cover(pdfs[1], cache_dir, max_entries=2)
+    os.utime(second, (1, 1))
+    assert pdf_cover(pdfs[0], cache_dir, max_entries=2) == first  # Shown again, so kept
+    third = pdf_cover(pdfs[2], cache_dir, max_entries=2)
+
+    assert [os.path.exists(path) for path in (first, second, third)] == [True, False, True]
+
+
+def test_published_pdfs_are_renamed_when_rebuilt(tmp_path):
+    pdf_path = write_pdf(tmp_path / 'story_a.pdf', "Hanuman's leap")
+    write_pdf(tmp_path / 'story_a_b.pdf', "Ganesha writes")
+    static_dir = str(tmp_path / 'static')
+    other = publish_pdf(str(tmp_path / 'story_a_b.pdf'), static_dir)
+
+    first = publish_pdf(pdf_path, static_dir)
+    assert publish_pdf(pdf_path, static_dir) == first
+    assert os.stat(os.path.join(static_dir, first)).st_ino == os.stat(pdf_path).st_ino
+
+    os.remove(pdf_path)
+    write_pdf(pdf_path, "Hanuman's great leap")
+    second = publish_pdf(pdf_path, static_dir)
+
+    assert second != first
+    assert sorted(os.listdir(static_dir)) == sorted([other, second])
@@ -0,0 +1,94 @@
+import os
+
+from PIL import Image
+from pptx import Presentation
+
+from src.ppt_generator import ppt_generator
+from src.ppt_generator.pptx_package import read_story_index
+from src.story_generator.story_runner import story_filename
+from src.utils.manifest import manifest_for, theme_key
+
+
+def test_template_is_hashed_again_only_when_it_changes(tmp_path, monkeypatch):
+    template = str(tmp_path / 'template.pptx')
+    Presentation().save(template)
+    hashed = []
+    hash_file = ppt_generator.hash_file
+    monkeypatch.setattr(ppt_generator, 'hash_file', lambda path: hashed.append(path) or hash_file(path))
+
+    first = ppt_generator.template_key(template)
+    assert ppt_generator.template_key(template) == first
+    assert len(hashed) == 1
+
+    with open(template, 'ab') as file:
+        file.write(b'\0')
+    assert ppt_generator.template_key(template) != first
+    assert len(hashed) == 2
+
+
+def test_each_thread_keeps_one_deck_builder(tmp_path):
+    template = str(tmp_path / 'template.pptx')
+    Presentation().save(template)
+
+    default = ppt_generator.get_deck_builder()
+    assert ppt_generator.get_deck_builder() is default
+    themed = ppt_generator.get_deck_builder(template)
+    assert themed is not default
+    assert ppt_generator.get_deck_builder(template) is themed
+
+    with open(template, 'ab') as file:
+        file.write(b'\0')
+    assert ppt_generator.get_deck_builder(template) is not themed
+
+
+def write_story(stories_dir, name, text):
+    with open(os.path.join(stories_dir, name), 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def deck_stories(path):
+    # The text of each story, in slide order, from the subtitles of its title slides.
+    return [slide.placeholders[1].text for slide in Presentation(path).slides
+            if slide.slide_layout.name == 'Title Slide']
+
+
+def test_appending_to_the_combined_deck_matches_a_full_build(tmp_path):
+    stories_dir = str(tmp_path / 'stories')
+    images_dir = str(tmp_path / 'images')
+    os.makedirs(stories_dir)
+    os.makedirs(images_dir)
+    Image.new('RGB', (64, 48), (200, 40, 10)).save(os.path.join(images_dir, 'story_a_image_1.png'))
+    write_story(stories_dir, 'story_a.txt', "Hanuman leaps.")
+    write_story(stories_dir, 'story_b.txt', "Ganesha writes.")
+    write_story(stories_dir, 'story_d.txt', "Arjuna aims.")
+    deck = str(tmp_path / 'combined.pptx')
+    ppt_generator.create_combined_ppt(stories_dir, images_dir, deck, append=True)
+    assert deck_stories(deck) == ["Hanuman leaps.", "Ganesha writes.", "Arjuna aims."]
+
+    write_story(stories_dir, 'story_c.txt', "Krishna plays.")    # Added
+    write_story(stories_dir, 'story_b.txt', "Ganesha rewrites.")  # Replaced
+    os.remove(os.path.join(stories_dir, 'story_d.txt'))           # Deleted
+    ppt_generator.create_combined_ppt(stories_dir, images_dir, deck, append=True)
+    full = str(tmp_path / 'full.pptx')
+    ppt_generator.create_combined_ppt(stories_dir, images_dir, full)
+
+    assert deck_stories(deck) == deck_stories(full) == ["Hanuman leaps.", "Ganesha rewrites.", "Krishna plays."]
+    assert len(Presentation(deck).slides) == len(Presentation(full).slides) == 7
+    pictures = [shape for slide in Presentation(deck).slides for shape in slide.shapes if shape.shape_type == 13]
+    assert len(pictures) == 1
+    assert [story.name for story in read_story_index(deck)[1]] == ['story_a.txt', 'story_b.txt', 'story_c.txt']
+
+
+def test_title_slides_show_the_theme_instead_of_the_file_name(tmp_path):
+    stories_dir = str(tmp_path / 'stories')
+    os.makedirs(stories_dir)
+    theme = "Hanuman's leap across the ocean"
+    name = story_filename(theme)
+    write_story(stories_dir, name, "Once upon a time, long ago, a monkey leapt across the wide sea to find Sita.")
+    manifest_for(stories_dir).record('story', theme_key(theme), 'hash', [os.path.join(stories_dir, name)],
+                                     theme=theme)
+
+    ppt_path, = ppt_generator.create_ppts_for_all_stories(stories_dir, str(tmp_path / 'images'),
+                                                         str(tmp_path / 'ppts'))
+
+    assert Presentation(ppt_path).slides[0].shapes.title.text == theme
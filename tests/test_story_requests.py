@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from src.story_generator import story_generator, story_generator_google_api
+from src.utils import providers
+
+
+class FakeGemini:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return type('Response', (), {'text': "A story.", 'usage_metadata': None})()
+
+
+def test_gemini_requests_have_a_client_side_timeout(monkeypatch):
+    model = FakeGemini()
+    monkeypatch.setitem(providers._instances, 'gemini_story', model)
+
+    story_generator_google_api.generate_story("Hanuman", use_cache=False)
+    story_generator_google_api.generate_story_batch(["Hanuman", "Ganesha"], use_cache=False)
+
+    timeout = story_generator_google_api.STORY_REQUEST_TIMEOUT
+    assert model.calls[0] == {'request_options': {'timeout': timeout}}
+    assert model.calls[1] == {'request_options': {'timeout': 2 * timeout}}
+
+
+def write_themes(path, themes):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("Theme\n" + "".join(f"{theme}\n" for theme in themes))
+    return str(path)
+
+
+@pytest.mark.parametrize('module', [story_generator, story_generator_google_api])
+def test_both_providers_share_the_story_steps(module, tmp_path, monkeypatch):
+    calls = []
+
+    def generate_story(theme, *args, **kwargs):
+        calls.append(theme)
+        return f"A story about {theme}."
+
+    def generate_story_batch(themes, *args, **kwargs):
+        calls.append(tuple(themes))
+        return [f"A story about {theme}." for theme in themes]
+
+    monkeypatch.setattr(module, 'generate_story', generate_story)
+    monkeypatch.setattr(module, 'generate_story_batch', generate_story_batch)
+    input_file = write_themes(tmp_path / 'themes.csv', ["Hanuman", "Ganesha", "hanuman!", "Krishna"])
+
+    module.generate_stories_from_themes(input_file, str(tmp_path / 'single' / 'stories'), dedup_threshold=1.0)
+    assert sorted(calls) == ["Ganesha", "Hanuman", "Krishna"]
+    assert len(os.listdir(tmp_path / 'single' / 'stories')) == 4
+
+    calls.clear()
+    module.generate_stories_from_themes(input_file, str(tmp_path / 'batch' / 'stories'), mode="batch", batch_size=2)
+    assert calls == [("Hanuman", "Ganesha"), ("hanuman!", "Krishna")]
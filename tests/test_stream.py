@@ -0,0 +1,100 @@
+import os
+import sys
+import types
+
+import pytest
+
+from src.story_generator import story_generator, story_generator_google_api
+from src.utils import providers
+from src.utils.stream_utils import ThinkTagFilter
+from src.utils.usage_stats import UsageStats
+
+
+def filtered(chunks):
+    think_filter = ThinkTagFilter()
+    return ''.join(think_filter.feed(chunk) for chunk in chunks) + think_filter.flush()
+
+
+@pytest.mark.parametrize('chunks, text', [
+    (["<think>plan the story</think>\n\nOnce upon a time."], "Once upon a time."),
+    (["  <thi", "nk>plan", " the </thi", "nk>", "  ", "Once", " upon a time."], "Once upon a time."),
+    (["Once upon <think> a time."], "Once upon <think> a time."),
+    (["<th"], "<th"),
+    (["<think>never closed"], ""),
+])
+def test_think_filter_drops_only_the_leading_reasoning(chunks, text):
+    assert filtered(chunks) == text
+
+
+def test_think_filter_shows_text_as_soon_as_it_is_safe():
+    think_filter = ThinkTagFilter()
+
+    assert think_filter.feed("<think>plan</think>Once") == "Once"
+    assert think_filter.feed(" upon") == " upon"
+
+
+class Piece:
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+class FakeGroq:
+    def __init__(self):
+        self.calls = []
+
+    def stream(self, messages, **kwargs):
+        self.calls.append(kwargs)
+        yield Piece("<think>plan</think>")
+        yield Piece("Once upon a time.")
+        yield Piece("", {'input_tokens': 40, 'output_tokens': 12})
+
+
+@pytest.fixture
+def fake_langchain(monkeypatch):
+    schema = types.ModuleType('langchain.schema')
+    schema.HumanMessage = lambda content: content
+    monkeypatch.setitem(sys.modules, 'langchain', types.ModuleType('langchain'))
+    monkeypatch.setitem(sys.modules, 'langchain.schema', schema)
+
+
+def test_streamed_stories_are_counted_and_timed_out(tmp_path, monkeypatch, fake_langchain):
+    model = FakeGroq()
+    monkeypatch.setitem(providers._instances, 'groq_story', model)
+    themes_file = tmp_path / 'themes.csv'
+    themes_file.write_text("Theme\nHanuman\nGanesha\n", encoding='utf-8')
+    streamed = []
+
+    usage = story_generator.generate_stories_from_themes(
+        str(themes_file), str(tmp_path / 'stories'), timeout=30, use_cache=False,
+        on_token=lambda idx, theme, text: streamed.append((idx, text)))
+
+    assert streamed == [(1, "Once upon a time."), (2, "Once upon a time.")]
+    assert model.calls == [{'timeout': 30}, {'timeout': 30}]
+    assert (usage.label, usage.stories, usage.requests, usage.total_tokens) == ("streaming", 2, 2, 104)
+    assert len(os.listdir(tmp_path / 'stories')) == 2
+
+
+def test_gemini_streams_record_their_request(monkeypatch):
+    class Response:
+        usage_metadata = types.SimpleNamespace(prompt_token_count=40, candidates_token_count=12)
+
+        def __iter__(self):
+            return iter([types.SimpleNamespace(text="Once upon a time.")])
+
+    calls = []
+    model = types.SimpleNamespace(generate_content=lambda prompt, **kwargs: calls.append(kwargs) or Response())
+    monkeypatch.setitem(providers._instances, 'gemini_story', model)
+    usage = UsageStats()
+
+    story = ''.join(story_generator_google_api.stream_story("Hanuman", use_cache=False, usage=usage))
+
+    assert story == "Once upon a time."
+    assert calls == [{'stream': True, 'request_options': {'timeout': story_generator_google_api.STORY_REQUEST_TIMEOUT}}]
+    assert (usage.requests, usage.total_tokens) == (1, 52)
+
+
+def test_batch_mode_cannot_be_streamed(tmp_path):
+    with pytest.raises(ValueError):
+        story_generator.generate_stories_from_themes("themes.csv", str(tmp_path), mode="batch",
+                                                     on_token=lambda idx, theme, text: None)